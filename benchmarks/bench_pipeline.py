@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+采集→分析→通知全流程基准测试
+在合成数据集上测量各环节的请求速率、记录处理速率、峰值内存（RSS）和各阶段延迟：
+
+- scrape_heimao：对本地回放服务（合成搜索页，见fixture_server.py）运行完整的黑猫投诉爬虫
+- prepare_analysis：AIAnalyzer.load_data + prepare_analysis_content（投诉JSON Lines）
+- prepare_message：Notifier.load_result + prepare_message（AI分析结果TSV）
+- firecrawl_mock：FirecrawlScraper模拟模式下的scrape_url，以及编译请求方案和每个URL构造请求参数的开销
+
+每个用例在独立的子进程中运行，峰值RSS只包含该用例本身；子进程中关闭INFO日志，避免日志输出影响测量。
+结果保存为JSON（含提交号），可用--baseline与之前的结果对比，记录处理速率下降或峰值内存上升超过阈值时标记为回退。
+
+用法:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --cases prepare_analysis,prepare_message --sizes 1000,100000,1000000
+    python benchmarks/bench_pipeline.py --output benchmarks/results/ --baseline benchmarks/results/pipeline-xxx.json --fail-on-regression
+"""
+
+import os
+import sys
+import json
+import time
+import math
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# 导入工具
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(os.path.join(ROOT_DIR, 'scripts'))
+sys.path.append(BENCHMARK_DIR)
+
+# 所有用例
+CASES = ('scrape_heimao', 'prepare_analysis', 'prepare_message', 'firecrawl_mock')
+
+# 默认的数据规模
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# 爬虫用例的关键词数和每页条数
+SCRAPE_KEYWORDS = ('京东', '美团', '拼多多', '淘宝')
+SCRAPE_PAGE_SIZE = 10
+
+# 判定为回退的默认变化比例
+DEFAULT_THRESHOLD = 0.1
+
+class StageTimer:
+    """按阶段记录每次调用的耗时"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        """返回记录耗时的包装函数"""
+        samples = self.samples.setdefault(name, [])
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+        return timed
+
+    def run(self, name: str, func: Callable, *args, **kwargs):
+        """调用一次func并记录耗时"""
+        return self.wrap(name, func)(*args, **kwargs)
+
+    def count(self, name: str) -> int:
+        return len(self.samples.get(name, []))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """各阶段的调用次数、总耗时和延迟分位数（毫秒）"""
+        result = {}
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            result[name] = {
+                'count': len(ordered),
+                'total_s': round(sum(ordered), 6),
+                'mean_ms': round(sum(ordered) / len(ordered) * 1000, 4),
+                'p50_ms': round(percentile(ordered, 0.5) * 1000, 4),
+                'p95_ms': round(percentile(ordered, 0.95) * 1000, 4),
+                'max_ms': round(ordered[-1] * 1000, 4)
+            }
+        return result
+
+def percentile(ordered: List[float], q: float) -> float:
+    """已排序样本的分位数（最近秩法）"""
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值RSS（MB），不支持时返回None"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS以字节为单位，Linux以KB为单位
+    return round(peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024, 1)
+
+def bench_scrape_heimao(size: int, workdir: str, server_url: str, timer: StageTimer) -> Dict[str, Any]:
+    """对本地回放服务运行scrape_heimao"""
+    import yaml
+    from scrapers import heimao_scraper
+    from scrapers.heimao_client import HeimaoClient
+
+    with open(os.path.join(ROOT_DIR, 'config', 'sites', 'heimao.yaml'), 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    max_pages = math.ceil(size / (len(SCRAPE_KEYWORDS) * SCRAPE_PAGE_SIZE))
+    config['site_info']['base_url'] = server_url
+    scraping = config['scraping']
+    scraping['api'].update(page_size=SCRAPE_PAGE_SIZE, max_pages=max_pages)
+    scraping['concurrency'].update(keyword_workers=len(SCRAPE_KEYWORDS), page_workers=4, host_rps=100000, burst=100)
+    scraping['adaptive']['enable'] = False
+    scraping['incremental']['enable'] = False
+    scraping['retry']['checkpoint_file'] = None
+    scraping['detail']['enable'] = False
+    scraping['http_cache'] = {'enable': False}
+    config['processing']['dedup'] = {'persistent': False}
+    config['output']['format'] = 'jsonl'
+    config['output']['filename'] = 'heimao_data.jsonl'
+    os.environ['HEIMAO_KEYWORDS'] = ','.join(SCRAPE_KEYWORDS)
+    os.environ.pop('HEIMAO_COOKIE', None)
+
+    HeimaoClient.search_page = timer.wrap('search_request', HeimaoClient.search_page)
+    heimao_scraper.ComplaintSink.write_page = timer.wrap('write_page', heimao_scraper.ComplaintSink.write_page)
+    result = timer.run('scrape_heimao', heimao_scraper.scrape_heimao, config, os.path.join(workdir, 'output'))
+    return {'requests': timer.count('search_request'), 'records': result['count']}
+
+def bench_prepare_analysis(size: int, workdir: str, dataset: str, timer: StageTimer) -> Dict[str, Any]:
+    """AIAnalyzer读取投诉数据并准备分析内容（不调用AI接口）"""
+    import yaml
+    from ai_analyzer import AIAnalyzer
+
+    # 跳过__init__中的AI提供商配置，只使用数据处理部分
+    analyzer = AIAnalyzer.__new__(AIAnalyzer)
+    analyzer.file_path = dataset
+    analyzer.site_id = 'heimao'
+    with open(os.path.join(ROOT_DIR, 'config', 'settings.yaml'), 'r', encoding='utf-8') as f:
+        analyzer.settings = yaml.safe_load(f)
+    timer.run('load_data', analyzer.load_data)
+    content = timer.run('prepare_analysis_content', analyzer.prepare_analysis_content)
+    return {'records': len(analyzer.data), 'content_chars': len(content or '')}
+
+def bench_prepare_message(size: int, workdir: str, dataset: str, timer: StageTimer) -> Dict[str, Any]:
+    """Notifier读取AI分析结果并生成通知消息（不发送）"""
+    import yaml
+    from notify import Notifier
+
+    notifier = Notifier.__new__(Notifier)
+    notifier.file_path = dataset
+    notifier.site_id = 'heimao'
+    with open(os.path.join(ROOT_DIR, 'config', 'settings.yaml'), 'r', encoding='utf-8') as f:
+        notifier.settings = yaml.safe_load(f)
+    # settings.yaml中的模板使用工作流生成器的占位符，prepare_message无法填充，这里使用其内置的默认模板
+    notifier.settings.setdefault('notification', {}).pop('template', None)
+    timer.run('load_result', notifier.load_result)
+    message = timer.run('prepare_message', notifier.prepare_message)
+    return {'records': len(notifier.result_data), 'message_chars': len(message or '')}
+
+def bench_firecrawl_mock(size: int, workdir: str, timer: StageTimer) -> Dict[str, Any]:
+    """FirecrawlScraper模拟模式下逐个抓取URL"""
+    os.environ.pop('FIRECRAWL_API_KEY', None)
+    os.environ.pop('HTTP_CACHE_MODE', None)
+    from scrapers.firecrawl_integration import FirecrawlScraper
+
+    scraper = FirecrawlScraper('firecrawl_example', os.path.join(ROOT_DIR, 'config', 'sites', 'firecrawl_example.yaml'))
+    # 请求方案只编译一次，request_setup为每个URL构造SDK参数和缓存键的开销（模拟模式的scrape_url不经过这一步）
+    plan = timer.run('scrape_plan', lambda: scraper.scrape_plan)
+    request_setup = timer.wrap('request_setup', lambda url: (plan.request_params(url), plan.cache_request(url)))
+    scrape_url = timer.wrap('scrape_url', scraper.scrape_url)
+    results = []
+    for i in range(size):
+        url = f"https://example.com/page/{i}"
+        request_setup(url)
+        results.append(scrape_url(url))
+    return {'requests': size, 'records': sum(1 for result in results if result.get('success'))}
+
+def run_worker(args) -> Dict[str, Any]:
+    """子进程：运行单个用例并返回测量结果"""
+    logging.disable(logging.INFO)
+    timer = StageTimer()
+    start = time.perf_counter()
+    try:
+        if args.worker == 'scrape_heimao':
+            counts = bench_scrape_heimao(args.size, args.workdir, args.server_url, timer)
+        elif args.worker == 'prepare_analysis':
+            counts = bench_prepare_analysis(args.size, args.workdir, args.dataset, timer)
+        elif args.worker == 'prepare_message':
+            counts = bench_prepare_message(args.size, args.workdir, args.dataset, timer)
+        else:
+            counts = bench_firecrawl_mock(args.size, args.workdir, timer)
+    except ImportError as e:
+        return {'status': 'skipped', 'reason': f"缺少依赖: {e}"}
+    elapsed = time.perf_counter() - start
+
+    result = {'status': 'ok', 'seconds': round(elapsed, 4), **counts}
+    if 'requests' in counts:
+        result['requests_per_sec'] = round(counts['requests'] / elapsed, 1)
+    result['records_per_sec'] = round(counts['records'] / elapsed, 1)
+    result['peak_rss_mb'] = peak_rss_mb()
+    result['stages'] = timer.summary()
+    return result
+
+def prepare_dataset(case: str, size: int, workdir: str) -> Optional[str]:
+    """在父进程中生成用例所需的数据文件，不计入子进程的耗时和内存"""
+    from datasets import write_analysis_result, write_complaints
+
+    if case == 'prepare_analysis':
+        return write_complaints(os.path.join(workdir, f'complaints_{size}.jsonl'), size)
+    if case == 'prepare_message':
+        return write_analysis_result(os.path.join(workdir, f'analysis_result_{size}.tsv'), size)
+    return None
+
+def run_case(case: str, size: int, workdir: str, server_url: Optional[str]) -> Dict[str, Any]:
+    """在子进程中运行一个用例"""
+    case_dir = tempfile.mkdtemp(prefix=f'{case}_{size}_', dir=workdir)
+    command = [sys.executable, os.path.abspath(__file__), '--worker', case, '--size', str(size), '--workdir', case_dir]
+    dataset = prepare_dataset(case, size, case_dir)
+    if dataset:
+        command += ['--dataset', dataset]
+    if server_url:
+        command += ['--server-url', server_url]
+    completed = subprocess.run(command, cwd=case_dir, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'case': case, 'size': size, 'status': 'error', 'reason': completed.stderr.strip().splitlines()[-1:]}
+    return {'case': case, 'size': size, **json.loads(completed.stdout.strip().splitlines()[-1])}
+
+def git_commit() -> Optional[str]:
+    """当前提交号，不在git仓库中时返回None"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    与基准结果对比，返回回退的用例
+
+    记录处理速率下降或峰值RSS上升超过threshold比例时视为回退
+    """
+    previous = {(row['case'], row['size']): row for row in baseline.get('results', []) if row.get('status') == 'ok'}
+    regressions = []
+    for row in results:
+        old = previous.get((row['case'], row['size']))
+        if row.get('status') != 'ok' or old is None:
+            continue
+        checks = (('records_per_sec', -1), ('peak_rss_mb', 1))
+        for metric, direction in checks:
+            if not old.get(metric) or row.get(metric) is None:
+                continue
+            change = (row[metric] - old[metric]) / old[metric]
+            row.setdefault('change', {})[metric] = round(change, 4)
+            if change * direction > threshold:
+                regressions.append({'case': row['case'], 'size': row['size'], 'metric': metric,
+                                    'baseline': old[metric], 'current': row[metric], 'change': round(change, 4)})
+    return regressions
+
+def print_results(results: List[Dict[str, Any]], header: bool = True):
+    if header:
+        print(f"{'case':<18} {'size':>8} {'seconds':>9} {'req/s':>10} {'records/s':>12} {'peak MB':>8}  stages (p50/p95 ms)")
+    for row in results:
+        if row.get('status') != 'ok':
+            print(f"{row['case']:<18} {row['size']:>8}  {row.get('status')}: {row.get('reason')}")
+            continue
+        stages = ', '.join(f"{name} {stage['p50_ms']:.2f}/{stage['p95_ms']:.2f}" for name, stage in row['stages'].items())
+        requests_per_sec = row.get('requests_per_sec')
+        print(f"{row['case']:<18} {row['size']:>8} {row['seconds']:>9.3f} "
+              f"{requests_per_sec if requests_per_sec is not None else '-':>10} {row['records_per_sec']:>12} "
+              f"{row['peak_rss_mb'] if row['peak_rss_mb'] is not None else '-':>8}  {stages}")
+
+def main():
+    parser = argparse.ArgumentParser(description='采集→分析→通知全流程基准测试')
+    parser.add_argument('--cases', default=','.join(CASES), help=f"逗号分隔的用例，可选 {', '.join(CASES)}")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='逗号分隔的数据规模（记录条数）')
+    parser.add_argument('--latency', type=float, default=0, help='回放服务的平均延迟（毫秒）')
+    parser.add_argument('--output', help='结果JSON文件路径，或保存结果的目录')
+    parser.add_argument('--baseline', help='用于对比的基准结果JSON文件')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='判定为回退的变化比例')
+    parser.add_argument('--fail-on-regression', action='store_true', help='存在回退时以非零状态退出')
+    # 以下参数由父进程传给子进程
+    parser.add_argument('--worker', choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--dataset', help=argparse.SUPPRESS)
+    parser.add_argument('--server-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args), ensure_ascii=False))
+        return
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"未知的用例: {', '.join(sorted(unknown))}")
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    from fixture_server import FixtureServer
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as workdir:
+        for case in cases:
+            for size in sizes:
+                if case == 'scrape_heimao':
+                    pages = math.ceil(size / (len(SCRAPE_KEYWORDS) * SCRAPE_PAGE_SIZE))
+                    with FixtureServer(synthetic=True, pages=pages, latency=args.latency / 1000) as server:
+                        row = run_case(case, size, workdir, server.url)
+                        row['server'] = dict(server.stats)
+                else:
+                    row = run_case(case, size, workdir, None)
+                results.append(row)
+                print_results([row], header=not results[:-1])
+
+    report = {
+        'benchmark': 'pipeline',
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        report['baseline'] = {'commit': baseline.get('commit'), 'regressions': regressions}
+        print(f"\n与 {args.baseline}（提交 {baseline.get('commit')}）对比:")
+        for item in regressions:
+            print(f"  回退: {item['case']} size={item['size']} {item['metric']} "
+                  f"{item['baseline']} -> {item['current']} ({item['change']:+.1%})")
+        if not regressions:
+            print("  未发现超过阈值的回退")
+
+    if args.output:
+        path = args.output
+        if os.path.isdir(path) or path.endswith(os.sep):
+            os.makedirs(path, exist_ok=True)
+            path = os.path.join(path, f"pipeline-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit'] or 'local'}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {path}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+签名生成基准测试
+对比改造前的generate_signature（每次重建字符表、16次random.choice）与HeimaoSigner的单次签名和批量签名，
+并换算成按每分钟请求数计算的签名耗时占比
+
+用法:
+    python benchmarks/bench_signer.py
+    python benchmarks/bench_signer.py --requests 20000 --repeat 10 --rate 1000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+
+# 导入工具
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from scrapers.heimao_client import SIGNATURE_SECRET, HeimaoSigner
+
+def legacy_generate_signature(keyword="", page=1, page_size=10, ts=None, rs=None):
+    """改造前的实现，ts和rs仅用于校验签名一致"""
+    c = ts or str(int(time.time() * 1000))
+    a = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", "m", "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z", "A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M", "N", "O", "P", "Q", "R", "S", "T", "U", "V", "W", "X", "Y", "Z"]
+    h = rs or ''.join(random.choice(a) for i in range(16))
+    bb = [SIGNATURE_SECRET, keyword or '', str(page_size), c, str(page), h]
+    bb.sort()
+    return c, h, hashlib.sha256((''.join(bb)).encode('utf-8')).hexdigest()
+
+def build_requests(count):
+    """生成(关键词, 页码)列表，关键词含中文、英文和空关键词"""
+    keywords = ['', '京东', '美团外卖', 'refund', '拼多多 退款', '#话费']
+    return [(keywords[i % len(keywords)], i // len(keywords) % 50 + 1) for i in range(count)]
+
+def check_signatures(signer, requests_to_sign):
+    """固定ts和rs时两种实现的签名应完全一致"""
+    for keyword, page in requests_to_sign[:500]:
+        ts, rs, signature = signer.sign(keyword, page, 10)
+        if legacy_generate_signature(keyword, page, 10, ts, rs) != (ts, rs, signature):
+            raise AssertionError(f"签名不一致: {keyword!r} 第{page}页")
+
+def measure(func, repeat):
+    """多次运行取最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='签名生成基准测试')
+    parser.add_argument('--requests', type=int, default=10000, help='每轮签名的请求数')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测试重复次数')
+    parser.add_argument('--rate', type=int, default=1000, help='换算签名耗时占比所用的每分钟请求数')
+    parser.add_argument('--output', help='将结果保存为JSON文件')
+    args = parser.parse_args()
+
+    signer = HeimaoSigner()
+    requests_to_sign = build_requests(args.requests)
+    check_signatures(signer, requests_to_sign)
+
+    implementations = {
+        'legacy_generate_signature': lambda: [legacy_generate_signature(k, p, 10) for k, p in requests_to_sign],
+        'HeimaoSigner.sign': lambda: [signer.sign(k, p, 10) for k, p in requests_to_sign],
+        'HeimaoSigner.sign_many': lambda: signer.sign_many(requests_to_sign, 10)
+    }
+
+    results = []
+    baseline = None
+    for name, func in implementations.items():
+        elapsed = measure(func, args.repeat)
+        baseline = baseline or elapsed
+        us_per_request = elapsed / len(requests_to_sign) * 1e6
+        results.append({
+            'implementation': name,
+            'requests': len(requests_to_sign),
+            'seconds': round(elapsed, 6),
+            'us_per_request': round(us_per_request, 3),
+            'speedup': round(baseline / elapsed, 2),
+            # 按每分钟rate个请求计算，签名占用的CPU时间占一分钟的比例
+            'cpu_share_at_rate': us_per_request * args.rate / 60e6
+        })
+
+    print(f"{'implementation':<28} {'requests':>9} {'us/req':>9} {'speedup':>8} {f'cpu@{args.rate}/min':>14}")
+    for row in results:
+        print(f"{row['implementation']:<28} {row['requests']:>9} {row['us_per_request']:>9.3f} "
+              f"{row['speedup']:>7.2f}x {row['cpu_share_at_rate']:>13.5%}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+文本清洗基准测试
+对比原remove_html_tags（未预编译的re.sub）与utils.text_normalizer在黑猫投诉样例数据上的耗时
+
+样例数据是已清洗过的输出，除原样测试外，还会为每条记录加上搜索接口常见的高亮标签和HTML实体，
+模拟接口返回的原始字段
+
+用法:
+    python benchmarks/bench_text_normalizer.py
+    python benchmarks/bench_text_normalizer.py --file data/daily/2025-05-13/heimao_data.json --repeat 20 --scale 100
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+# 导入工具
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from utils.text_normalizer import TextNormalizer, strip_tags
+
+DEFAULT_SAMPLE = os.path.join('data', 'daily', '2025-05-13', 'heimao_data.json')
+
+# 格式化时需要清洗的字段（对应接口的title、cotitle、summary）
+TEXT_FIELDS = ('title', 'company', 'content')
+
+def legacy_remove_html_tags(text):
+    """改造前的实现：每次调用都通过re.sub查找模式"""
+    if not text:
+        return text
+    clean_text = re.sub(r'<[^>]+>', '', text)
+    return clean_text
+
+def load_corpus(path, scale):
+    """读取样例数据，返回(原样字段列表, 加上标签和实体的字段列表)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        complaints = json.load(f)['complaints']
+
+    plain = []
+    marked = []
+    for item in complaints:
+        for field in TEXT_FIELDS:
+            text = item.get(field) or ''
+            plain.append(text)
+            head, tail = text[:2], text[2:]
+            marked.append(f'<span class="s-red">{head}</span>{tail}'.replace(' ', '&nbsp;') + '&quot;&#39;')
+    return plain * scale, marked * scale
+
+def measure(func, texts, repeat):
+    """多次运行取最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='文本清洗基准测试')
+    parser.add_argument('--file', default=DEFAULT_SAMPLE, help='黑猫投诉样例数据文件')
+    parser.add_argument('--repeat', type=int, default=10, help='每项测试重复次数')
+    parser.add_argument('--scale', type=int, default=50, help='样例数据放大倍数')
+    parser.add_argument('--output', help='将结果保存为JSON文件')
+    args = parser.parse_args()
+
+    plain, marked = load_corpus(args.file, args.scale)
+    implementations = {
+        'legacy_remove_html_tags': legacy_remove_html_tags,
+        'strip_tags': strip_tags,
+        'TextNormalizer': TextNormalizer()
+    }
+
+    results = []
+    for corpus_name, texts in (('plain', plain), ('markup', marked)):
+        baseline = None
+        for name, func in implementations.items():
+            elapsed = measure(func, texts, args.repeat)
+            baseline = baseline or elapsed
+            results.append({
+                'corpus': corpus_name,
+                'implementation': name,
+                'fields': len(texts),
+                'seconds': round(elapsed, 6),
+                'us_per_field': round(elapsed / len(texts) * 1e6, 3),
+                'speedup': round(baseline / elapsed, 2)
+            })
+
+    print(f"{'corpus':<8} {'implementation':<26} {'fields':>8} {'us/field':>10} {'speedup':>8}")
+    for row in results:
+        print(f"{row['corpus']:<8} {row['implementation']:<26} {row['fields']:>8} "
+              f"{row['us_per_field']:>10.3f} {row['speedup']:>7.2f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+基准测试的合成数据集
+生成与爬虫输出结构相同的投诉数据（由回放服务的合成搜索页经格式化得到）以及AI分析结果（TSV），
+规模从1千到100万条，按块生成和写入，生成大数据集时内存占用与块大小相关而与总条数无关
+
+用法:
+    python benchmarks/datasets.py --records 100000 --output /tmp/complaints.jsonl
+    python benchmarks/datasets.py --records 100000 --kind analysis --output /tmp/analysis_result.tsv
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import Any, Dict, Iterator, List
+
+# 导入工具
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(BENCHMARK_DIR), 'src'))
+sys.path.append(BENCHMARK_DIR)
+from fixture_server import synthetic_search_page
+from scrapers.heimao_scraper import build_complaint_transform
+
+# 每次生成的投诉条数
+CHUNK_SIZE = 10000
+
+# AI分析结果的列（与默认提示词要求的输出字段一致）
+ANALYSIS_COLUMNS = ('类别', '主题', '时间信息', '价格', '数量', '特征')
+
+# 合成分析结果的类别
+ANALYSIS_CATEGORIES = ('质量问题', '退款纠纷', '物流延误', '虚假宣传', '售后服务')
+
+def iter_complaints(count: int, keyword: str = '基准', chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    按块生成格式化后的投诉
+
+    Args:
+        count: 投诉总条数
+        keyword: 合成搜索页使用的关键词
+        chunk_size: 每块的条数
+
+    Yields:
+        List[dict]: 一块投诉
+    """
+    transform = build_complaint_transform()
+    page = 1
+    produced = 0
+    while produced < count:
+        size = min(chunk_size, count - produced)
+        items = synthetic_search_page(keyword, page, size, pages=page)['result']['data']['lists']
+        yield transform(items, crawled_at='2025-05-13T09:00:00')
+        produced += size
+        page += 1
+
+def write_complaints(path: str, count: int) -> str:
+    """
+    把投诉写入JSON Lines文件（AIAnalyzer.load_data支持的列表格式）
+
+    Args:
+        path: 输出文件路径
+        count: 投诉条数
+
+    Returns:
+        str: 输出文件路径
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for chunk in iter_complaints(count):
+            f.writelines(json.dumps(item, ensure_ascii=False) + '\n' for item in chunk)
+    return path
+
+def write_analysis_result(path: str, count: int) -> str:
+    """
+    写入合成的AI分析结果（TSV，Notifier.load_result的默认输入格式）
+
+    Args:
+        path: 输出文件路径
+        count: 结果行数
+
+    Returns:
+        str: 输出文件路径
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\t'.join(ANALYSIS_COLUMNS) + '\n')
+        for i in range(count):
+            f.write(f"{ANALYSIS_CATEGORIES[i % len(ANALYSIS_CATEGORIES)]}\t公司{i % 50}的投诉{i}\t2025-05-{i % 28 + 1:02d}"
+                    f"\t{i % 500}\t{i % 7 + 1}\t商品质量问题，要求退款\n")
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description='生成基准测试的合成数据集')
+    parser.add_argument('--records', type=int, default=1000, help='记录条数')
+    parser.add_argument('--kind', choices=['complaints', 'analysis'], default='complaints',
+                        help='complaints：投诉（JSON Lines）；analysis：AI分析结果（TSV）')
+    parser.add_argument('--output', required=True, help='输出文件路径')
+    args = parser.parse_args()
+
+    writer = write_complaints if args.kind == 'complaints' else write_analysis_result
+    writer(args.output, args.records)
+    print(f"已生成 {args.records} 条记录: {args.output}")
+
+if __name__ == "__main__":
+    main()
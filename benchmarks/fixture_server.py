@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+录制/回放测试服务
+在本地代替黑猫投诉和Firecrawl接口，使基准测试和并发调优不依赖真实站点：
+
+- record：作为代理把请求转发到真实站点，并把响应录制为fixture（JSON Lines，每行一个响应，不保存Cookie等请求头）
+- serve：回放录制的fixture；未录制的黑猫搜索页、详情页和Firecrawl scrape/batch scrape/crawl/map/extract接口可按参数合成
+- 回放时可注入延迟、错误响应和风控响应（列表为空但总数大于0），随机种子固定时结果可复现
+
+爬虫指向本服务的方法：黑猫投诉设置site_info.base_url（或HeimaoClient的base_url），
+Firecrawl设置环境变量FIRECRAWL_API_URL。GET /__stats返回请求和注入统计。
+
+用法:
+    python benchmarks/fixture_server.py record --upstream https://tousu.sina.com.cn --fixtures benchmarks/fixtures/heimao.jsonl
+    python benchmarks/fixture_server.py record --upstream https://api.firecrawl.dev --fixtures benchmarks/fixtures/firecrawl.jsonl
+    python benchmarks/fixture_server.py serve --fixtures benchmarks/fixtures/heimao.jsonl --latency 50 --error-rate 0.05 --risk-rate 0.02
+    python benchmarks/fixture_server.py serve --synthetic --pages 100 --port 8765
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import collections
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import requests
+
+# 导入工具
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from utils.http_cache import normalize_request
+
+# 黑猫投诉搜索接口路径
+SEARCH_PATH = '/api/index/s'
+
+# 黑猫投诉详情页路径前缀
+DETAIL_PATH = '/complaint/view/'
+
+# 录制时保留的响应头
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+# 统计接口路径
+STATS_PATH = '/__stats'
+
+# 合成数据的默认页数
+DEFAULT_SYNTHETIC_PAGES = 50
+
+# 合成投诉的起始时间戳（秒），之后每条投诉依次早1分钟
+SYNTHETIC_EPOCH = 1745294834
+
+def fixture_key(method: str, path: str, body: bytes = b'') -> str:
+    """
+    fixture的匹配键：请求方法、路径和排序后的查询参数（忽略ts/rs/signature），POST请求另含请求体
+
+    Args:
+        method: 请求方法
+        path: 包含查询串的请求路径
+        body: 请求体
+
+    Returns:
+        str: 匹配键
+    """
+    payload = None
+    if body:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = body.decode('utf-8', errors='replace')
+    return normalize_request(path, method, body=payload)
+
+class FixtureStore:
+    """fixture存储：同一请求录制了多个响应时按顺序回放（如Firecrawl爬取任务的状态轮询），最后一个重复使用"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: fixture文件路径（JSON Lines），为None时只使用合成响应
+        """
+        self.path = path
+        self._fixtures: Dict[str, List[Dict[str, Any]]] = collections.defaultdict(list)
+        self._served: Dict[str, int] = collections.Counter()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        fixture = json.loads(line)
+                        self._fixtures[fixture['key']].append(fixture)
+
+    def __len__(self) -> int:
+        return sum(len(fixtures) for fixtures in self._fixtures.values())
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """按录制顺序取出下一个响应，没有录制时返回None"""
+        with self._lock:
+            fixtures = self._fixtures.get(key)
+            if not fixtures:
+                return None
+            index = min(self._served[key], len(fixtures) - 1)
+            self._served[key] += 1
+            return fixtures[index]
+
+    def record(self, fixture: Dict[str, Any]):
+        """追加一个录制的响应"""
+        with self._lock:
+            self._fixtures[fixture['key']].append(fixture)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(fixture, ensure_ascii=False) + '\n')
+
+def synthetic_search_page(keyword: str, page: int, page_size: int = 10, pages: int = DEFAULT_SYNTHETIC_PAGES,
+                          base_url: str = '') -> Dict[str, Any]:
+    """
+    合成一页与黑猫投诉搜索接口结构相同的数据，相同参数总是得到相同的结果
+
+    Args:
+        keyword: 搜索关键词
+        page: 页码
+        page_size: 每页数量
+        pages: 总页数，超出时返回空列表
+        base_url: 详情页地址的前缀（如本服务的地址），为空时使用站点的协议相对地址
+
+    Returns:
+        dict: 搜索接口的响应
+    """
+    lists = []
+    if page <= pages:
+        prefix = hashlib.md5(keyword.encode('utf-8')).hexdigest()[:6]
+        for i in range(page_size):
+            index = (page - 1) * page_size + i
+            sn = f"{prefix}{index:08d}"
+            lists.append({'main': {
+                'sn': sn,
+                'title': f"<b>{keyword or '投诉'}</b>第{index}条投诉 &amp; 退款",
+                'cotitle': f"公司{index % 50}",
+                'summary': f"  投诉内容{index}：商品质量问题，要求退款。&nbsp;已联系客服未解决  ",
+                'url': f"{base_url or '//tousu.sina.com.cn'}{DETAIL_PATH}{sn}/",
+                'timestamp': str(SYNTHETIC_EPOCH - index * 60),
+                'status': 6 if index % 3 else 4,
+                'issue': '质量问题',
+                'appeal': '退款',
+                'cost': str(index % 500)
+            }})
+    return {'result': {'status': {'code': 0}, 'data': {
+        'lists': lists,
+        'pager': {'page_amount': pages, 'item_count': pages * page_size, 'current': page}
+    }}}
+
+def risk_control_page(page_size: int = 10) -> Dict[str, Any]:
+    """风控响应：接口正常返回，但列表为空而总数大于0"""
+    return {'result': {'status': {'code': 0}, 'data': {
+        'lists': [],
+        'pager': {'page_amount': 1, 'item_count': page_size}
+    }}}
+
+def synthetic_detail_page(sn: str) -> str:
+    """合成投诉详情页HTML，结构与真实页面中详情解析用到的部分一致"""
+    return f'''<!doctype html><html><head><meta charset="utf-8"><title>{sn}</title></head><body>
+<div class="ts-d-question"><h1 class="article">投诉 {sn}</h1>
+<ul class="ts-q-list"><li><label>[投诉编号]</label>{sn}</li><li><label>[投诉对象]</label><a href="#">某公司</a></li>
+<li><label>[投诉问题]</label>质量问题</li><li><label>[投诉要求]</label>退款</li><li><label>[投诉进度]</label><b>已完成</b></li></ul></div>
+<div class="ts-d-steplist">
+<div class="ts-d-item"><span class="u-name">用户{sn[-4:]}</span><span class="u-status">发起投诉</span><span class="u-date">2025-05-12 10:00</span>
+<div class="ts-d-cont"><p>商品质量问题，要求退款。</p><p>已联系客服未解决</p></div></div>
+<div class="ts-d-item"><span class="u-name">某公司</span><span class="u-status">商家回复</span><span class="u-date">2025-05-13 09:00</span>
+<div class="ts-d-cont">已处理</div></div>
+</div><div class="footer">{'-' * 4096}</div></body></html>'''
+
+# 合成的批量抓取任务：任务ID -> URL列表
+_synthetic_batches: Dict[str, List[str]] = {}
+
+def synthetic_firecrawl(method: str, path: str, payload: Dict[str, Any], skip: int = 0) -> Optional[Dict[str, Any]]:
+    """合成Firecrawl v1接口的响应（任务状态按skip跳过已返回的页面），不支持的接口返回None"""
+    def document(url):
+        return {'markdown': f"# {url}\n\n合成的页面内容", 'metadata': {'title': url, 'sourceURL': url, 'statusCode': 200}}
+
+    if method == 'POST' and path == '/v1/scrape':
+        return {'success': True, 'data': document(payload.get('url', ''))}
+    if method == 'POST' and path == '/v1/map':
+        url = payload.get('url', '').rstrip('/')
+        return {'success': True, 'links': [f"{url}/page/{i}" for i in range(payload.get('limit') or 20)]}
+    if method == 'POST' and path in ('/v1/crawl', '/v1/extract'):
+        job = hashlib.md5(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+        return {'success': True, 'id': job, 'url': f"{path}/{job}"}
+    if method == 'GET' and path.startswith('/v1/crawl/'):
+        return {'success': True, 'status': 'completed', 'total': 3, 'completed': 3, 'creditsUsed': 3,
+                'expiresAt': '2099-01-01T00:00:00Z', 'data': [document(f"https://example.com/page/{i}") for i in range(skip, 3)]}
+    if method == 'POST' and path == '/v1/batch/scrape':
+        job = hashlib.md5(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+        _synthetic_batches[job] = list(payload.get('urls') or [])
+        return {'success': True, 'id': job, 'url': f"{path}/{job}"}
+    if method == 'GET' and path.startswith('/v1/batch/scrape/'):
+        urls = _synthetic_batches.get(path.rsplit('/', 1)[-1], [])
+        return {'success': True, 'status': 'completed', 'total': len(urls), 'completed': len(urls),
+                'creditsUsed': len(urls), 'expiresAt': '2099-01-01T00:00:00Z', 'data': [document(url) for url in urls[skip:]]}
+    if method == 'GET' and path.startswith('/v1/extract/'):
+        return {'success': True, 'status': 'completed', 'data': {}}
+    return None
+
+class FixtureServer(ThreadingHTTPServer):
+    """
+    回放（或录制）服务，可在基准测试中直接使用：
+
+        with FixtureServer(synthetic=True, latency=0.05) as server:
+            config['site_info']['base_url'] = server.url
+    """
+
+    daemon_threads = True
+
+    def __init__(self, store: Optional[FixtureStore] = None, host: str = '127.0.0.1', port: int = 0,
+                 upstream: Optional[str] = None, synthetic: bool = False, pages: int = DEFAULT_SYNTHETIC_PAGES,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 risk_rate: float = 0.0, seed: Optional[int] = None, rewrite_host: bool = True):
+        """
+        Args:
+            store: fixture存储，为None时不回放录制的响应
+            host: 监听地址
+            port: 监听端口，0为随机端口
+            upstream: 录制模式下转发的目标站点，为None时为回放模式
+            synthetic: 没有录制的响应时合成黑猫投诉和Firecrawl的响应
+            pages: 合成的搜索结果总页数
+            latency: 每个请求的平均延迟（秒）
+            jitter: 延迟的随机波动范围（秒）
+            error_rate: 返回错误状态码的概率
+            error_status: 注入的错误状态码
+            risk_rate: 搜索接口返回风控响应的概率
+            seed: 随机种子，固定后注入的错误和风控可复现
+            rewrite_host: 回放时把响应中录制站点的地址替换为本服务的地址（详情页链接也指向本服务）
+        """
+        super().__init__((host, port), FixtureHandler)
+        self.store = store if store is not None else FixtureStore()
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.synthetic = synthetic
+        self.pages = pages
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.risk_rate = risk_rate
+        self.rewrite_host = rewrite_host
+        self.stats = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._session = requests.Session() if upstream else None
+
+    @property
+    def url(self) -> str:
+        """本服务的地址"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, name='fixture-server', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止服务"""
+        self.shutdown()
+        self.server_close()
+        if self._session is not None:
+            self._session.close()
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def chance(self, rate: float) -> bool:
+        """按概率决定是否注入（线程安全，使用固定种子的随机数）"""
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def delay(self) -> float:
+        """本次请求的延迟秒数"""
+        if self.latency <= 0 and self.jitter <= 0:
+            return 0.0
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def rewrite(self, body: str, host: str) -> str:
+        """把响应中录制站点的地址（含协议相对地址和JSON转义的写法）替换为本服务的地址"""
+        if not self.rewrite_host or not host:
+            return body
+        local = self.url.split('//', 1)[1]
+        pattern = r'(?:https?:)?(\\?/\\?/)' + re.escape(host)
+        return re.sub(pattern, lambda m: 'http:' + m.group(1) + local, body)
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """按请求录制、回放或合成响应"""
+
+    server: FixtureServer
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，开启Nagle算法时会与客户端的延迟确认叠加，每个请求多出约40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _send(self, status: int, body, headers: Optional[Dict[str, str]] = None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False)
+            headers = {'Content-Type': 'application/json; charset=utf-8', **(headers or {})}
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method: str):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        path = urllib.parse.urlsplit(self.path).path
+        if path == STATS_PATH:
+            self._send(200, dict(self.server.stats))
+            return
+
+        self.server.count('requests')
+        if not self.server.upstream and self._inject(path):
+            return
+
+        key = fixture_key(method, self.path, body)
+        if self.server.upstream:
+            self._record(method, key, body)
+            return
+        fixture = self.server.store.lookup(key)
+        if fixture is not None:
+            self._replay(fixture)
+            return
+        if self.server.synthetic and self._synthesize(method, path, body):
+            return
+        self.server.count('missing')
+        self._send(404, {'error': 'no fixture', 'key': key})
+
+    def _inject(self, path: str) -> bool:
+        """按配置注入延迟、错误和风控响应（仅回放模式），已返回注入的响应时为True"""
+        delay = self.server.delay()
+        if delay:
+            time.sleep(delay)
+        if self.server.chance(self.server.error_rate):
+            self.server.count('injected_errors')
+            self._send(self.server.error_status, {'error': 'injected error'})
+            return True
+        if path == SEARCH_PATH and self.server.chance(self.server.risk_rate):
+            self.server.count('injected_risk')
+            query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+            self._send(200, risk_control_page(int(query.get('page_size', 10))))
+            return True
+        return False
+
+    def _replay(self, fixture: Dict[str, Any]):
+        self.server.count('replayed')
+        headers = dict(fixture.get('headers') or {})
+        if headers.get('ETag') and self.headers.get('If-None-Match') == headers['ETag']:
+            self._send(304, b'', {'ETag': headers['ETag']})
+            return
+        self._send(fixture['status'], self.server.rewrite(fixture['body'], fixture.get('host', '')), headers)
+
+    def _synthesize(self, method: str, path: str, body: bytes) -> bool:
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query, keep_blank_values=True))
+        if path == SEARCH_PATH:
+            page = synthetic_search_page(query.get('keywords', ''), int(query.get('page', 1)),
+                                         int(query.get('page_size', 10)), self.server.pages, self.server.url)
+            self.server.count('synthetic')
+            self._send(200, page)
+            return True
+        if path.startswith(DETAIL_PATH):
+            sn = path[len(DETAIL_PATH):].strip('/')
+            etag = f'"{sn}"'
+            self.server.count('synthetic')
+            if self.headers.get('If-None-Match') == etag:
+                self._send(304, b'', {'ETag': etag})
+            else:
+                self._send(200, synthetic_detail_page(sn), {'Content-Type': 'text/html; charset=utf-8', 'ETag': etag})
+            return True
+        payload = json.loads(body) if body else {}
+        response = synthetic_firecrawl(method, path, payload, int(query.get('skip') or 0))
+        if response is None:
+            return False
+        self.server.count('synthetic')
+        self._send(200, response)
+        return True
+
+    def _record(self, method: str, key: str, body: bytes):
+        """转发到真实站点并录制响应；Cookie、Authorization等请求头只转发，不保存"""
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() not in ('host', 'content-length', 'accept-encoding', 'connection')}
+        url = self.server.upstream + self.path
+        try:
+            response = self.server._session.request(method, url, headers=headers, data=body or None, timeout=60)
+        except requests.RequestException as e:
+            self.server.count('upstream_errors')
+            self._send(502, {'error': str(e)})
+            return
+        kept = {name: response.headers[name] for name in RECORDED_HEADERS if response.headers.get(name)}
+        self.server.store.record({
+            'key': key,
+            'method': method,
+            'path': self.path,
+            'host': urllib.parse.urlsplit(self.server.upstream).netloc,
+            'status': response.status_code,
+            'headers': kept,
+            'body': response.text,
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        })
+        self.server.count('recorded')
+        self._send(response.status_code, response.content, kept)
+
+def main():
+    parser = argparse.ArgumentParser(description='录制/回放测试服务')
+    parser.add_argument('mode', choices=['record', 'serve'], help='record：代理并录制；serve：回放')
+    parser.add_argument('--fixtures', help='fixture文件路径（JSON Lines）')
+    parser.add_argument('--upstream', help='录制模式下转发的目标站点，如 https://tousu.sina.com.cn')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--synthetic', action='store_true', help='没有录制的响应时合成响应')
+    parser.add_argument('--pages', type=int, default=DEFAULT_SYNTHETIC_PAGES, help='合成的搜索结果总页数')
+    parser.add_argument('--latency', type=float, default=0, help='平均延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='延迟的随机波动范围（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回错误状态码的概率')
+    parser.add_argument('--error-status', type=int, default=503, help='注入的错误状态码')
+    parser.add_argument('--risk-rate', type=float, default=0, help='搜索接口返回风控响应的概率')
+    parser.add_argument('--seed', type=int, help='随机种子')
+    parser.add_argument('--no-rewrite', action='store_true', help='回放时不替换响应中录制站点的地址')
+    args = parser.parse_args()
+
+    if args.mode == 'record' and not (args.upstream and args.fixtures):
+        parser.error('record模式需要--upstream和--fixtures')
+    if args.mode == 'serve' and not (args.fixtures or args.synthetic):
+        parser.error('serve模式需要--fixtures或--synthetic')
+
+    store = FixtureStore(args.fixtures)
+    server = FixtureServer(
+        store, args.host, args.port,
+        upstream=args.upstream if args.mode == 'record' else None,
+        synthetic=args.synthetic, pages=args.pages,
+        latency=args.latency / 1000, jitter=args.jitter / 1000,
+        error_rate=args.error_rate, error_status=args.error_status, risk_rate=args.risk_rate,
+        seed=args.seed, rewrite_host=not args.no_rewrite
+    )
+    target = f"，转发到 {server.upstream}" if server.upstream else f"，已加载 {len(store)} 个响应"
+    print(f"{args.mode} 服务已启动: {server.url}{target}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(dict(server.stats), ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
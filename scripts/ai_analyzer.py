@@ -42,6 +42,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger('ai_analyzer')
 
+# 导入工具
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+from utils.metrics import default_registry, write_metrics
+
+# 各环节的指标
+default_registry.describe('ai_load_duration_seconds', "读取爬虫数据文件耗时（秒）")
+default_registry.describe('ai_records_loaded_total', "读取的记录条数")
+default_registry.describe('ai_prepare_duration_seconds', "准备分析内容耗时（秒）")
+default_registry.describe('ai_request_duration_seconds', "AI接口调用耗时（秒）", buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300))
+default_registry.describe('ai_requests_total', "AI接口调用次数（status：success/error）")
+default_registry.describe('ai_response_chars_total', "AI返回结果的字符数")
+default_registry.describe('ai_save_duration_seconds', "保存分析结果耗时（秒）")
+default_registry.describe('ai_runs_skipped_total', "数据与上一次快照相比没有变化而跳过的分析次数")
+
 class AIAnalyzer:
     """AI分析器类，处理爬虫数据并使用AI进行分析"""
     
@@ -76,6 +90,8 @@ class AIAnalyzer:
         # 数据
         self.data = None
         self.analysis_result = None
+        self.is_delta = False  # 数据文件是否只包含与上一次快照相比的变化
+        self.skipped = False
     
     def _load_settings(self):
         """加载设置文件"""
@@ -152,6 +168,10 @@ class AIAnalyzer:
     
     def load_data(self):
         """加载爬虫数据"""
+        with default_registry.span('ai_load_duration_seconds'):
+            return self._load_data()
+    
+    def _load_data(self):
         try:
             # 获取文件扩展名
             file_ext = self.file_path.split('.')[-1].lower()
@@ -159,6 +179,13 @@ class AIAnalyzer:
             if file_ext == 'json':
                 with open(self.file_path, 'r', encoding='utf-8') as f:
                     self.data = json.load(f)
+                # Firecrawl爬取文件的页面在data中，带previous_snapshot时只包含新增和内容变化的页面
+                if isinstance(self.data, dict) and isinstance(self.data.get('data'), list):
+                    self.is_delta = 'previous_snapshot' in self.data
+                    self.data = self.data['data']
+            elif file_ext == 'jsonl':
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    self.data = [json.loads(line) for line in f if line.strip()]
             elif file_ext == 'csv':
                 self.data = pd.read_csv(self.file_path).to_dict('records')
             elif file_ext == 'tsv':
@@ -168,6 +195,7 @@ class AIAnalyzer:
                 raise ValueError(f"不支持的文件格式: {file_ext}")
                 
             logger.info(f"成功加载数据文件: {self.file_path}, 共{len(self.data)}条记录")
+            default_registry.inc('ai_records_loaded_total', len(self.data))
             return True
         except Exception as e:
             logger.error(f"加载数据文件失败: {e}")
@@ -175,6 +203,10 @@ class AIAnalyzer:
     
     def prepare_analysis_content(self):
         """准备分析内容"""
+        with default_registry.span('ai_prepare_duration_seconds'):
+            return self._prepare_analysis_content()
+    
+    def _prepare_analysis_content(self):
         # 如果数据是列表且不为空
         if isinstance(self.data, list) and self.data:
             # 获取限制条数
@@ -283,6 +315,13 @@ class AIAnalyzer:
             logger.error("无法加载数据，分析终止")
             return False
         
+        # 页面内容与上一次快照相比没有变化时不调用AI
+        if self.is_delta and not self.data:
+            logger.info("数据与上一次快照相比没有变化，跳过分析")
+            default_registry.inc('ai_runs_skipped_total')
+            self.skipped = True
+            return True
+        
         # 准备分析内容
         content = self.prepare_analysis_content()
         if not content:
@@ -292,18 +331,22 @@ class AIAnalyzer:
         # 根据提供商进行分析
         logger.info(f"开始使用{self.ai_provider.upper()}分析数据...")
         
-        if self.ai_provider == 'gemini':
-            self.analysis_result = self.analyze_with_gemini(content)
-        elif self.ai_provider == 'openai':
-            self.analysis_result = self.analyze_with_openai(content)
-        else:
-            logger.error(f"不支持的AI提供商: {self.ai_provider}")
-            return False
+        with default_registry.span('ai_request_duration_seconds', provider=self.ai_provider):
+            if self.ai_provider == 'gemini':
+                self.analysis_result = self.analyze_with_gemini(content)
+            elif self.ai_provider == 'openai':
+                self.analysis_result = self.analyze_with_openai(content)
+            else:
+                logger.error(f"不支持的AI提供商: {self.ai_provider}")
+                return False
         
         # 检查分析结果
         if not self.analysis_result:
             logger.error("分析失败，未获得结果")
+            default_registry.inc('ai_requests_total', provider=self.ai_provider, status='error')
             return False
+        default_registry.inc('ai_requests_total', provider=self.ai_provider, status='success')
+        default_registry.inc('ai_response_chars_total', len(self.analysis_result), provider=self.ai_provider)
         
         logger.info(f"分析完成，获得结果（长度：{len(self.analysis_result)}字符）")
         return True
@@ -325,14 +368,26 @@ class AIAnalyzer:
         
         try:
             # 保存结果
-            with open(self.output_path, 'w', encoding='utf-8') as f:
-                f.write(self.analysis_result)
+            with default_registry.span('ai_save_duration_seconds'):
+                with open(self.output_path, 'w', encoding='utf-8') as f:
+                    f.write(self.analysis_result)
             
             logger.info(f"成功保存分析结果到: {self.output_path}")
             return True
         except Exception as e:
             logger.error(f"保存分析结果失败: {e}")
             return False
+    
+    def save_metrics(self):
+        """
+        根据advanced.metrics配置把本次分析的指标写入数据文件所在目录下的<站点ID>_analysis_metrics.prom
+        
+        Returns:
+            str: 指标文件路径，未启用时返回None
+        """
+        metrics_config = self.settings.get('advanced', {}).get('metrics')
+        return write_metrics(os.path.dirname(os.path.abspath(self.file_path)), f"{self.site_id}_analysis",
+                             metrics_config, prefix='ai_')
 
 def main():
     """主函数"""
@@ -358,18 +413,24 @@ def main():
             settings_path=args.settings
         )
         
-        # 分析数据
-        if analyzer.analyze():
-            # 保存结果
-            if analyzer.save_result():
-                logger.info("分析任务完成")
-                return 0
+        # 分析数据，无论成功与否都保存运行指标
+        try:
+            if analyzer.analyze():
+                if analyzer.skipped:
+                    logger.info("没有需要分析的新数据，分析任务完成")
+                    return 0
+                # 保存结果
+                if analyzer.save_result():
+                    logger.info("分析任务完成")
+                    return 0
+                else:
+                    logger.error("保存分析结果失败")
+                    return 1
             else:
-                logger.error("保存分析结果失败")
+                logger.error("分析数据失败")
                 return 1
-        else:
-            logger.error("分析数据失败")
-            return 1
+        finally:
+            analyzer.save_metrics()
     except Exception as e:
         logger.exception(f"分析过程中发生错误: {e}")
         return 1
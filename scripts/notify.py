@@ -26,6 +26,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger('notify')
 
+# 导入工具
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+from utils.metrics import default_registry, write_metrics
+
+# 各环节的指标（channel标签：dingtalk/feishu/wechat）
+default_registry.describe('notify_load_duration_seconds', "读取分析结果文件耗时（秒）")
+default_registry.describe('notify_prepare_duration_seconds', "生成通知消息耗时（秒）")
+default_registry.describe('notify_send_duration_seconds', "发送通知耗时（秒）")
+default_registry.describe('notify_sent_total', "通知发送次数（status：success/failure）")
+default_registry.describe('notify_message_chars_total', "通知消息的字符数")
+
 class Notifier:
     """通知发送器类，支持多种通知渠道"""
     
@@ -87,6 +98,10 @@ class Notifier:
     
     def load_result(self):
         """加载分析结果"""
+        with default_registry.span('notify_load_duration_seconds'):
+            return self._load_result()
+    
+    def _load_result(self):
         try:
             # 获取文件扩展名
             file_ext = self.file_path.split('.')[-1].lower()
@@ -120,6 +135,12 @@ class Notifier:
     
     def prepare_message(self):
         """准备通知消息内容"""
+        with default_registry.span('notify_prepare_duration_seconds'):
+            message = self._prepare_message()
+        default_registry.inc('notify_message_chars_total', len(message))
+        return message
+    
+    def _prepare_message(self):
         notification_settings = self.settings.get('notification', {})
         template = notification_settings.get('template', '分析完成，共有{count}条记录')
         
@@ -346,22 +367,16 @@ class Notifier:
         # 准备消息内容
         message = self.prepare_message()
         
-        # 发送各渠道通知
+        # 发送各渠道通知（钉钉、飞书、企业微信）
         success_count = 0
-        
-        # 钉钉通知
-        if self.settings.get('notification', {}).get('dingtalk', {}).get('enabled', False):
-            if self.send_dingtalk(message):
-                success_count += 1
-        
-        # 飞书通知
-        if self.settings.get('notification', {}).get('feishu', {}).get('enabled', False):
-            if self.send_feishu(message):
-                success_count += 1
-        
-        # 企业微信通知
-        if self.settings.get('notification', {}).get('wechat', {}).get('enabled', False):
-            if self.send_wechat(message):
+        channels = (('dingtalk', self.send_dingtalk), ('feishu', self.send_feishu), ('wechat', self.send_wechat))
+        for channel, send in channels:
+            if not self.settings.get('notification', {}).get(channel, {}).get('enabled', False):
+                continue
+            with default_registry.span('notify_send_duration_seconds', channel=channel):
+                sent = send(message)
+            default_registry.inc('notify_sent_total', channel=channel, status='success' if sent else 'failure')
+            if sent:
                 success_count += 1
         
         # 判断是否有成功的通知
@@ -371,6 +386,17 @@ class Notifier:
         else:
             logger.warning("所有通知渠道均发送失败")
             return False
+    
+    def save_metrics(self):
+        """
+        根据advanced.metrics配置把本次通知的指标写入分析结果所在目录下的<站点ID>_notify_metrics.prom
+        
+        Returns:
+            str: 指标文件路径，未启用时返回None
+        """
+        metrics_config = self.settings.get('advanced', {}).get('metrics')
+        return write_metrics(os.path.dirname(os.path.abspath(self.file_path)), f"{self.site_id}_notify",
+                             metrics_config, prefix='notify_')
 
 def main():
     """主函数"""
@@ -394,13 +420,16 @@ def main():
             settings_path=args.settings
         )
         
-        # 发送通知
-        if notifier.send_notifications():
-            logger.info("通知任务完成")
-            return 0
-        else:
-            logger.error("发送通知失败")
-            return 1
+        # 发送通知，无论成功与否都保存运行指标
+        try:
+            if notifier.send_notifications():
+                logger.info("通知任务完成")
+                return 0
+            else:
+                logger.error("发送通知失败")
+                return 1
+        finally:
+            notifier.save_metrics()
     except Exception as e:
         logger.exception(f"通知过程中发生错误: {e}")
         return 1
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫运行脚本 - 按站点配置的scraping.engine运行一个或多个站点
+多个站点在同一进程中并发运行，共享HTTP连接池和全局并发预算（见config/settings.yaml的runner配置）
+"""
+
+import os
+import sys
+import json
+import time
+import yaml
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# 导入工具
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+from scrapers.engines import resolve_engine
+from utils.config_loader import load_global_settings, load_site_config
+from utils.http_pool import configure_shared_pool, reset_shared_pool, set_request_budget
+from utils.path_helper import get_data_dir
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger('scraper')
+
+# 站点配置目录
+SITES_DIR = Path(__file__).parent.parent / "config" / "sites"
+
+# 未在settings.yaml中配置时的运行器设置
+DEFAULT_MAX_SITES = 4
+DEFAULT_REQUEST_BUDGET = 16
+DEFAULT_POOL_SIZE = 16
+
+def discover_sites(sites_dir=SITES_DIR, site_ids=None):
+    """
+    加载站点配置
+
+    Args:
+        sites_dir: 站点配置目录
+        site_ids: 只加载这些站点，为None时加载目录下所有配置了scraping.engine的站点
+
+    Returns:
+        list: (站点ID, 站点配置)列表
+    """
+    sites = []
+    if site_ids is None:
+        for config_path in sorted(Path(sites_dir).glob("*.yaml")):
+            config = load_site_config(config_path.stem, str(config_path))
+            if not (config or {}).get('scraping', {}).get('engine'):
+                logger.info(f"站点{config_path.stem}未配置scraping.engine，跳过")
+                continue
+            sites.append((config_path.stem, config))
+    else:
+        for site_id in site_ids:
+            sites.append((site_id, load_site_config(site_id, str(Path(sites_dir) / f"{site_id}.yaml"))))
+    return sites
+
+def run_site(site_id, config, output_dir=None):
+    """
+    运行单个站点，引擎在此时才解析和导入，某个站点出错不影响其他站点
+
+    Args:
+        site_id: 站点ID
+        config: 站点配置字典
+        output_dir: 输出目录，为None时由引擎决定
+
+    Returns:
+        dict: 运行摘要，包含站点ID、引擎、状态、耗时和引擎返回的结果
+    """
+    engine_name = config.get('scraping', {}).get('engine')
+    summary = {'site': site_id, 'engine': engine_name}
+    start_time = time.perf_counter()
+    try:
+        engine = resolve_engine(config)
+        logger.info(f"开始运行站点{site_id}（{engine_name}引擎）")
+        result = engine(site_id, config, output_dir)
+        summary['status'] = result.get('status', 'success') if isinstance(result, dict) else 'success'
+        summary['result'] = result
+    except Exception as e:
+        logger.exception(f"站点{site_id}运行失败: {e}")
+        summary['status'] = 'error'
+        summary['error'] = str(e)
+    summary['elapsed'] = round(time.perf_counter() - start_time, 3)
+    logger.info(f"站点{site_id}运行结束: {summary['status']}，耗时 {summary['elapsed']:.2f} 秒")
+    return summary
+
+def run_sites(sites, max_sites=DEFAULT_MAX_SITES, request_budget=DEFAULT_REQUEST_BUDGET,
+              pool_size=DEFAULT_POOL_SIZE, output_dir=None):
+    """
+    在同一进程中并发运行多个站点
+
+    运行期间所有客户端共享连接池，所有请求共用全局并发预算，结束后恢复为各客户端独立的连接池
+
+    Args:
+        sites: (站点ID, 站点配置)列表
+        max_sites: 同时运行的站点数
+        request_budget: 全局并发预算，为0或None时不限制
+        pool_size: 共享连接池中每个主机的最大连接数
+        output_dir: 所有站点共用的输出目录，为None时由各引擎决定
+
+    Returns:
+        list: 与sites顺序对应的运行摘要
+    """
+    if not sites:
+        return []
+    configure_shared_pool(pool_size)
+    set_request_budget(request_budget)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_sites, len(sites))),
+                                thread_name_prefix='site') as executor:
+            futures = [executor.submit(run_site, site_id, config, output_dir) for site_id, config in sites]
+            return [future.result() for future in futures]
+    finally:
+        reset_shared_pool()
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='爬虫运行脚本 - 按站点配置的引擎运行一个或多个站点')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--site', '-s', help='站点ID，多个站点用逗号分隔')
+    group.add_argument('--all', action='store_true', help='运行config/sites下所有配置了scraping.engine的站点')
+    parser.add_argument('--config', help='站点配置文件路径（仅运行单个站点时使用）')
+    parser.add_argument('--settings', help='设置文件路径')
+    parser.add_argument('--output-dir', help='输出目录，默认由各引擎决定（当天的数据目录）')
+    parser.add_argument('--max-sites', type=int, help='同时运行的站点数')
+    parser.add_argument('--budget', type=int, help='全局并发预算（所有站点同时进行中的请求数），0表示不限制')
+    parser.add_argument('--pool-size', type=int, help='共享连接池中每个主机的最大连接数')
+    parser.add_argument('--debug', action='store_true', help='启用调试模式')
+
+    args = parser.parse_args()
+
+    # 设置日志级别
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    settings_path = args.settings or str(Path(__file__).parent.parent / "config" / "settings.yaml")
+    runner_settings = load_global_settings(settings_path).get('runner', {}) if os.path.exists(settings_path) else {}
+
+    try:
+        if args.all:
+            sites = discover_sites()
+        else:
+            site_ids = [site_id.strip() for site_id in args.site.split(',') if site_id.strip()]
+            if args.config and len(site_ids) == 1:
+                sites = [(site_ids[0], load_site_config(site_ids[0], args.config))]
+            else:
+                sites = discover_sites(site_ids=site_ids)
+    except (FileNotFoundError, ValueError, yaml.YAMLError) as e:
+        logger.error(f"加载站点配置失败: {e}")
+        return 1
+
+    if not sites:
+        logger.error("没有可运行的站点")
+        return 1
+
+    summaries = run_sites(
+        sites,
+        max_sites=args.max_sites or runner_settings.get('max_sites', DEFAULT_MAX_SITES),
+        request_budget=args.budget if args.budget is not None else runner_settings.get('request_budget', DEFAULT_REQUEST_BUDGET),
+        pool_size=args.pool_size or runner_settings.get('pool_size', DEFAULT_POOL_SIZE),
+        output_dir=args.output_dir
+    )
+
+    # 保存运行摘要
+    summary_path = os.path.join(args.output_dir or get_data_dir(), 'run_summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump({'finished_at': datetime.now().isoformat(), 'sites': summaries}, f, ensure_ascii=False,
+                  indent=2, default=str)
+    logger.info(f"运行摘要已保存到: {summary_path}")
+
+    failed = [summary['site'] for summary in summaries if summary['status'] != 'success']
+    if failed:
+        logger.error(f"以下站点运行失败: {', '.join(failed)}")
+        return 1
+    logger.info(f"全部 {len(summaries)} 个站点运行完成")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
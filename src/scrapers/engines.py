@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+爬虫引擎注册表
+根据站点配置的scraping.engine找到对应的运行函数。引擎以"模块:函数"的形式登记，首次使用时才导入，
+运行某个站点时不需要安装其他引擎的依赖（如Firecrawl SDK）
+
+所有引擎统一按engine(site_id, config, output_dir)调用，返回结果字典；
+engine为custom时调用scraping.custom_module中的scraping.custom_function(config, output_dir)
+"""
+
+import os
+import sys
+import logging
+import importlib
+import threading
+from typing import Any, Callable, Dict, Optional, Union
+
+# 导入工具
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger('engines')
+
+# 引擎的调用方式：engine(site_id, config, output_dir) -> 结果字典
+Engine = Callable[[str, Dict[str, Any], Optional[str]], Dict[str, Any]]
+
+# 内置引擎
+BUILTIN_ENGINES = {
+    'firecrawl': 'scrapers.firecrawl_integration:run_firecrawl_site'
+}
+
+_engines: Dict[str, Union[str, Engine]] = dict(BUILTIN_ENGINES)
+_engines_lock = threading.Lock()
+
+def register_engine(name: str, target: Union[str, Engine]):
+    """
+    登记爬虫引擎
+
+    Args:
+        name: scraping.engine中使用的名称
+        target: 运行函数，或"模块:函数"形式的导入路径（首次使用时导入）
+    """
+    with _engines_lock:
+        _engines[name] = target
+
+def available_engines():
+    """已登记的引擎名称（不含custom）"""
+    return sorted(_engines)
+
+def import_function(module_name: str, function_name: str) -> Callable:
+    """
+    导入模块中的函数
+
+    配置中的模块路径可以带src.前缀（如src.scrapers.heimao_scraper），导入时去掉前缀，
+    与其他模块使用同一份模块对象，共享其中的限速器、指标等进程内状态
+
+    Args:
+        module_name: 模块路径
+        function_name: 函数名
+
+    Returns:
+        Callable: 函数
+
+    Raises:
+        ValueError: 模块中没有该函数
+    """
+    if module_name.startswith('src.'):
+        module_name = module_name[len('src.'):]
+    module = importlib.import_module(module_name)
+    function = getattr(module, function_name, None)
+    if not callable(function):
+        raise ValueError(f"模块{module_name}中没有函数{function_name}")
+    return function
+
+def resolve_engine(config: Dict[str, Any]) -> Engine:
+    """
+    根据站点配置找到引擎的运行函数
+
+    Args:
+        config: 站点配置字典
+
+    Returns:
+        Engine: 按engine(site_id, config, output_dir)调用的运行函数
+
+    Raises:
+        ValueError: 未配置引擎、引擎未登记，或custom引擎缺少custom_module/custom_function
+        ImportError: 引擎模块或其依赖无法导入
+    """
+    scraping = config.get('scraping', {})
+    name = scraping.get('engine')
+    if not name:
+        raise ValueError("站点配置中未设置scraping.engine")
+
+    if name == 'custom':
+        module_name, function_name = scraping.get('custom_module'), scraping.get('custom_function')
+        if not module_name or not function_name:
+            raise ValueError("custom引擎需要设置scraping.custom_module和scraping.custom_function")
+        function = import_function(module_name, function_name)
+        return lambda site_id, site_config, output_dir: function(site_config, output_dir)
+
+    with _engines_lock:
+        target = _engines.get(name)
+        if target is None:
+            raise ValueError(f"未知的爬虫引擎: {name}（可用: custom, {', '.join(sorted(_engines))}）")
+        if isinstance(target, str):
+            module_name, _, function_name = target.partition(':')
+            target = import_function(module_name, function_name)
+            _engines[name] = target
+            logger.debug(f"已加载爬虫引擎{name}: {module_name}.{function_name}")
+    return target
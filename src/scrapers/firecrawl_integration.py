@@ -7,16 +7,31 @@ Firecrawl集成模块
 import os
 import sys
 import json
+import time
 import yaml
 import logging
-from datetime import datetime
-from typing import Dict, List, Any, Optional, Union
+import copy
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
+from urllib.parse import urldefrag
+import requests
 from pydantic import BaseModel, Field
 
 # 导入基础类和工具
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.config_loader import load_site_config
+from utils.crawl_state import JsonStateStore
+from utils.http_cache import normalize_request, open_response_cache
+from utils.http_pool import close_session, mount_adapter, request_slot
+from utils.metrics import default_registry, write_metrics
+from utils.output_writers import open_writer
 from utils.path_helper import ensure_dir, get_data_dir, get_analysis_dir
+from utils.record_index import RecordIndex
+from utils.text_normalizer import TextNormalizer
 
 # 设置日志记录
 logging.basicConfig(
@@ -32,10 +47,314 @@ except ImportError:
     logger.warning("Firecrawl SDK未安装，将使用模拟模式")
     FIRECRAWL_AVAILABLE = False
 
+# 各操作（operation标签：scrape/crawl/extract/map；批量抓取的提交和轮询为batch_scrape/batch_scrape_status，多目标爬取的轮询为crawl_status）的指标
+default_registry.describe('firecrawl_request_duration_seconds', "Firecrawl SDK调用耗时（秒）")
+default_registry.describe('firecrawl_requests_total', "Firecrawl操作次数（status：success/error/cached/mock）")
+default_registry.describe('firecrawl_response_bytes_total', "Firecrawl结果序列化为JSON后的字节数")
+default_registry.describe('firecrawl_write_duration_seconds', "结果写入文件耗时（秒）")
+default_registry.describe('firecrawl_plan_build_seconds', "由站点配置编译抓取请求方案的耗时（秒）")
+default_registry.describe('firecrawl_content_changes_total', "变化检测判断的页面数（change：new/changed/unchanged）")
+default_registry.describe('firecrawl_extract_skipped_urls_total', "内容未变化而跳过结构化提取的URL数")
+default_registry.describe('firecrawl_crawl_documents_total', "多目标爬取中各任务返回的页面数（result：written/duplicate）")
+
+# 多目标爬取（scraping.crawl）的默认设置
+DEFAULT_CRAWL_POLL_INTERVAL = 2 # 轮询任务状态的间隔（秒）
+DEFAULT_CRAWL_TIMEOUT = 600 # 单个任务的最长等待时间（秒）
+DEFAULT_CRAWL_MAX_JOBS = 8 # 同时进行中的任务数
+CRAWL_FINAL_STATES = ('completed', 'failed', 'cancelled')
+DEFAULT_STATUS_TIMEOUT = 30 # 查询任务状态的请求超时（秒）
+
+# 批量抓取（scraping.batch_scrape）的默认设置
+DEFAULT_BATCH_SIZE = 1000 # 每个批量任务的URL数
+DEFAULT_BATCH_MAX_JOBS = 2 # 同时进行中的批量任务数
+DEFAULT_BATCH_TIMEOUT = 1800 # 单个批量任务的最长等待时间（秒）
+DEFAULT_SCRAPE_WORKERS = 8 # 不使用批量接口时逐个抓取的线程数
+
+# 增量抓取（scraping.incremental）的默认设置
+DEFAULT_MAP_LIMIT = 5000 # 网站地图的最大URL数
+DEFAULT_REVISIT_DAYS = 7 # 没有lastmod的URL超过多少天重新抓取一次
+
+# 计算内容指纹前的清洗：只合并空白，保留Markdown中的标签和实体
+_CONTENT_NORMALIZER = TextNormalizer(remove_tags=False, decode_entities=False)
+
+def _as_dict(result: Any) -> Any:
+    """把SDK返回的对象转换为字典"""
+    if hasattr(result, 'to_dict'):
+        return result.to_dict()
+    if hasattr(result, 'model_dump'):
+        return result.model_dump(mode='json', exclude_none=True)
+    return result
+
+def url_key(url: str) -> str:
+    """URL的去重键：去掉片段和末尾的斜杠"""
+    return urldefrag(url)[0].rstrip('/')
+
+def document_url(document: Dict[str, Any]) -> Optional[str]:
+    """
+    爬取结果中页面的去重键（见url_key），取页面的来源URL
+    
+    Args:
+        document: 页面结果
+        
+    Returns:
+        str: 去重键，页面中没有URL时返回None
+    """
+    metadata = document.get('metadata') or {}
+    url = metadata.get('sourceURL') or metadata.get('url') or document.get('url')
+    return url_key(url) if url else None
+
+def content_fingerprint(document: Dict[str, Any]) -> str:
+    """
+    页面内容指纹：清洗空白后的Markdown（没有时依次取HTML、JSON提取结果）的SHA-1
+    
+    Args:
+        document: 页面结果
+        
+    Returns:
+        str: 指纹（SHA-1十六进制串）
+    """
+    content = document.get('markdown') or document.get('html') or document.get('rawHtml')
+    if content is None:
+        content = json.dumps(document.get('json') or document.get('extract'), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(_CONTENT_NORMALIZER(content).encode('utf-8')).hexdigest()
+
+def sitemap_entries(results: Dict[str, Any]) -> Dict[str, tuple]:
+    """
+    从map_website的结果中取出URL及其最后修改时间（网站地图提供lastmod时）
+    
+    Args:
+        results: map_website的结果（SDK返回links，模拟模式返回urls）
+        
+    Returns:
+        Dict: 去重键（见url_key） -> (URL, lastmod或None)
+    """
+    entries = {}
+    for item in results.get('links') or results.get('urls') or []:
+        if isinstance(item, str):
+            url, lastmod = item, None
+        elif isinstance(item, dict):
+            url, lastmod = item.get('url'), item.get('lastmod') or item.get('lastModified')
+        else:
+            continue
+        if url:
+            entries.setdefault(url_key(url), (url, lastmod))
+    return entries
+
+def _load_crawl_documents(path: str) -> List[Dict[str, Any]]:
+    """读取已有爬取文件中的页面，文件不存在或不完整时返回空列表"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('data') or []
+    except (OSError, ValueError, AttributeError):
+        return []
+
+def _scrape_record(url: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """把scrape_url的结果转换为批量抓取输出中的一行"""
+    if 'error' in result:
+        return {"url": url, "success": False, "error": result['error']}
+    # 模拟模式的结果包在data中，SDK和缓存中的结果就是页面本身
+    document = result['data'] if 'success' in result and isinstance(result.get('data'), dict) else result
+    return {"url": url, "success": True, "data": document}
+
+class ScrapePlan:
+    """
+    抓取请求方案：由站点配置编译一次，之后所有URL共用
+    
+    输出格式、页面交互操作、提取架构、JsonConfig对象以及响应缓存键中的选项部分都在编译时构造，
+    每个URL只需拼上URL本身。方案创建后不可修改（参数为只读映射，操作和架构是配置的副本），
+    站点配置变化时应重新编译
+    """
+    
+    __slots__ = ('formats', 'only_main_content', 'actions', 'extract_prompt', 'schema', 'json_options',
+                 'params', 'build_seconds', '_cache_body')
+    
+    def __init__(self, firecrawl_options: Dict[str, Any], extract_prompt: Optional[str] = None,
+                 schema: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            firecrawl_options: scraping.firecrawl_options配置
+            extract_prompt: scraping.extract_prompt，为None时不进行LLM提取
+            schema: 提取架构，仅在进行LLM提取时使用
+        """
+        start_time = time.perf_counter()
+        formats = tuple(firecrawl_options.get('formats', ["markdown"]))
+        only_main_content = firecrawl_options.get('onlyMainContent', True)
+        actions = tuple(copy.deepcopy(firecrawl_options.get('actions', [])))
+        # 只有输出格式包含json时才进行LLM提取
+        if 'json' not in formats:
+            extract_prompt = schema = None
+        schema = copy.deepcopy(schema) if extract_prompt is not None else None
+        
+        params = {
+            "formats": list(formats),
+            "only_main_content": only_main_content
+        }
+        if actions:
+            params["actions"] = list(actions)
+            logger.info(f"使用页面交互操作: {len(actions)}个操作")
+        
+        json_options = None
+        if extract_prompt is not None:
+            try:
+                from firecrawl import JsonConfig
+                json_options = JsonConfig(
+                    extractionSchema=schema if 'properties' in schema else None,
+                    prompt=extract_prompt,
+                    mode="llm-extraction",
+                    pageOptions={"onlyMainContent": only_main_content}
+                )
+                params["json_options"] = json_options
+                logger.info("启用LLM提取功能")
+            except (ImportError, Exception) as e:
+                logger.error(f"创建JsonConfig失败: {str(e)}")
+        
+        # 响应缓存键中的选项部分，与逐次构造时的序列化结果相同，已有的缓存仍然有效
+        cache_options = {
+            "formats": list(formats),
+            "only_main_content": only_main_content,
+            "actions": list(actions)
+        }
+        if extract_prompt is not None:
+            cache_options["extract_prompt"] = extract_prompt
+            cache_options["schema"] = schema
+        
+        for name, value in (
+            ('formats', formats),
+            ('only_main_content', only_main_content),
+            ('actions', actions),
+            ('extract_prompt', extract_prompt),
+            ('schema', schema),
+            ('json_options', json_options),
+            ('params', MappingProxyType(params)),
+            ('_cache_body', '\n' + json.dumps(cache_options, ensure_ascii=False, sort_keys=True, default=str)),
+            ('build_seconds', time.perf_counter() - start_time)
+        ):
+            object.__setattr__(self, name, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("ScrapePlan创建后不可修改")
+    
+    def request_params(self, url: str) -> Dict[str, Any]:
+        """单个URL的抓取参数（scrape_url的关键字参数）"""
+        return {"url": url, **self.params}
+    
+    def cache_request(self, url: str) -> str:
+        """单个URL在响应缓存中的键"""
+        return normalize_request(url, method='SCRAPE') + self._cache_body
+
+class ContentChangeTracker:
+    """
+    页面内容变化检测（线程安全）
+    
+    按来源URL在RecordIndex中记录页面的内容指纹（见content_fingerprint），只保留新增和内容变化的页面，
+    页面写入成功后再调用commit记入索引；结构化提取的URL以"extract:"为前缀记录提取时的内容指纹，
+    内容未变化的URL不再重复提取。每类输出文件（crawl/extract）最近一次快照的位置保存在JsonStateStore中，
+    新的输出文件通过previous_snapshot字段指向上一次的快照
+    """
+    
+    def __init__(self, index_path: str, state_path: str, metrics=default_registry):
+        """
+        Args:
+            index_path: 内容指纹索引（SQLite）路径
+            state_path: 快照位置状态文件路径
+            metrics: 指标注册表
+        """
+        self.index = RecordIndex(index_path)
+        self.snapshots = JsonStateStore(state_path)
+        self.metrics = metrics
+        self.counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def close(self):
+        """关闭索引"""
+        self.index.close()
+    
+    def select(self, documents: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str]]]:
+        """
+        挑出新增和内容变化的页面，并在页面中标记changeStatus（new/changed）；没有来源URL的页面总是保留
+        
+        Args:
+            documents: 页面列表
+            
+        Returns:
+            tuple: (保留的页面, 写入成功后应记入索引的(键, 指纹)列表)
+        """
+        keyed = [(document_url(document), document) for document in documents]
+        entries = [(key, content_fingerprint(document)) for key, document in keyed if key is not None]
+        states = self.index.classify(entries)
+        selected = []
+        for key, document in keyed:
+            state = states.get(key, 'new') if key is not None else 'new'
+            if state != 'unchanged':
+                document.setdefault('changeStatus', state)
+                selected.append(document)
+        with self._lock:
+            for state in states.values():
+                self.counts[state] += 1
+        for state in ('new', 'changed', 'unchanged'):
+            self.metrics.inc('firecrawl_content_changes_total', sum(1 for value in states.values() if value == state),
+                             change=state)
+        return selected, [entry for entry in entries if states[entry[0]] != 'unchanged']
+    
+    def commit(self, entries: List[Tuple[str, str]]):
+        """把已写入的页面的指纹记入索引"""
+        self.index.mark(entries)
+    
+    def pending_extraction(self, urls: List[str]) -> List[str]:
+        """
+        需要重新提取的URL：从未提取过、内容未知，或内容在上次提取后发生了变化
+        
+        Args:
+            urls: URL列表
+            
+        Returns:
+            list: 需要提取的URL
+        """
+        keys = [url_key(url) for url in urls]
+        current = self.index.lookup(keys)
+        extracted = self.index.lookup(f"extract:{key}" for key in keys)
+        return [url for url, key in zip(urls, keys)
+                if key not in current or extracted.get(f"extract:{key}") != current[key]]
+    
+    def mark_extracted(self, urls: List[str]):
+        """把这些URL当前的内容指纹记为已提取"""
+        current = self.index.lookup(url_key(url) for url in urls)
+        self.index.mark((f"extract:{key}", fingerprint) for key, fingerprint in current.items())
+    
+    def previous_snapshot(self, kind: str, output_file: str) -> Tuple[Optional[str], bool]:
+        """
+        上一次同类输出文件的位置
+        
+        本次输出的正是上一次的文件时（如同一天重复运行），返回更早的快照，并提示调用方保留文件中已有的页面
+        
+        Args:
+            kind: 输出类别（crawl/extract）
+            output_file: 本次的输出文件
+            
+        Returns:
+            tuple: (上一次快照的路径或None, 是否覆盖上一次的快照)
+        """
+        snapshot = self.snapshots.get(kind) or {}
+        if snapshot.get('path') and os.path.abspath(snapshot['path']) == os.path.abspath(output_file):
+            return snapshot.get('previous'), True
+        return snapshot.get('path'), False
+    
+    def record_snapshot(self, kind: str, output_file: str, previous: Optional[str]):
+        """记录本次输出文件为最近一次快照"""
+        self.snapshots.set(kind, {'path': output_file, 'previous': previous, 'timestamp': datetime.now().isoformat()})
+        self.snapshots.save()
+
 class FirecrawlScraper:
     """Firecrawl爬虫集成实现"""
     
-    def __init__(self, site_id: str, config_path: Optional[str] = None, api_key: Optional[str] = None):
+    def __init__(self, site_id: str, config_path: Optional[str] = None, api_key: Optional[str] = None,
+                 config: Optional[Dict[str, Any]] = None, output_dir: Optional[str] = None):
         """
         初始化Firecrawl爬虫
         
@@ -43,12 +362,14 @@ class FirecrawlScraper:
             site_id: 站点ID
             config_path: 配置文件路径，默认为None（使用默认路径）
             api_key: Firecrawl API密钥，默认为None（使用环境变量）
+            config: 已加载的站点配置，传入时不再读取配置文件
+            output_dir: 输出目录，默认为当天数据目录下的站点子目录
         """
         self.site_id = site_id
-        self.config = load_site_config(site_id, config_path)
+        self.config = config if config is not None else load_site_config(site_id, config_path)
         self.site_name = self.config['site']['name']
         self.base_url = self.config['site']['base_url']
-        self.output_dir = get_data_dir(site_id)
+        self.output_dir = ensure_dir(output_dir) if output_dir else get_data_dir(site_id)
         self.api_key = api_key or os.environ.get('FIRECRAWL_API_KEY')
         
         # 初始化Firecrawl客户端
@@ -59,8 +380,100 @@ class FirecrawlScraper:
             self.app = None
             logger.warning("Firecrawl客户端初始化失败，将使用模拟模式")
         
+        # 响应缓存（scraping.http_cache），离线模式下只读缓存，无需API密钥
+        self.cache = open_response_cache(self.config)
+        self.metrics = default_registry
+        self._scrape_plan = None
+        self._plan_lock = threading.Lock()
+        
         logger.info(f"初始化Firecrawl爬虫: {self.site_name}")
     
+    def _record(self, operation: str, status: str, size: int = 0):
+        """记录一次操作的结果状态和结果字节数"""
+        self.metrics.inc('firecrawl_requests_total', operation=operation, status=status)
+        if size:
+            self.metrics.inc('firecrawl_response_bytes_total', size, operation=operation)
+    
+    def _save_results(self, operation: str, results: Any, status: str) -> str:
+        """
+        把操作结果保存到数据目录下的<站点ID>_<后缀>.json，并记录指标
+        
+        Args:
+            operation: 操作名称（crawl/extract/map），决定文件后缀
+            results: 结果
+            status: 指标中的状态（success/mock）
+            
+        Returns:
+            str: 输出文件路径
+        """
+        suffix = {'crawl': 'crawl', 'extract': 'structured', 'map': 'sitemap'}[operation]
+        output_file = os.path.join(self.output_dir, f"{self.site_id}_{suffix}.json")
+        content = json.dumps(results, ensure_ascii=False, indent=2)
+        with self.metrics.span('firecrawl_write_duration_seconds', operation=operation):
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(content)
+        self._record(operation, status, len(content.encode('utf-8')))
+        return output_file
+    
+    def save_metrics(self) -> Optional[str]:
+        """
+        根据output.metrics配置把本进程的Firecrawl指标写入数据目录下的<站点ID>_metrics.prom
+        
+        Returns:
+            str: 指标文件路径，未启用时返回None
+        """
+        return write_metrics(self.output_dir, self.site_id, self.config.get('output', {}).get('metrics'),
+                             prefix='firecrawl_', registry=self.metrics)
+    
+    def _open_change_tracker(self) -> Optional[ContentChangeTracker]:
+        """
+        根据scraping.change_detection配置打开内容变化检测
+        
+        Returns:
+            ContentChangeTracker: 未启用时返回None
+        """
+        options = self.config.get('scraping', {}).get('change_detection', {})
+        if not options.get('enable', False):
+            return None
+        return ContentChangeTracker(
+            options.get('index_path') or os.path.join('.status', f"{self.site_id}_content_index.sqlite3"),
+            options.get('state_file') or os.path.join('.status', f"{self.site_id}_snapshots.json"),
+            self.metrics
+        )
+    
+    def _save_crawl_results(self, results: Dict[str, Any], status: str) -> Dict[str, Any]:
+        """
+        保存爬取结果；启用变化检测时只保存新增和内容变化的页面，并用previous_snapshot指向上一次的爬取文件
+        
+        Args:
+            results: 爬取结果
+            status: 指标中的状态（success/mock）
+            
+        Returns:
+            Dict: 实际保存的结果
+        """
+        tracker = self._open_change_tracker()
+        if tracker is None:
+            output_file = self._save_results('crawl', results, status)
+            logger.info(f"爬取结果已保存到: {output_file}")
+            return results
+        
+        with tracker:
+            output_file = os.path.join(self.output_dir, f"{self.site_id}_crawl.json")
+            previous, overwrite = tracker.previous_snapshot('crawl', output_file)
+            documents, entries = tracker.select(results.get('data') or [])
+            if overwrite:
+                # 同一天重复运行时保留之前写入的变化
+                documents = _load_crawl_documents(output_file) + documents
+            results = {**results, "previous_snapshot": previous, "unchanged": tracker.counts['unchanged'],
+                       "data": documents}
+            output_file = self._save_results('crawl', results, status)
+            tracker.commit(entries)
+            tracker.record_snapshot('crawl', output_file, previous)
+        logger.info(f"爬取结果已保存到: {output_file}（新增 {tracker.counts['new']}，变化 {tracker.counts['changed']}，"
+                    f"未变化 {tracker.counts['unchanged']}）")
+        return results
+    
     def prepare_crawl_config(self) -> Dict[str, Any]:
         """
         准备Firecrawl爬虫配置
@@ -109,10 +522,71 @@ class FirecrawlScraper:
         
         return crawl_config
     
+    def _crawl_params(self, crawl_config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        把prepare_crawl_config生成的配置（不含urls）转换为SDK爬取接口的参数
+        
+        Args:
+            crawl_config: 爬取配置
+            
+        Returns:
+            Dict: crawl_url/async_crawl_url的关键字参数
+        """
+        # 处理ScrapeOptions
+        if 'scrapeOptions' in crawl_config:
+            try:
+                from firecrawl import ScrapeOptions
+                
+                # 获取原始选项
+                opts = crawl_config.pop('scrapeOptions')
+                
+                # 创建ScrapeOptions对象
+                scrape_options = ScrapeOptions(
+                    formats=opts.get('formats', ["markdown"]),
+                    only_main_content=opts.get('onlyMainContent', True)
+                )
+                
+                # 添加到配置中
+                crawl_config['scrape_options'] = scrape_options
+                logger.info(f"创建ScrapeOptions成功: {scrape_options}")
+            except (ImportError, Exception) as e:
+                logger.warning(f"创建ScrapeOptions失败，使用原始配置: {str(e)}")
+                # 保留原始配置，但使用蛇形命名法
+                if 'scrapeOptions' in crawl_config:
+                    crawl_config['scrape_options'] = crawl_config.pop('scrapeOptions')
+        
+        # 转换其他选项为蛇形命名法
+        if 'maxDepth' in crawl_config:
+            crawl_config['max_depth'] = crawl_config.pop('maxDepth')
+        if 'allowExternalLinks' in crawl_config:
+            crawl_config['allow_external_links'] = crawl_config.pop('allowExternalLinks')
+        if 'includePaths' in crawl_config:
+            crawl_config['include_paths'] = crawl_config.pop('includePaths')
+        if 'excludePaths' in crawl_config:
+            crawl_config['exclude_paths'] = crawl_config.pop('excludePaths')
+        
+        return crawl_config
+    
+    @property
+    def scrape_plan(self) -> ScrapePlan:
+        """抓取请求方案，首次使用时由站点配置编译，之后所有URL共用"""
+        if self._scrape_plan is None:
+            with self._plan_lock:
+                if self._scrape_plan is None:
+                    scraping = self.config.get('scraping', {})
+                    extract_prompt = scraping.get('extract_prompt')
+                    schema = self._build_extract_schema() if extract_prompt is not None else None
+                    plan = ScrapePlan(scraping.get('firecrawl_options', {}), extract_prompt, schema)
+                    self.metrics.observe('firecrawl_plan_build_seconds', plan.build_seconds)
+                    self._scrape_plan = plan
+        return self._scrape_plan
+    
     def scrape_url(self, url: str) -> Dict[str, Any]:
         """
         抓取单个URL
         
+        启用响应缓存时先读缓存，成功的抓取结果写入缓存
+        
         Args:
             url: 要抓取的URL
             
@@ -121,64 +595,36 @@ class FirecrawlScraper:
         """
         logger.info(f"抓取URL: {url}")
         
+        cache_request = self.scrape_plan.cache_request(url) if self.cache is not None else None
+        if cache_request is not None:
+            cached = self.cache.get(cache_request)
+            if cached is not None:
+                logger.info(f"使用缓存的抓取结果: {url}")
+                self.metrics.inc('firecrawl_requests_total', operation='scrape', status='cached')
+                return cached.json()
+            if self.cache.offline:
+                logger.error(f"离线模式下缓存中没有该URL: {url}")
+                self.metrics.inc('firecrawl_requests_total', operation='scrape', status='error')
+                return {"error": "离线模式下缓存中没有该URL", "url": url}
+        
         if self.app:
-            # 获取Firecrawl特定选项
-            firecrawl_options = self.config.get('scraping', {}).get('firecrawl_options', {})
-            
-            # 构造抓取选项
-            formats = firecrawl_options.get('formats', ["markdown"])
-            only_main_content = firecrawl_options.get('onlyMainContent', True)
-            
-            # 获取页面交互操作（如果有）
-            actions = firecrawl_options.get('actions', [])
-            
-            # 检查是否需要使用JsonConfig进行LLM提取
-            use_llm_extraction = 'extract_prompt' in self.config.get('scraping', {}) and 'json' in formats
-            json_options = None
-            
-            if use_llm_extraction:
-                try:
-                    from firecrawl import JsonConfig
-                    # 构建提取架构
-                    schema = self._build_extract_schema()
-                    # 获取提示词
-                    prompt = self.config.get('scraping', {}).get('extract_prompt')
-                    
-                    # 创建JsonConfig对象
-                    json_options = JsonConfig(
-                        extractionSchema=schema if 'properties' in schema else None,
-                        prompt=prompt,
-                        mode="llm-extraction",
-                        pageOptions={"onlyMainContent": only_main_content}
-                    )
-                    logger.info("启用LLM提取功能")
-                except (ImportError, Exception) as e:
-                    logger.error(f"创建JsonConfig失败: {str(e)}")
-                    json_options = None
-            
             try:
                 # 使用Firecrawl SDK抓取URL
-                params = {
-                    "url": url,
-                    "formats": formats,
-                    "only_main_content": only_main_content
-                }
-                
-                # 添加操作参数（如果有）
-                if actions:
-                    params["actions"] = actions
-                    logger.info(f"使用页面交互操作: {len(actions)}个操作")
-                
-                # 添加JSON选项（如果有）
-                if json_options:
-                    params["json_options"] = json_options
+                params = self.scrape_plan.request_params(url)
                 
                 # 调用SDK
-                result = self.app.scrape_url(**params)
+                with request_slot(), self.metrics.span('firecrawl_request_duration_seconds', operation='scrape'):
+                    result = self.app.scrape_url(**params)
+                result = _as_dict(result)
                 
-                return result.to_dict() if hasattr(result, 'to_dict') else result
+                payload = json.dumps(result, ensure_ascii=False, default=str)
+                self._record('scrape', 'success', len(payload.encode('utf-8')))
+                if cache_request is not None:
+                    self.cache.store(cache_request, payload)
+                return result
             except Exception as e:
                 logger.error(f"使用Firecrawl抓取URL失败: {str(e)}")
+                self._record('scrape', 'error')
                 return {"error": str(e), "url": url}
         else:
             # 模拟抓取结果
@@ -204,8 +650,150 @@ class FirecrawlScraper:
                     "scrapes": [{"url": url, "html": "<html><body>模拟内容</body></html>"}]
                 }
             
+            self._record('scrape', 'mock')
             return result
     
+    def scrape_many(self, urls: List[str], output_file: Optional[str] = None,
+                    on_record: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        批量抓取URL，每个URL完成后立即向JSONL文件写入一行结果（url、success、data或error）
+        
+        有Firecrawl客户端且启用scraping.batch_scrape时，按batch_size分批提交批量抓取任务并并发轮询；
+        模拟模式或未启用批量接口时，用有界线程池逐个调用scrape_url
+        
+        Args:
+            urls: 要抓取的URL列表，重复的URL（忽略片段和末尾的斜杠）只抓取一次
+            output_file: 输出文件路径，默认为数据目录下的<站点ID>_scrape.jsonl
+            on_record: 每行结果写入后调用的回调（可能在多个线程中调用）
+            
+        Returns:
+            Dict: 抓取摘要（total、success、failed、output_file）
+        """
+        unique_urls = {}
+        for url in urls:
+            if url and url.strip():
+                unique_urls.setdefault(url_key(url.strip()), url.strip())
+        urls = list(unique_urls.values())
+        batch_options = self.config.get('scraping', {}).get('batch_scrape', {})
+        output_file = output_file or os.path.join(self.output_dir, f"{self.site_id}_scrape.jsonl")
+        summary = {"total": len(urls), "success": 0, "failed": 0, "output_file": output_file}
+        summary_lock = threading.Lock()
+        logger.info(f"批量抓取 {len(urls)} 个URL，结果写入: {output_file}")
+        
+        with open_writer('jsonl', output_file) as writer:
+            def emit(url, result):
+                record = _scrape_record(url, result)
+                writer.write_many([record])
+                with summary_lock:
+                    summary['success' if record['success'] else 'failed'] += 1
+                if on_record is not None:
+                    on_record(record)
+            
+            if self.app and batch_options.get('enable', True):
+                self._batch_scrape(urls, emit, batch_options)
+            else:
+                workers = batch_options.get('workers', DEFAULT_SCRAPE_WORKERS)
+                with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='scrape') as executor:
+                    futures = {executor.submit(self.scrape_url, url): url for url in urls}
+                    for future in as_completed(futures):
+                        emit(futures[future], future.result())
+        
+        logger.info(f"批量抓取完成: 成功 {summary['success']} 个，失败 {summary['failed']} 个")
+        return summary
+    
+    def _batch_scrape(self, urls: List[str], emit: Callable[[str, Dict[str, Any]], None], batch_options: Dict[str, Any]):
+        """
+        使用批量抓取接口抓取URL，已缓存的URL直接输出，其余按batch_size分批提交
+        
+        Args:
+            urls: URL列表
+            emit: 输出一个URL结果的回调
+            batch_options: scraping.batch_scrape配置
+        """
+        plan = self.scrape_plan
+        pending = []
+        for url in urls:
+            if self.cache is not None:
+                cached = self.cache.get(plan.cache_request(url))
+                if cached is not None:
+                    self.metrics.inc('firecrawl_requests_total', operation='scrape', status='cached')
+                    emit(url, cached.json())
+                    continue
+                if self.cache.offline:
+                    self.metrics.inc('firecrawl_requests_total', operation='scrape', status='error')
+                    emit(url, {"error": "离线模式下缓存中没有该URL"})
+                    continue
+            pending.append(url)
+        if not pending:
+            return
+        
+        batch_size = max(1, batch_options.get('batch_size', DEFAULT_BATCH_SIZE))
+        max_jobs = batch_options.get('max_jobs', DEFAULT_BATCH_MAX_JOBS)
+        poll_interval = batch_options.get('poll_interval', DEFAULT_CRAWL_POLL_INTERVAL)
+        timeout = batch_options.get('timeout', DEFAULT_BATCH_TIMEOUT)
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        logger.info(f"提交 {len(batches)} 个批量抓取任务，每个最多 {batch_size} 个URL")
+        with ThreadPoolExecutor(max_workers=max(1, min(max_jobs, len(batches))), thread_name_prefix='batch') as executor:
+            futures = [executor.submit(self._run_batch_job, batch, plan, emit, poll_interval, timeout)
+                       for batch in batches]
+            for future in as_completed(futures):
+                future.result()
+    
+    def _run_batch_job(self, urls: List[str], plan: ScrapePlan, emit: Callable[[str, Dict[str, Any]], None],
+                       poll_interval: float, timeout: float):
+        """
+        提交并轮询一个批量抓取任务，每轮询到一个新完成的URL就输出并写入缓存，
+        任务结束后仍没有结果的URL按失败输出
+        
+        Args:
+            urls: 本批次的URL
+            plan: 抓取请求方案
+            emit: 输出一个URL结果的回调
+            poll_interval: 轮询间隔（秒）
+            timeout: 最长等待时间（秒）
+        """
+        remaining = {url_key(url): url for url in urls}
+        errors = {}
+        deadline = time.monotonic() + timeout
+        
+        def on_poll(documents):
+            for document in documents:
+                url = remaining.pop(document_url(document), None)
+                if url is None:
+                    continue
+                payload = json.dumps(document, ensure_ascii=False, default=str)
+                self._record('scrape', 'success', len(payload.encode('utf-8')))
+                if self.cache is not None:
+                    self.cache.store(plan.cache_request(url), payload)
+                emit(url, document)
+        
+        try:
+            with request_slot(), self.metrics.span('firecrawl_request_duration_seconds', operation='batch_scrape'):
+                response = _as_dict(self.app.async_batch_scrape_urls(urls, **plan.params))
+            if not response.get('id'):
+                raise RuntimeError(response.get('error') or "未返回任务ID")
+            job_id = response['id']
+            logger.info(f"已提交批量抓取任务: {len(urls)} 个URL ({job_id})")
+            
+            status = self._poll_job('batch_scrape_status', 'batch/scrape', job_id, on_poll,
+                                    poll_interval, deadline)
+            error = f"超过 {timeout} 秒未完成" if status == 'timeout' else f"批量抓取任务{status}，未返回该URL的结果"
+            if remaining:
+                # 查询失败URL的具体原因
+                try:
+                    failures = _as_dict(self.app.check_batch_scrape_errors(job_id))
+                    errors = {url_key(item['url']): item.get('error') for item in failures.get('errors') or []
+                              if item.get('url')}
+                except Exception as e:
+                    logger.warning(f"查询批量抓取失败原因失败: {job_id} ({e})")
+        except Exception as e:
+            logger.error(f"批量抓取任务失败: {e}")
+            error = str(e)
+        
+        for key, url in remaining.items():
+            self._record('scrape', 'error')
+            emit(url, {"error": errors.get(key) or error})
+    
     def start_crawl(self) -> Dict[str, Any]:
         """
         启动Firecrawl爬虫任务
@@ -222,62 +810,28 @@ class FirecrawlScraper:
             try:
                 # 使用Firecrawl SDK启动爬取任务
                 urls = crawl_config.pop('urls')
+                crawl_config = self._crawl_params(crawl_config)
                 
-                # 处理ScrapeOptions
-                if 'scrapeOptions' in crawl_config:
-                    try:
-                        from firecrawl import ScrapeOptions
-                        
-                        # 获取原始选项
-                        opts = crawl_config.pop('scrapeOptions')
-                        
-                        # 创建ScrapeOptions对象
-                        scrape_options = ScrapeOptions(
-                            formats=opts.get('formats', ["markdown"]),
-                            only_main_content=opts.get('onlyMainContent', True)
-                        )
-                        
-                        # 添加到配置中
-                        crawl_config['scrape_options'] = scrape_options
-                        logger.info(f"创建ScrapeOptions成功: {scrape_options}")
-                    except (ImportError, Exception) as e:
-                        logger.warning(f"创建ScrapeOptions失败，使用原始配置: {str(e)}")
-                        # 保留原始配置，但使用蛇形命名法
-                        if 'scrapeOptions' in crawl_config:
-                            crawl_config['scrape_options'] = crawl_config.pop('scrapeOptions')
-                
-                # 转换其他选项为蛇形命名法
-                if 'maxDepth' in crawl_config:
-                    crawl_config['max_depth'] = crawl_config.pop('maxDepth')
-                if 'allowExternalLinks' in crawl_config:
-                    crawl_config['allow_external_links'] = crawl_config.pop('allowExternalLinks')
-                if 'includePaths' in crawl_config:
-                    crawl_config['include_paths'] = crawl_config.pop('includePaths')
-                if 'excludePaths' in crawl_config:
-                    crawl_config['exclude_paths'] = crawl_config.pop('excludePaths')
+                # 多个目标时每个目标提交一个爬取任务并发执行
+                if len(urls) > 1 and self.config['scraping'].get('crawl', {}).get('fanout', True):
+                    return self._crawl_targets(urls, crawl_config)
                 
                 # 调用SDK
-                crawl_result = self.app.crawl_url(
-                    url=urls[0] if len(urls) == 1 else self.base_url,
-                    **crawl_config
-                )
+                with request_slot(), self.metrics.span('firecrawl_request_duration_seconds', operation='crawl'):
+                    crawl_result = self.app.crawl_url(
+                        url=urls[0] if len(urls) == 1 else self.base_url,
+                        **crawl_config
+                    )
                 
                 # 处理结果
-                if hasattr(crawl_result, 'to_dict'):
-                    results = crawl_result.to_dict()
-                else:
-                    results = crawl_result
+                results = _as_dict(crawl_result)
                 
                 # 保存爬取结果
-                output_file = os.path.join(self.output_dir, f"{self.site_id}_crawl.json")
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(results, f, ensure_ascii=False, indent=2)
-                
-                logger.info(f"爬取完成，结果已保存到: {output_file}")
-                return results
+                return self._save_crawl_results(results, 'success')
                 
             except Exception as e:
                 logger.error(f"使用Firecrawl爬取失败: {str(e)}")
+                self._record('crawl', 'error')
                 return {"error": str(e)}
         else:
             # 模拟爬取结果
@@ -311,12 +865,193 @@ class FirecrawlScraper:
             }
             
             # 保存结果
-            output_file = os.path.join(self.output_dir, f"{self.site_id}_crawl.json")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
+            logger.info("模拟爬取完成")
+            return self._save_crawl_results(results, 'mock')
+    
+    def _crawl_targets(self, urls: List[str], params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        多目标爬取：每个目标提交一个异步爬取任务，并发轮询各任务的状态，
+        每次轮询到的页面按URL去重后立即追加写入<站点ID>_crawl.json，总耗时取决于最慢的目标
+        
+        Args:
+            urls: 目标URL列表
+            params: 爬取接口的参数（见_crawl_params）
             
-            logger.info(f"模拟爬取完成，结果已保存到: {output_file}")
-            return results
+        Returns:
+            Dict: 爬取结果摘要，页面写在输出文件中，不在内存中保留
+        """
+        crawl_options = self.config['scraping'].get('crawl', {})
+        poll_interval = crawl_options.get('poll_interval', DEFAULT_CRAWL_POLL_INTERVAL)
+        timeout = crawl_options.get('timeout', DEFAULT_CRAWL_TIMEOUT)
+        max_jobs = crawl_options.get('max_jobs', DEFAULT_CRAWL_MAX_JOBS)
+        urls = list(dict.fromkeys(urls))
+        output_file = os.path.join(self.output_dir, f"{self.site_id}_crawl.json")
+        logger.info(f"多目标爬取: {len(urls)} 个目标，同时最多 {max_jobs} 个任务")
+        
+        # 启用变化检测时只写入新增和内容变化的页面，文件开头记录上一次爬取文件的位置
+        tracker = self._open_change_tracker()
+        previous, overwrite, metadata = None, False, None
+        if tracker is not None:
+            previous, overwrite = tracker.previous_snapshot('crawl', output_file)
+            metadata = {"previous_snapshot": previous}
+        
+        seen_urls = set()
+        seen_lock = threading.Lock()
+        jobs = []
+        try:
+            with open_writer('json', output_file, key='data', pretty_print=True, append=overwrite,
+                             metadata=metadata) as writer:
+                def merge(documents):
+                    """按URL去重（启用变化检测时再过滤掉内容未变化的页面）后写入新页面，返回写入的页数"""
+                    with seen_lock:
+                        new_documents = []
+                        for document in documents:
+                            key = document_url(document)
+                            if key is not None:
+                                if key in seen_urls:
+                                    continue
+                                seen_urls.add(key)
+                            new_documents.append(document)
+                        unique_count = len(new_documents)
+                        if tracker is not None:
+                            new_documents, entries = tracker.select(new_documents)
+                        writer.write_many(new_documents)
+                        if tracker is not None:
+                            tracker.commit(entries)
+                    self.metrics.inc('firecrawl_crawl_documents_total', len(new_documents), result='written')
+                    self.metrics.inc('firecrawl_crawl_documents_total', len(documents) - unique_count, result='duplicate')
+                    return len(new_documents)
+                
+                with ThreadPoolExecutor(max_workers=max(1, min(max_jobs, len(urls))), thread_name_prefix='crawl') as executor:
+                    futures = [executor.submit(self._run_crawl_job, url, params, merge, poll_interval, timeout)
+                               for url in urls]
+                    for future in as_completed(futures):
+                        job = future.result()
+                        jobs.append(job)
+                        logger.info(f"爬取任务结束: {job['url']} {job['status']}，新增 {job['written']} 个页面")
+            if tracker is not None:
+                tracker.record_snapshot('crawl', output_file, previous)
+        finally:
+            if tracker is not None:
+                tracker.close()
+        
+        self.metrics.inc('firecrawl_response_bytes_total', os.path.getsize(output_file), operation='crawl')
+        jobs.sort(key=lambda job: urls.index(job['url']))
+        completed = sum(1 for job in jobs if job['status'] == 'completed')
+        results = {
+            "success": completed > 0,
+            "status": "completed" if completed == len(jobs) else "partial",
+            "site": self.site_name,
+            "timestamp": datetime.now().isoformat(),
+            "total": writer.count,
+            "output_file": output_file,
+            "jobs": jobs
+        }
+        if tracker is not None:
+            results["previous_snapshot"] = previous
+            results["unchanged"] = tracker.counts['unchanged']
+        if not completed:
+            results["error"] = "所有爬取任务均失败"
+            logger.error(f"多目标爬取失败，所有任务均未完成: {output_file}")
+        else:
+            logger.info(f"多目标爬取完成: {completed}/{len(jobs)} 个任务成功，共 {writer.count} 个页面，已保存到: {output_file}")
+        return results
+    
+    def _run_crawl_job(self, url: str, params: Dict[str, Any], on_documents: Callable[[List[Dict[str, Any]]], int],
+                       poll_interval: float, timeout: float) -> Dict[str, Any]:
+        """
+        提交并轮询单个目标的爬取任务，直到任务结束或超时
+        
+        每次轮询得到的新完成页面都交给on_documents，重复的页面由调用方去重
+        
+        Args:
+            url: 目标URL
+            params: 爬取接口的参数
+            on_documents: 处理一批页面的回调，返回实际写入的页数
+            poll_interval: 轮询间隔（秒）
+            timeout: 最长等待时间（秒），超时后取消任务
+            
+        Returns:
+            Dict: 任务摘要（url、id、status、pages、written，失败时包含error）
+        """
+        job = {"url": url, "id": None, "status": "error", "pages": 0, "written": 0}
+        deadline = time.monotonic() + timeout
+        try:
+            with request_slot(), self.metrics.span('firecrawl_request_duration_seconds', operation='crawl'):
+                response = _as_dict(self.app.async_crawl_url(url, **params))
+            if not response.get('id'):
+                raise RuntimeError(response.get('error') or "未返回任务ID")
+            job['id'] = response['id']
+            logger.info(f"已提交爬取任务: {url} ({job['id']})")
+            
+            def on_poll(documents):
+                job['pages'] += len(documents)
+                job['written'] += on_documents(documents)
+            
+            job['status'] = self._poll_job('crawl_status', 'crawl', job['id'], on_poll,
+                                           poll_interval, deadline, cancel=self.app.cancel_crawl)
+            if job['status'] == 'timeout':
+                job['error'] = f"超过 {timeout} 秒未完成"
+        except Exception as e:
+            logger.error(f"爬取目标失败: {url} ({e})")
+            job['error'] = str(e)
+        self._record('crawl', 'success' if job['status'] == 'completed' else 'error')
+        return job
+    
+    def _poll_job(self, operation: str, path: str, job_id: str,
+                  on_documents: Callable[[List[Dict[str, Any]]], None], poll_interval: float, deadline: float,
+                  cancel: Optional[Callable[[str], Any]] = None) -> str:
+        """
+        轮询异步任务（爬取、批量抓取）直到任务结束或超时
+        
+        SDK的状态查询每次都返回已完成的全部页面，任务较大时轮询的总下载量随页数平方增长；
+        这里直接请求状态接口，用skip从已取到的条数开始，一次返回不完时按next翻页，每个页面只下载一次
+        
+        Args:
+            operation: 状态查询在指标中的operation标签
+            path: 状态接口路径（crawl、batch/scrape）
+            job_id: 任务ID
+            on_documents: 每取到一批新完成的页面时调用
+            poll_interval: 轮询间隔（秒）
+            deadline: 截止时间（time.monotonic()）
+            cancel: SDK的取消任务方法，超时时调用
+        
+        Returns:
+            str: 任务的最终状态（completed/failed/cancelled），超时返回timeout
+        
+        Raises:
+            requests.HTTPError: 状态接口返回错误状态码
+        """
+        endpoint = f"{self.app.api_url.rstrip('/')}/v1/{path}/{job_id}"
+        headers = {'Authorization': f'Bearer {self.app.api_key}'}
+        session = requests.Session()
+        mount_adapter(session, 1)
+        received = 0
+        try:
+            while True:
+                url, params = endpoint, {'skip': received}
+                while url:
+                    with request_slot(), self.metrics.span('firecrawl_request_duration_seconds', operation=operation):
+                        response = session.get(url, params=params, headers=headers, timeout=DEFAULT_STATUS_TIMEOUT)
+                        response.raise_for_status()
+                        status = response.json()
+                    documents = status.get('data') or []
+                    received += len(documents)
+                    on_documents(documents)
+                    # next指向同一任务后续的页面（已带skip），没有新页面时不再翻页
+                    url, params = (status.get('next'), None) if documents else (None, None)
+                if status.get('status') in CRAWL_FINAL_STATES:
+                    return status['status']
+                if time.monotonic() + poll_interval > deadline:
+                    if cancel is not None:
+                        try:
+                            cancel(job_id)
+                        except Exception as e:
+                            logger.warning(f"取消任务失败: {job_id} ({e})")
+                    return 'timeout'
+                time.sleep(poll_interval)
+        finally:
+            close_session(session)
     
     def extract_structured_data(self, urls: Optional[List[str]] = None, schema: Optional[Dict] = None) -> Dict[str, Any]:
         """
@@ -345,6 +1080,43 @@ class FirecrawlScraper:
                     url = url_format.format(base_url=self.base_url, target_id=target_id, page_num=1)
                     urls.append(url)
         
+        # 启用变化检测时只提取内容在上次提取后发生变化的页面
+        tracker = self._open_change_tracker()
+        if tracker is None:
+            return self._extract_structured_data(urls, schema)
+        with tracker:
+            output_file = os.path.join(self.output_dir, f"{self.site_id}_structured.json")
+            previous, overwrite = tracker.previous_snapshot('extract', output_file)
+            # 同一天重复运行时会覆盖上一次的提取结果，此时重新提取全部页面
+            pending = urls if overwrite else tracker.pending_extraction(urls)
+            skipped_urls = [url for url in urls if url not in pending]
+            if skipped_urls:
+                logger.info(f"{len(skipped_urls)} 个页面内容未变化，跳过提取")
+                self.metrics.inc('firecrawl_extract_skipped_urls_total', len(skipped_urls))
+            if not pending:
+                self._record('extract', 'skipped')
+                return {"success": True, "status": "unchanged", "skipped_urls": skipped_urls, "data": {}}
+            
+            results = self._extract_structured_data(pending, schema, {"previous_snapshot": previous,
+                                                                      "skipped_urls": skipped_urls})
+            if 'error' not in results:
+                tracker.mark_extracted(pending)
+                tracker.record_snapshot('extract', output_file, previous)
+            return results
+    
+    def _extract_structured_data(self, urls: List[str], schema: Optional[Dict] = None,
+                                 extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        提取结构化数据并保存到<站点ID>_structured.json
+        
+        Args:
+            urls: 要提取的URL列表
+            schema: 提取架构，如果为None则根据配置生成
+            extra: 附加到结果中一并保存的字段（如上一次快照的位置）
+            
+        Returns:
+            Dict: 提取结果
+        """
         # 从配置中获取提示词
         prompt = self.config.get('scraping', {}).get('extract_prompt', "从这些网页中提取关键信息")
         
@@ -385,24 +1157,23 @@ class FirecrawlScraper:
                     logger.info("使用无架构提取")
                 
                 # 调用SDK
-                extract_result = self.app.extract(**params)
+                with request_slot(), self.metrics.span('firecrawl_request_duration_seconds', operation='extract'):
+                    extract_result = self.app.extract(**params)
                 
                 # 处理结果
-                if hasattr(extract_result, 'to_dict'):
-                    results = extract_result.to_dict()
-                else:
-                    results = extract_result
+                results = _as_dict(extract_result)
+                if extra:
+                    results.update(extra)
                 
                 # 保存提取结果
-                output_file = os.path.join(self.output_dir, f"{self.site_id}_structured.json")
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(results, f, ensure_ascii=False, indent=2)
+                output_file = self._save_results('extract', results, 'success')
                 
                 logger.info(f"数据提取完成，结果已保存到: {output_file}")
                 return results
                 
             except Exception as e:
                 logger.error(f"使用Firecrawl提取数据失败: {str(e)}")
+                self._record('extract', 'error')
                 return {"error": str(e)}
         else:
             # 模拟提取结果
@@ -454,11 +1225,11 @@ class FirecrawlScraper:
                 "success": True,
                 "data": mock_data
             }
+            if extra:
+                structured_data.update(extra)
             
             # 保存结构化数据
-            output_file = os.path.join(self.output_dir, f"{self.site_id}_structured.json")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(structured_data, f, ensure_ascii=False, indent=2)
+            output_file = self._save_results('extract', structured_data, 'mock')
             
             logger.info(f"模拟结构化数据提取完成，已保存到: {output_file}")
             return structured_data
@@ -518,10 +1289,13 @@ class FirecrawlScraper:
         
         return schema
     
-    def map_website(self) -> Dict[str, Any]:
+    def map_website(self, limit: Optional[int] = None) -> Dict[str, Any]:
         """
         使用Firecrawl的map功能映射网站结构
         
+        Args:
+            limit: 最大URL数，默认为pagination.max_items
+            
         Returns:
             Dict: 网站地图结果
         """
@@ -530,28 +1304,25 @@ class FirecrawlScraper:
         if self.app:
             try:
                 # 使用Firecrawl SDK映射网站
-                map_result = self.app.map_url(
-                    url=self.base_url,
-                    limit=self.config['scraping'].get('pagination', {}).get('max_items', 100),
-                    include_subdomains=self.config.get('scraping', {}).get('firecrawl_options', {}).get('includeSubdomains', False)
-                )
+                with request_slot(), self.metrics.span('firecrawl_request_duration_seconds', operation='map'):
+                    map_result = self.app.map_url(
+                        url=self.base_url,
+                        limit=limit or self.config['scraping'].get('pagination', {}).get('max_items', 100),
+                        include_subdomains=self.config.get('scraping', {}).get('firecrawl_options', {}).get('includeSubdomains', False)
+                    )
                 
                 # 处理结果
-                if hasattr(map_result, 'to_dict'):
-                    results = map_result.to_dict()
-                else:
-                    results = map_result
+                results = _as_dict(map_result)
                 
                 # 保存映射结果
-                output_file = os.path.join(self.output_dir, f"{self.site_id}_sitemap.json")
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(results, f, ensure_ascii=False, indent=2)
+                output_file = self._save_results('map', results, 'success')
                 
                 logger.info(f"网站映射完成，结果已保存到: {output_file}")
                 return results
                 
             except Exception as e:
                 logger.error(f"使用Firecrawl映射网站失败: {str(e)}")
+                self._record('map', 'error')
                 return {"error": str(e)}
         else:
             # 模拟映射结果
@@ -565,12 +1336,149 @@ class FirecrawlScraper:
             }
             
             # 保存结果
-            output_file = os.path.join(self.output_dir, f"{self.site_id}_sitemap.json")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
+            output_file = self._save_results('map', results, 'mock')
             
             logger.info(f"模拟网站映射完成，结果已保存到: {output_file}")
             return results
+    
+    def incremental_crawl(self) -> Dict[str, Any]:
+        """
+        基于网站地图的增量抓取
+        
+        先用map_website获取当前的URL列表，与索引中上次记录的URL对比，只抓取新增的URL、lastmod变化的URL，
+        以及没有lastmod且超过revisit_days未抓取的URL（抓取后按内容指纹判断是否变化）；
+        抓取结果写入<站点ID>_incremental.jsonl，新增、变更、删除的URL写入<站点ID>_sitemap_diff.json。
+        抓取成功后才更新索引，失败的URL下次运行时重新抓取
+        
+        Returns:
+            Dict: 增量抓取摘要
+        """
+        options = self.config['scraping'].get('incremental', {})
+        map_limit = options.get('map_limit', DEFAULT_MAP_LIMIT)
+        revisit_days = options.get('revisit_days', DEFAULT_REVISIT_DAYS)
+        index_path = options.get('index_path') or os.path.join('.status', f"{self.site_id}_sitemap_index.sqlite3")
+        
+        map_results = self.map_website(limit=map_limit)
+        if 'error' in map_results:
+            return {"error": map_results['error']}
+        entries = sitemap_entries(map_results)
+        if not entries:
+            logger.error("网站地图为空，跳过增量抓取，不更新索引")
+            return {"error": "网站地图为空"}
+        
+        with RecordIndex(index_path) as index:
+            known = index.lookup_seen(entries)
+            cutoff = (datetime.now() - timedelta(days=revisit_days)).isoformat()
+            pending = {}
+            for key, (url, lastmod) in entries.items():
+                if key not in known:
+                    pending[key] = 'new'
+                elif lastmod:
+                    if known[key][0] != f"lastmod:{lastmod}":
+                        pending[key] = 'changed'
+                elif known[key][1] < cutoff:
+                    pending[key] = 'revisit'
+            
+            # 地图达到数量上限时可能不完整，此时不判断删除
+            if len(entries) >= map_limit:
+                logger.warning(f"网站地图达到上限 {map_limit} 个URL，本次不判断已删除的URL")
+                removed = []
+            else:
+                removed = [key for key in index.keys() if key not in entries]
+            logger.info(f"网站地图共 {len(entries)} 个URL，需要抓取 {len(pending)} 个，已删除 {len(removed)} 个")
+            
+            diff = {'new': [], 'changed': [], 'unchanged': [], 'failed': []}
+            diff_lock = threading.Lock()
+            
+            def on_record(record):
+                key = url_key(record['url'])
+                state = pending.get(key)
+                if state is None:
+                    return
+                if not record['success']:
+                    with diff_lock:
+                        diff['failed'].append(record['url'])
+                    return
+                lastmod = entries[key][1]
+                fingerprint = f"lastmod:{lastmod}" if lastmod else f"sha1:{content_fingerprint(record['data'])}"
+                if state == 'revisit':
+                    state = 'unchanged' if known[key][0] == fingerprint else 'changed'
+                index.mark([(key, fingerprint)])
+                with diff_lock:
+                    diff[state].append(record['url'])
+            
+            output_file = os.path.join(self.output_dir, f"{self.site_id}_incremental.jsonl")
+            self.scrape_many([entries[key][0] for key in pending], output_file, on_record=on_record)
+            index.remove(removed)
+        
+        diff['removed'] = removed
+        diff_file = os.path.join(self.output_dir, f"{self.site_id}_sitemap_diff.json")
+        with open(diff_file, 'w', encoding='utf-8') as f:
+            json.dump({"timestamp": datetime.now().isoformat(), "mapped": len(entries), **diff}, f,
+                      ensure_ascii=False, indent=2)
+        
+        results = {
+            "success": True,
+            "mapped": len(entries),
+            "skipped": len(entries) - len(pending),
+            "total": len(diff['new']) + len(diff['changed']),
+            **{state: len(urls) for state, urls in diff.items()},
+            "output_file": output_file,
+            "diff_file": diff_file
+        }
+        logger.info(f"增量抓取完成: 新增 {results['new']}，变更 {results['changed']}，未变化 {results['unchanged']}，"
+                    f"失败 {results['failed']}，删除 {results['removed']}，跳过 {results['skipped']}")
+        return results
+
+# 未配置scraping.tasks时由框架执行的操作
+DEFAULT_SITE_TASKS = ('crawl',)
+
+def run_firecrawl_site(site_id: str, config: Dict[str, Any], output_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    firecrawl引擎的运行函数，由多站点运行器调用（见scrapers.engines）
+    
+    依次执行scraping.tasks中的操作（crawl/extract/map/incremental，默认只爬取），结束后写入运行指标
+    
+    Args:
+        site_id: 站点ID
+        config: 站点配置字典
+        output_dir: 输出目录，为None时使用当天数据目录下的站点子目录
+        
+    Returns:
+        dict: 包含各操作结果摘要的字典
+    """
+    scraper = FirecrawlScraper(site_id, config=config, output_dir=output_dir)
+    operations = {
+        'crawl': scraper.start_crawl,
+        'extract': scraper.extract_structured_data,
+        'map': scraper.map_website,
+        'incremental': scraper.incremental_crawl
+    }
+    tasks = {}
+    for task in config.get('scraping', {}).get('tasks', DEFAULT_SITE_TASKS):
+        if task not in operations:
+            raise ValueError(f"未知的Firecrawl操作: {task}")
+        results = operations[task]()
+        summary = {'status': 'error' if 'error' in results else 'success'}
+        if 'error' in results:
+            summary['error'] = results['error']
+        elif isinstance(results.get('data'), list):
+            summary['count'] = len(results['data'])
+        elif isinstance(results.get('urls'), list):
+            summary['count'] = len(results['urls'])
+        elif isinstance(results.get('total'), int):
+            summary['count'] = results['total']
+        tasks[task] = summary
+    
+    result = {
+        'status': 'error' if any(task['status'] == 'error' for task in tasks.values()) else 'success',
+        'output_dir': scraper.output_dir,
+        'tasks': tasks
+    }
+    metrics_path = scraper.save_metrics()
+    if metrics_path:
+        result['metrics_path'] = metrics_path
+    return result
 
 def main():
     """命令行入口点"""
@@ -587,6 +1495,8 @@ def main():
     group.add_argument('--extract', action='store_true', help='提取结构化数据')
     group.add_argument('--map', action='store_true', help='映射网站结构')
     group.add_argument('--scrape', help='抓取单个URL', metavar='URL')
+    group.add_argument('--scrape-file', help='批量抓取文件中的URL（每行一个，#开头的行忽略），结果写入JSONL', metavar='FILE')
+    group.add_argument('--incremental', action='store_true', help='基于网站地图增量抓取新增和变化的URL')
     group.add_argument('--all', action='store_true', help='执行所有功能：爬取、提取和映射')
     
     args = parser.parse_args()
@@ -599,7 +1509,7 @@ def main():
         if args.crawl or args.all:
             logger.info("执行网站爬取...")
             results = scraper.start_crawl()
-            logger.info(f"爬取结果: {len(results.get('data', [])) if isinstance(results, dict) and 'data' in results else '未知'} 条数据")
+            logger.info(f"爬取结果: {len(results['data']) if isinstance(results.get('data'), list) else results.get('total', '未知')} 条数据")
         
         if args.extract or args.all:
             logger.info("执行结构化数据提取...")
@@ -615,7 +1525,20 @@ def main():
             logger.info(f"抓取URL: {args.scrape}")
             scrape_results = scraper.scrape_url(args.scrape)
             logger.info(f"抓取成功: {'success' in scrape_results and scrape_results['success']}")
-            
+        
+        if args.incremental:
+            logger.info("执行增量抓取...")
+            incremental_results = scraper.incremental_crawl()
+            logger.info(f"增量抓取结果: {incremental_results.get('total', incremental_results.get('error'))} 个新增或变更的页面")
+        
+        if args.scrape_file:
+            with open(args.scrape_file, 'r', encoding='utf-8') as f:
+                urls = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+            logger.info(f"从{args.scrape_file}读取 {len(urls)} 个URL")
+            summary = scraper.scrape_many(urls)
+            logger.info(f"批量抓取结果已保存到: {summary['output_file']}")
+        
+        scraper.save_metrics()
         logger.info("任务完成")
         return 0
     except Exception as e:
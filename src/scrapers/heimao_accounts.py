@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+黑猫投诉账号池
+把搜索请求轮流分配给多个登录Cookie（账号），每个账号有独立的会话和限速器，总吞吐量随账号数增加；
+同时记录每个账号的健康状况：返回登录页的Cookie视为已失效并停止使用，
+连续触发风控（含403/429）或服务端错误（5xx）的账号暂时隔离，不会因此失效
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from scrapers.heimao_client import BACKOFF_REASONS, classify_error, classify_page
+from utils.http_cache import CacheMissError
+from utils.rate_limiter import AdaptiveRateLimiter
+
+logger = logging.getLogger('heimao_accounts')
+
+# 账号连续触发风控后的默认隔离秒数
+DEFAULT_QUARANTINE = 600
+
+# 默认连续触发几次风控或服务端错误后隔离账号
+DEFAULT_MAX_FAILURES = 3
+
+def load_cookies(auth: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """
+    根据auth配置读取所有账号的Cookie
+
+    cookie_envs为存放各账号Cookie的环境变量名列表，兼容只配置单个cookie_env的写法；
+    未设置的环境变量和重复的Cookie会被跳过
+
+    Args:
+        auth: auth配置字典
+
+    Returns:
+        List[tuple]: (环境变量名, Cookie)列表，环境变量名用作日志和统计中的账号名
+    """
+    names = list(auth.get('cookie_envs') or [])
+    if auth.get('cookie_env') and auth['cookie_env'] not in names:
+        names.insert(0, auth['cookie_env'])
+
+    cookies = []
+    seen = set()
+    for name in names:
+        cookie = (os.environ.get(name) or '').strip()
+        if not cookie:
+            logger.warning(f"环境变量{name}未设置Cookie，跳过该账号")
+            continue
+        if cookie in seen:
+            continue
+        seen.add(cookie)
+        cookies.append((name, cookie))
+    return cookies
+
+class Account:
+    """账号池中的一个账号：客户端、限速器及健康统计"""
+
+    def __init__(self, name: str, client, rate_limiter=None):
+        """
+        Args:
+            name: 账号名（日志和统计中使用，不应是Cookie本身）
+            client: 使用该账号Cookie的HeimaoClient或AsyncHeimaoClient
+            rate_limiter: 该账号的限速器，为None时不限速
+        """
+        self.name = name
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.requests = 0
+        self.successes = 0
+        self.risk_hits = 0
+        self.login_failures = 0
+        self.errors = 0
+        self.quarantines = 0
+        self.consecutive_failures = 0
+        self.quarantined_until = 0.0
+        self.invalid = False
+
+    def is_available(self, now: float) -> bool:
+        """Cookie未失效且不在隔离期内"""
+        return not self.invalid and self.quarantined_until <= now
+
+    def stats(self) -> Dict[str, Any]:
+        """账号的请求统计"""
+        if self.invalid:
+            status = 'invalid'
+        elif self.quarantined_until > time.monotonic():
+            status = 'quarantined'
+        else:
+            status = 'ok'
+        stats = {
+            'account': self.name,
+            'status': status,
+            'requests': self.requests,
+            'successes': self.successes,
+            'risk_hits': self.risk_hits,
+            'login_failures': self.login_failures,
+            'errors': self.errors,
+            'quarantines': self.quarantines
+        }
+        if self.rate_limiter is not None:
+            stats['rate'] = round(self.rate_limiter.rate, 3)
+        return stats
+
+class _AccountPoolBase:
+    """账号选择和健康记录，同步和异步账号池共用"""
+
+    # 请求节奏由各账号的限速器控制，调用方无需再使用共享限速器或随机休眠
+    paced = True
+
+    def __init__(self, accounts: Sequence[Account], quarantine: float = DEFAULT_QUARANTINE,
+                 max_failures: int = DEFAULT_MAX_FAILURES):
+        """
+        Args:
+            accounts: 账号列表
+            quarantine: 账号连续触发风控或服务端错误后的隔离秒数
+            max_failures: 连续触发几次风控或服务端错误后隔离账号
+        """
+        if not accounts:
+            raise ValueError("账号池至少需要一个账号")
+        self.accounts = list(accounts)
+        self.quarantine = float(quarantine)
+        self.max_failures = max(1, int(max_failures))
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        """各账号共用的响应缓存，未启用时为None"""
+        return self.accounts[0].client.cache
+
+    def cached_search_page(self, keyword: str = "", page: int = 1, page_size: int = 10) -> Optional[Dict[str, Any]]:
+        """从各账号共用的响应缓存读取单页搜索结果，未命中时返回None"""
+        return self.accounts[0].client.cached_search_page(keyword, page, page_size)
+
+    def _check_offline(self, keyword: str, page: int):
+        """离线模式下缓存未命中时直接报错，不占用账号"""
+        cache = self.cache
+        if cache is not None and cache.offline:
+            raise CacheMissError(f"离线模式下缓存中没有关键词'{keyword}'第{page}页")
+
+    @property
+    def cookie(self) -> Optional[str]:
+        """第一个未失效账号的Cookie，全部失效时为None"""
+        for account in self.accounts:
+            if not account.invalid:
+                return account.client.cookie
+        return None
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """各账号的请求统计"""
+        return [account.stats() for account in self.accounts]
+
+    def _checkout(self, tried: Set[Account]) -> Tuple[Optional[Account], float]:
+        """
+        选出一个可用且本次请求未尝试过的账号
+
+        优先选择限速器等待时间最短的账号（如刚触发退避的账号会被暂时避开），等待时间相同时按轮询顺序
+
+        Returns:
+            tuple: (账号, 0)；没有可用账号时为(None, 最早解除隔离的等待秒数)，所有账号都已失效或已尝试过时等待秒数为0
+        """
+        now = time.monotonic()
+        with self._lock:
+            count = len(self.accounts)
+            best = None
+            best_delay = 0.0
+            for offset in range(count):
+                index = (self._next + offset) % count
+                account = self.accounts[index]
+                if account in tried or not account.is_available(now):
+                    continue
+                delay = account.rate_limiter.delay() if account.rate_limiter is not None else 0.0
+                if best is None or delay < best_delay:
+                    best, best_delay = index, delay
+                    if delay == 0:
+                        break
+            if best is not None:
+                self._next = (best + 1) % count
+                return self.accounts[best], 0.0
+            waiting = [account.quarantined_until - now for account in self.accounts
+                       if account not in tried and not account.invalid]
+        return None, max(0.0, min(waiting)) if waiting else 0.0
+
+    def _report(self, account: Account, signal: str, keyword: str, page: int):
+        """记录一次请求的结果，并反馈给该账号的自适应限速器"""
+        adaptive = isinstance(account.rate_limiter, AdaptiveRateLimiter)
+        quarantined = False
+        with self._lock:
+            account.requests += 1
+            if signal == 'ok':
+                account.successes += 1
+                account.consecutive_failures = 0
+            elif signal == 'error':
+                # 网络错误通常与账号无关，只计数，不计入连续失败
+                account.errors += 1
+            elif signal == 'login_required':
+                account.login_failures += 1
+                account.invalid = True
+            else:
+                # 风控和服务端错误只暂时隔离账号，服务恢复后账号仍可使用
+                if signal == 'server_error':
+                    account.errors += 1
+                else:
+                    account.risk_hits += 1
+                account.consecutive_failures += 1
+                # 隔离前已分配给该账号的请求不再重复隔离
+                if account.consecutive_failures >= self.max_failures and account.quarantined_until <= time.monotonic():
+                    account.consecutive_failures = 0
+                    account.quarantines += 1
+                    account.quarantined_until = time.monotonic() + self.quarantine
+                    quarantined = True
+
+        if signal == 'ok':
+            if adaptive:
+                account.rate_limiter.on_success()
+            return
+        if signal == 'login_required':
+            logger.error(f"账号{account.name}返回登录页，Cookie可能已失效，本次运行不再使用")
+        elif signal in ('risk_control', 'server_error'):
+            if adaptive:
+                account.rate_limiter.on_backoff(f"账号{account.name}关键词'{keyword}'第{page}页{BACKOFF_REASONS[signal]}")
+            if quarantined:
+                logger.warning(f"账号{account.name}连续{self.max_failures}次触发风控或服务端错误，隔离{self.quarantine:.0f}秒")
+
+    def _no_account_result(self, result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if result is not None:
+            return result
+        logger.error("所有账号的Cookie均已失效")
+        return {'status': 'login_required'}
+
+class AccountPool(_AccountPoolBase):
+    """
+    同步账号池，接口与HeimaoClient一致，可直接传给get_complaints等函数
+
+    每次请求轮流选用可用账号并按该账号的限速器等待；遇到风控或登录页时换下一个账号重试同一页，
+    所有账号都尝试过后返回最后一次的结果。所有账号都在隔离期内时等待最早解除隔离的账号。
+    启用响应缓存时先读缓存，命中时不占用账号
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """关闭所有账号的会话"""
+        for account in self.accounts:
+            account.client.close()
+
+    def search_page(self, keyword: str = "", page: int = 1, page_size: int = 10) -> Dict[str, Any]:
+        """
+        使用账号池请求并解析单页搜索结果
+
+        Returns:
+            dict: 包含status（'success'/'login_required'/'error'）、lists、pager的字典
+
+        Raises:
+            请求异常原样抛出，由调用方按重试策略处理
+        """
+        cached = self.cached_search_page(keyword, page, page_size)
+        if cached is not None:
+            return cached
+        self._check_offline(keyword, page)
+
+        tried = set()
+        result = None
+        while True:
+            account, wait = self._checkout(tried)
+            if account is None:
+                if result is not None or wait <= 0:
+                    return self._no_account_result(result)
+                logger.warning(f"所有账号均在隔离中，{wait:.1f}秒后继续")
+                time.sleep(wait)
+                continue
+            tried.add(account)
+            if account.rate_limiter is not None:
+                account.rate_limiter.acquire()
+            try:
+                result = account.client.search_page(keyword, page, page_size)
+            except Exception as e:
+                self._report(account, classify_error(e), keyword, page)
+                raise
+            signal = classify_page(result)
+            self._report(account, signal, keyword, page)
+            if signal in ('ok', 'error'):
+                return result
+
+class AsyncAccountPool(_AccountPoolBase):
+    """异步账号池，接口与AsyncHeimaoClient一致，行为与AccountPool相同"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """关闭所有账号的客户端"""
+        for account in self.accounts:
+            await account.client.aclose()
+
+    async def search_page(self, keyword: str = "", page: int = 1, page_size: int = 10) -> Dict[str, Any]:
+        """使用账号池请求并解析单页搜索结果，等待期间和读缓存时让出事件循环"""
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cached_search_page, keyword, page, page_size)
+            if cached is not None:
+                return cached
+        self._check_offline(keyword, page)
+
+        tried = set()
+        result = None
+        while True:
+            account, wait = self._checkout(tried)
+            if account is None:
+                if result is not None or wait <= 0:
+                    return self._no_account_result(result)
+                logger.warning(f"所有账号均在隔离中，{wait:.1f}秒后继续")
+                await asyncio.sleep(wait)
+                continue
+            tried.add(account)
+            if account.rate_limiter is not None:
+                await account.rate_limiter.acquire_async()
+            try:
+                result = await account.client.search_page(keyword, page, page_size)
+            except Exception as e:
+                self._report(account, classify_error(e), keyword, page)
+                raise
+            signal = classify_page(result)
+            self._report(account, signal, keyword, page)
+            if signal in ('ok', 'error'):
+                return result
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+黑猫投诉异步爬虫引擎
+基于httpx.AsyncClient，在单个事件循环中并发执行所有关键词×分页请求，
+并发数、重试和反风控节奏均以协作方式控制
+
+本地测试时可通过base_url指向本地的/api/index/s仿真服务，
+或通过transport传入httpx.MockTransport返回预置的result.data.lists/pager数据
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import urllib.parse
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import httpx
+
+# 导入工具
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scrapers.heimao_client import (
+    DEFAULT_HEADERS, DEFAULT_TIMEOUT, HEIMAO_BASE_URL, HeimaoClient, HeimaoSigner, default_signer,
+    is_login_redirect, parse_search_response, raise_for_status
+)
+from scrapers.heimao_accounts import (
+    DEFAULT_MAX_FAILURES, DEFAULT_QUARANTINE, Account, AsyncAccountPool, load_cookies
+)
+from scrapers.heimao_detail import open_detail_fetcher
+from scrapers.heimao_scraper import (
+    BACKOFF_REASONS, WATERMARK_LATEST_KEY, ComplaintCollector, build_rate_limiter, classify_page,
+    collect_keywords, get_backoff_retries, is_page_known, keyword_stat, open_complaint_sink, open_cursor_store,
+    open_page_cursor, open_sn_index, open_watermark_store, update_watermark
+)
+from utils.http_cache import CacheMissError, ResponseCache, open_response_cache
+from utils.http_pool import async_request_slot
+from utils.metrics import MetricsRegistry, default_registry, write_metrics
+from utils.rate_limiter import AdaptiveRateLimiter
+from utils.retry import RetryPolicy, RetryableError
+
+logger = logging.getLogger('heimao_async')
+
+# 默认同时进行中的请求数上限
+DEFAULT_MAX_IN_FLIGHT = 20
+
+class AsyncHeimaoClient:
+    """黑猫投诉异步API客户端"""
+
+    def __init__(self, cookie: Optional[str] = None, timeout=DEFAULT_TIMEOUT,
+                 max_connections: int = DEFAULT_MAX_IN_FLIGHT, base_url: str = HEIMAO_BASE_URL,
+                 transport: Optional[httpx.AsyncBaseTransport] = None, signer: Optional[HeimaoSigner] = None,
+                 cache: Optional[ResponseCache] = None, metrics: Optional[MetricsRegistry] = None):
+        """
+        初始化异步客户端
+
+        Args:
+            cookie: 登录Cookie
+            timeout: 请求超时时间，可以是秒数或(连接超时, 读取超时)
+            max_connections: 连接池最大连接数
+            base_url: 站点地址，测试时可指向本地仿真服务
+            transport: 自定义传输层，测试时可传入httpx.MockTransport
+            signer: 签名生成器，为None时使用模块级的默认签名生成器
+            cache: 搜索结果的响应缓存，为None时不缓存
+            metrics: 记录请求指标的注册表，为None时使用默认注册表
+        """
+        self.cookie = cookie
+        self.signer = signer or default_signer
+        self.cache = cache
+        self.metrics = metrics or default_registry
+        self.base_url = base_url.rstrip('/')
+        self.search_api = f"{self.base_url}/api/index/s"
+
+        if isinstance(timeout, (list, tuple)):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+
+        headers = dict(DEFAULT_HEADERS)
+        if cookie:
+            headers["cookie"] = cookie
+
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport
+        )
+
+    # 缓存键、缓存读取和请求指标与同步客户端一致；异步引擎中缓存的SQLite读写通过asyncio.to_thread在线程中进行
+    paced = HeimaoClient.paced
+    search_cache_request = HeimaoClient.search_cache_request
+    cached_search_page = HeimaoClient.cached_search_page
+    record_response = HeimaoClient.record_response
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """关闭客户端并释放连接"""
+        await self.client.aclose()
+
+    async def search_page(self, keyword: str = "", page: int = 1, page_size: int = 10) -> Dict[str, Any]:
+        """
+        请求并解析单页搜索结果
+
+        Returns:
+            dict: 包含status（'success'/'login_required'/'error'）、lists、pager的字典
+
+        Raises:
+            CacheMissError: 离线模式下缓存中没有该页
+            httpx.HTTPStatusError: 响应状态码为4xx/5xx
+        """
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cached_search_page, keyword, page, page_size)
+            if cached is not None:
+                return cached
+        if self.cache is not None and self.cache.offline:
+            raise CacheMissError(f"离线模式下缓存中没有关键词'{keyword}'第{page}页")
+        ts, rs, signature = self.signer.sign(keyword, page, page_size)
+        params = {
+            "ts": ts,
+            "rs": rs,
+            "signature": signature,
+            "keywords": keyword or "",
+            "page_size": page_size,
+            "page": page
+        }
+        referer = f"{self.base_url}/index/search/?keywords={urllib.parse.quote(keyword or '')}&t=1"
+        logger.debug(f"请求关键词'{keyword}'第{page}页")
+        try:
+            async with async_request_slot():
+                with self.metrics.span('heimao_request_duration_seconds', endpoint='search'):
+                    response = await self.client.get(self.search_api, params=params, headers={"referer": referer})
+        except Exception:
+            self.record_response('search', 'error')
+            raise
+        self.record_response('search', response.status_code, len(response.content))
+        if is_login_redirect(response):
+            logger.error("搜索请求被重定向到登录页，Cookie无效或已过期")
+            return {'status': 'login_required'}
+        raise_for_status(response)
+        result = parse_search_response(response.text, self.cookie)
+        if self.cache is not None and classify_page(result) == 'ok':
+            await asyncio.to_thread(self.cache.store, self.search_cache_request(keyword, page, page_size),
+                                    response.content, status=response.status_code)
+        return result
+
+def create_async_client(config: Dict[str, Any], transport: Optional[httpx.AsyncBaseTransport] = None,
+                        cache: Optional[ResponseCache] = None):
+    """
+    根据站点配置创建AsyncHeimaoClient，auth.cookie_envs配置了多个有效Cookie时创建异步账号池；
+    请求发往site_info.base_url，未配置时为黑猫投诉站点
+
+    Args:
+        config: 配置信息字典
+        transport: 自定义传输层（测试用）
+        cache: 搜索结果的响应缓存，账号池中的各账号共用
+
+    Returns:
+        AsyncHeimaoClient或AsyncAccountPool: 异步客户端
+    """
+    scraping = config.get('scraping', {})
+    api_config = scraping.get('api', {})
+    auth = config.get('auth', {})
+
+    cookies = load_cookies(auth)
+    max_in_flight = scraping.get('concurrency', {}).get('max_in_flight', DEFAULT_MAX_IN_FLIGHT)
+    base_url = config.get('site_info', {}).get('base_url', HEIMAO_BASE_URL)
+
+    if len(cookies) > 1:
+        pool_config = auth.get('pool', {})
+        accounts = [
+            Account(name, AsyncHeimaoClient(cookie=cookie, timeout=api_config.get('timeout', DEFAULT_TIMEOUT),
+                                            max_connections=max_in_flight, base_url=base_url,
+                                            transport=transport, cache=cache),
+                    build_rate_limiter(scraping, shared=False))
+            for name, cookie in cookies
+        ]
+        logger.info(f"使用账号池: {len(accounts)} 个账号轮流请求")
+        return AsyncAccountPool(accounts, quarantine=pool_config.get('quarantine', DEFAULT_QUARANTINE),
+                                max_failures=pool_config.get('max_failures', DEFAULT_MAX_FAILURES))
+
+    cookie = cookies[0][1] if cookies else None
+    return AsyncHeimaoClient(
+        cookie=cookie,
+        timeout=api_config.get('timeout', DEFAULT_TIMEOUT),
+        max_connections=max_in_flight,
+        base_url=base_url,
+        transport=transport,
+        cache=cache
+    )
+
+async def _search_page_with_retry(client, keyword, page, page_size, semaphore, rate_limiter,
+                                  retry_policy, backoff_retries=0):
+    """
+    请求单页，与同步引擎的search_page_adaptive行为一致
+
+    可重试的错误按retry_policy以带抖动的指数退避重试，致命错误立即返回，重试等待期间不占用并发名额；
+    rate_limiter为AdaptiveRateLimiter时，风控和登录页（已提供Cookie时）使其降速暂停后重试同一页，最多backoff_retries次；
+    客户端启用了响应缓存时先读缓存，命中时不占用并发名额也不等待限速器
+    """
+    if getattr(client, 'cache', None) is not None:
+        cached = await asyncio.to_thread(client.cached_search_page, keyword, page, page_size)
+        if cached is not None:
+            return cached
+
+    adaptive = isinstance(rate_limiter, AdaptiveRateLimiter)
+    attempt = 1
+    backoffs = 0
+    while True:
+        error = None
+        async with semaphore:
+            if rate_limiter:
+                await rate_limiter.acquire_async()
+            try:
+                result = await client.search_page(keyword, page, page_size)
+            except Exception as e:
+                logger.error(f"获取关键词'{keyword}'第{page}页时出错: {e}")
+                result = {'status': 'error'}
+                error = e
+
+        signal = classify_page(result)
+        if signal == 'ok':
+            if adaptive:
+                rate_limiter.on_success()
+            return result
+        if signal == 'login_required' and not client.cookie:
+            return result
+        if adaptive:
+            rate_limiter.on_backoff(f"关键词'{keyword}'第{page}页{BACKOFF_REASONS[signal]}")
+
+        if signal == 'error':
+            error = error or RetryableError("响应为空或无法解析")
+            if not retry_policy.should_retry(error, attempt):
+                if not retry_policy.retryable(error):
+                    logger.error(f"关键词'{keyword}'第{page}页遇到不可重试的错误: {error}")
+                    result['fatal'] = True
+                return result
+            wait = retry_policy.backoff(attempt)
+            attempt += 1
+            logger.warning(f"{wait:.2f}秒后第{attempt}次尝试获取关键词'{keyword}'第{page}页")
+            await asyncio.sleep(wait)
+            continue
+
+        if not adaptive or backoffs >= backoff_retries:
+            return result
+        backoffs += 1
+        logger.info(f"退避后第{backoffs}次重试关键词'{keyword}'第{page}页")
+
+async def get_complaints_async(client: AsyncHeimaoClient, keyword: str = "", page: int = 1,
+                               page_size: int = 10, max_pages: int = 5,
+                               semaphore: Optional[asyncio.Semaphore] = None,
+                               rate_limiter=None, max_attempts: int = 1, delay: float = 0,
+                               watermark: Optional[Dict[str, Any]] = None, batch_size: int = 1,
+                               on_page=None, backoff_retries: int = 0,
+                               retry_policy: Optional[RetryPolicy] = None, cursor=None) -> Dict[str, Any]:
+    """
+    异步获取黑猫投诉数据，先请求起始页获取总页数，再并发请求剩余页
+
+    Args:
+        client: 异步客户端
+        keyword: 搜索关键词
+        page: 起始页码
+        page_size: 每页数量
+        max_pages: 最大页数
+        semaphore: 限制同时进行中请求数的信号量，多个关键词应共享同一个
+        rate_limiter: 限速器（RateLimiter）
+        max_attempts: 单页最大尝试次数（未传入retry_policy时使用，固定间隔）
+        delay: 重试间隔（秒）（未传入retry_policy时使用）
+        watermark: 增量爬取的水位线，某页全部为已知投诉时停止翻页
+        batch_size: 增量模式下每批并发请求的页数
+        on_page: 每页投诉的回调（按页码顺序在工作线程中调用，多个关键词可能同时调用），传入时结果中的data为空
+        backoff_retries: 使用AdaptiveRateLimiter时，单页触发退避后重试的次数
+        retry_policy: 请求出错时的重试策略（RetryPolicy）
+        cursor: 分页游标检查点（PageCursor），存在未完成的检查点时从记录的页码继续，正常结束后删除
+
+    Returns:
+        dict: 与get_complaints相同结构的结果字典
+    """
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(DEFAULT_MAX_IN_FLIGHT)
+
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_attempts, delay, multiplier=1, jitter=False)
+
+    def fetch(page_num):
+        return _search_page_with_retry(client, keyword, page_num, page_size, semaphore,
+                                       rate_limiter, retry_policy, backoff_retries)
+
+    collector = ComplaintCollector(on_page, cursor)
+    page = await asyncio.to_thread(collector.resume, page)
+    total_pages = 1
+    last_page = page
+    next_page = page
+    pages_fetched = 0
+    stopped = False
+    reached_known = False
+
+    # 先请求起始页获取总页数，剩余页一次性并发请求；增量模式下按批请求以便及时停止
+    while next_page <= last_page and not stopped:
+        if next_page == page:
+            batch_pages = [page]
+        else:
+            size = max(1, batch_size) if watermark else last_page - next_page + 1
+            batch_pages = list(range(next_page, min(last_page, next_page + size - 1) + 1))
+        page_results = await asyncio.gather(*(fetch(p) for p in batch_pages))
+
+        # 按页码顺序合并，遇到失败、风控或已知页时停止
+        for page_num, page_result in zip(batch_pages, page_results):
+            if page_result['status'] == 'login_required':
+                return {'status': 'error', 'message': "需要登录Cookie才能使用搜索功能", 'data': collector.data}
+            if page_result['status'] != 'success':
+                stopped = True
+                break
+            if page_num == page:
+                total_pages = page_result['pager'].get('page_amount', 1)
+                last_page = min(total_pages, max_pages)
+            lists = page_result['lists']
+            if len(lists) == 0 and page_result['pager'].get('item_count', 0) > 0:
+                logger.warning(f"关键词'{keyword}'第{page_num}页可能触发风控机制，丢弃后续分页")
+                stopped = True
+                break
+            # 写入输出文件（含fsync）、sn索引和检查点都是磁盘读写，放到线程中进行，不阻塞其他关键词的请求
+            await asyncio.to_thread(collector.add, lists)
+            pages_fetched += 1
+            if watermark and is_page_known(lists, watermark):
+                logger.info(f"关键词'{keyword}'第{page_num}页均为已知投诉，停止翻页")
+                reached_known = True
+                stopped = True
+                break
+        next_page = batch_pages[-1] + 1
+
+    if cursor and (reached_known or not stopped):
+        await asyncio.to_thread(cursor.finish)
+
+    return {
+        'status': 'success' if collector.count else 'error',
+        'count': collector.count,
+        'keyword': keyword if keyword else None,
+        'pages_fetched': pages_fetched,
+        'total_pages': total_pages,
+        'complete': reached_known or not stopped,
+        'watermark': collector.watermark,
+        'data': collector.data
+    }
+
+async def scrape_heimao_async(config: Dict[str, Any], output_dir: Optional[str] = None,
+                              client: Optional[AsyncHeimaoClient] = None) -> Dict[str, Any]:
+    """
+    异步主爬虫函数，所有关键词在同一事件循环中并发搜索
+
+    Args:
+        config: 配置信息字典
+        output_dir: 输出目录
+        client: 共享的AsyncHeimaoClient，为None时根据配置创建
+
+    Returns:
+        dict: 与scrape_heimao相同结构的结果字典
+    """
+    scraping = config.get('scraping', {})
+    output_config = config.get('output', {})
+
+    api_config = scraping.get('api', {})
+    page_size = api_config.get('page_size', 10)
+    max_pages = api_config.get('max_pages', 5)
+
+    retry_policy = RetryPolicy.from_config(scraping.get('retry', {}))
+
+    max_in_flight = scraping.get('concurrency', {}).get('max_in_flight', DEFAULT_MAX_IN_FLIGHT)
+    semaphore = asyncio.Semaphore(max_in_flight)
+    rate_limiter = build_rate_limiter(scraping)
+    page_backoff_retries = get_backoff_retries(scraping)
+
+    if not output_dir:
+        today = datetime.now().strftime('%Y-%m-%d')
+        output_dir = os.path.join('data', 'daily', today)
+    os.makedirs(output_dir, exist_ok=True)
+
+    search_keywords = collect_keywords(scraping)
+    watermarks = open_watermark_store(scraping)
+    page_workers = scraping.get('concurrency', {}).get('page_workers', 1)
+
+    # 上次运行中断时从检查点继续
+    cursors = open_cursor_store(scraping)
+
+    # 每获取一页即写入输出文件，并合并当天输出文件中已有的投诉（与同步引擎相同）；
+    # 写入、sn索引和检查点在线程中进行（见get_complaints_async），启用详情页抓取时详情页在后台线程中抓取，都不阻塞事件循环
+    sn_index = open_sn_index(config)
+    cache = open_response_cache(config)
+    details = open_detail_fetcher(config, output_dir, retry_policy, cache)
+    sink = open_complaint_sink(output_config, output_dir, sn_index, config.get('processing', {}), append=True,
+                               on_written=details.submit if details else None)
+
+    async def search(keyword):
+        watermark = watermarks.get(keyword or WATERMARK_LATEST_KEY) if watermarks else None
+        start_time = time.perf_counter()
+        result = await get_complaints_async(
+            client, keyword, page_size=page_size, max_pages=max_pages, semaphore=semaphore,
+            rate_limiter=rate_limiter, watermark=watermark, batch_size=page_workers,
+            on_page=sink.write_page, backoff_retries=page_backoff_retries, retry_policy=retry_policy,
+            cursor=open_page_cursor(cursors, scraping, keyword)
+        )
+        return result, time.perf_counter() - start_time
+
+    own_client = client is None
+    if own_client:
+        client = create_async_client(config, cache=cache)
+
+    # 使用账号池时由各账号的限速器控制节奏，风控和登录页由账号池换账号重试；离线回放时无需限速
+    if getattr(client, 'paced', False):
+        rate_limiter = None
+        page_backoff_retries = 0
+
+    run_start = time.perf_counter()
+    try:
+        search_results = await asyncio.gather(*(search(keyword) for keyword in search_keywords))
+    finally:
+        if own_client:
+            await client.aclose()
+        await asyncio.to_thread(sink.close)
+        if sn_index is not None:
+            sn_index.close()
+        if details is not None:
+            await asyncio.to_thread(details.close)
+        if cache is not None:
+            cache.close()
+    run_elapsed = time.perf_counter() - run_start
+    default_registry.observe('heimao_run_duration_seconds', run_elapsed)
+    logger.info(f"搜索阶段共耗时 {run_elapsed:.2f} 秒")
+
+    keyword_stats = []
+    for keyword, (result, elapsed) in zip(search_keywords, search_results):
+        keyword_stats.append(keyword_stat(keyword, result, elapsed))
+        if result.get('status') == 'success' and watermarks:
+            update_watermark(watermarks, keyword, result)
+
+    if watermarks:
+        watermarks.save()
+
+    result = {
+        'status': 'success',
+        'count': sink.count,
+        'output_path': sink.output_path,
+        'keywords': keyword_stats
+    }
+    if details is not None:
+        result['details'] = details.stats()
+    if cache is not None:
+        result['http_cache'] = cache.stats()
+    if isinstance(client, AsyncAccountPool):
+        result['accounts'] = client.stats()
+        for stats in result['accounts']:
+            logger.info(f"账号{stats['account']}: {stats}")
+    metrics_path = write_metrics(output_dir, 'heimao', output_config.get('metrics'), prefix='heimao_')
+    if metrics_path:
+        result['metrics_path'] = metrics_path
+    return result
+
+def run_scrape_heimao_async(config: Dict[str, Any], output_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    异步引擎的同步入口，可作为custom_function由框架调用
+
+    Args:
+        config: 配置信息字典
+        output_dir: 输出目录
+
+    Returns:
+        dict: 包含爬取结果的字典
+    """
+    return asyncio.run(scrape_heimao_async(config, output_dir))
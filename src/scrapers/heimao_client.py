@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+黑猫投诉API客户端
+封装签名生成、默认请求头、Cookie和带连接池的HTTP会话，供爬虫和命令行工具共用
+"""
+
+import time
+import random
+import hashlib
+import json
+import string
+import logging
+import urllib.parse
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Union
+
+import requests
+
+from utils.http_cache import CacheMissError, ResponseCache, normalize_request
+from utils.http_pool import close_session, mount_adapter, request_slot
+from utils.metrics import MetricsRegistry, default_registry
+
+logger = logging.getLogger('heimao_client')
+
+# 黑猫投诉站点地址
+HEIMAO_BASE_URL = "https://tousu.sina.com.cn"
+
+# 签名使用的固定值
+SIGNATURE_SECRET = '$d6eb7ff91ee257475%'
+
+# 默认超时时间（连接超时, 读取超时），单位秒
+DEFAULT_TIMEOUT = (5, 15)
+
+# 默认请求头，由会话统一持有，无需每次请求重建
+DEFAULT_HEADERS = {
+    "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
+    "accept": "*/*",
+    "accept-language": "zh-CN,zh;q=0.9",
+    "cache-control": "no-cache",
+    "pragma": "no-cache",
+    "sec-ch-ua": '"Chromium";v="136", "Not.A/Brand";v="99"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"macOS"',
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-origin",
+    "x-requested-with": "XMLHttpRequest"
+}
+
+# 请求指标（endpoint标签：search/feed/detail）
+default_registry.describe('heimao_request_duration_seconds', "黑猫投诉请求耗时（秒）")
+default_registry.describe('heimao_requests_total', "黑猫投诉请求数（按响应状态码，请求异常时为error）")
+default_registry.describe('heimao_response_bytes_total', "黑猫投诉响应的字节数")
+
+# 随机串rs的字符表（数字、小写字母、大写字母）
+SIGNATURE_ALPHABET = string.digits + string.ascii_lowercase + string.ascii_uppercase
+
+# 随机串rs的长度
+SIGNATURE_RANDOM_LENGTH = 16
+
+class HeimaoSigner:
+    """
+    签名生成器
+
+    字符表、固定值和随机数生成器在创建时准备好，每次签名只需一次choices调用生成随机串、
+    一次排序和一次SHA-256；批量签名时同一批共用时间戳，每页数量等参数只转换一次
+    """
+
+    def __init__(self, secret: str = SIGNATURE_SECRET, seed: Optional[int] = None):
+        """
+        Args:
+            secret: 签名使用的固定值
+            seed: 随机数种子，为None时使用系统随机源初始化
+        """
+        self.secret = secret
+        self._choices = random.Random(seed).choices
+        self._alphabet = SIGNATURE_ALPHABET
+
+    @staticmethod
+    def timestamp() -> str:
+        """13位毫秒时间戳"""
+        return str(int(time.time() * 1000))
+
+    def random_string(self) -> str:
+        """生成16位随机串"""
+        return ''.join(self._choices(self._alphabet, k=SIGNATURE_RANDOM_LENGTH))
+
+    def _digest(self, parts: List[str]) -> str:
+        parts.sort()
+        return hashlib.sha256(''.join(parts).encode('utf-8')).hexdigest()
+
+    def sign(self, keyword: str = "", page: int = 1, page_size: int = 10,
+             ts: Optional[str] = None, rs: Optional[str] = None) -> Tuple[str, str, str]:
+        """
+        生成搜索接口的签名参数
+
+        Args:
+            keyword: 搜索关键词
+            page: 页码
+            page_size: 每页数量
+            ts: 时间戳，为None时取当前时间
+            rs: 随机串，为None时随机生成
+
+        Returns:
+            tuple: (ts, rs, signature)
+        """
+        ts = ts or self.timestamp()
+        rs = rs or self.random_string()
+        # 即使没有关键词，也使用搜索接口格式，关键词为空字符串
+        signature = self._digest([self.secret, keyword or '', str(page_size), ts, str(page), rs])
+        return ts, rs, signature
+
+    def sign_many(self, requests_to_sign: Iterable[Tuple[str, int]], page_size: int = 10,
+                  ts: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """
+        批量生成搜索接口的签名参数
+
+        Args:
+            requests_to_sign: (关键词, 页码)列表
+            page_size: 每页数量
+            ts: 整批共用的时间戳，为None时取当前时间
+
+        Returns:
+            List[tuple]: 与输入顺序对应的(ts, rs, signature)列表
+        """
+        ts = ts or self.timestamp()
+        secret = self.secret
+        page_size_str = str(page_size)
+        random_string = self.random_string
+        digest = self._digest
+        signatures = []
+        for keyword, page in requests_to_sign:
+            rs = random_string()
+            signatures.append((ts, rs, digest([secret, keyword or '', page_size_str, ts, str(page), rs])))
+        return signatures
+
+    def sign_feed(self, page: int = 1, page_size: int = 10, feed_type: int = 2,
+                  ts: Optional[str] = None, rs: Optional[str] = None) -> Tuple[str, str, str]:
+        """生成最新投诉列表接口（/api/index/feed）的签名参数，返回(ts, rs, signature)"""
+        ts = ts or self.timestamp()
+        rs = rs or self.random_string()
+        signature = self._digest([self.secret, str(page_size), ts, str(feed_type), str(page), rs])
+        return ts, rs, signature
+
+# 模块级的默认签名生成器
+default_signer = HeimaoSigner()
+
+def generate_signature(keyword="", page=1, page_size=10):
+    """生成黑猫投诉API请求的签名参数"""
+    return default_signer.sign(keyword, page, page_size)
+
+def generate_feed_signature(page=1, page_size=10, feed_type=2):
+    """生成最新投诉列表接口（/api/index/feed）的签名参数"""
+    return default_signer.sign_feed(page, page_size, feed_type)
+
+# 触发自适应退避的响应情况及其说明（见classify_page、classify_error）
+BACKOFF_REASONS = {
+    'risk_control': "触发风控",
+    'login_required': "返回登录页",
+    'server_error': "服务端出错",
+    'error': "请求出错"
+}
+
+# 登录页所在的域名，搜索请求被重定向到这些地址时说明Cookie无效或未登录
+LOGIN_HOSTS = ('passport.weibo.com', 'passport.weibo.cn', 'login.sina.com.cn', 'passport.sina.cn')
+
+def raise_for_status(response) -> None:
+    """
+    响应为4xx/5xx时抛出HTTP错误（requests.HTTPError或httpx.HTTPStatusError），不再把错误页当作搜索结果解析
+
+    错误中带有状态码，由重试策略区分可重试的错误（429、5xx）和致命错误（如403、404），见utils.retry
+
+    Args:
+        response: requests.Response或httpx.Response
+    """
+    if response.status_code >= 400:
+        response.raise_for_status()
+
+def is_login_redirect(response) -> bool:
+    """
+    判断请求是否被重定向到了登录页
+
+    requests跟随重定向，看最终的地址；httpx不跟随重定向，看Location响应头
+
+    Args:
+        response: requests.Response或httpx.Response
+    """
+    urls = [str(response.url), response.headers.get('location') or '']
+    return any(urllib.parse.urlsplit(url).hostname in LOGIN_HOSTS for url in urls if url)
+
+def is_login_page(text: str) -> bool:
+    """
+    判断响应是否为登录页面（Cookie无效或未登录时接口返回HTML登录页，而不是JSON）
+
+    只检查HTML响应，JSON中的投诉内容含有"登录"等字样时不会误判；其他HTML页面（如网关错误页）不视为登录页
+    """
+    head = text.lstrip()[:1]
+    if head != '<':
+        return False
+    return "登录" in text or "passport" in text.lower()
+
+def parse_search_response(text: str, cookie: Optional[str] = None) -> Dict[str, Any]:
+    """
+    解析搜索接口的响应内容
+
+    Args:
+        text: 响应文本
+        cookie: 请求使用的Cookie，仅用于区分日志提示
+
+    Returns:
+        dict: 包含status（'success'/'login_required'/'error'）、lists、pager的字典
+    """
+    # 检查是否重定向到登录页面
+    if is_login_page(text):
+        if cookie:
+            logger.error("提供的Cookie无效或已过期")
+        else:
+            logger.warning("未提供Cookie，搜索功能可能受限")
+        return {'status': 'login_required'}
+
+    # 尝试解析JSON
+    if not text.strip():
+        logger.error("响应内容为空")
+        return {'status': 'error'}
+
+    try:
+        result = json.loads(text)
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON解析错误: {e}")
+        logger.debug(f"原始响应: {text[:200]}...")
+        return {'status': 'error'}
+
+    logger.debug(f"API返回内容: {text[:200]}...")
+
+    # 检查返回值结构
+    if 'result' not in result:
+        logger.error(f"API返回数据格式异常: {result}")
+        return {'status': 'error'}
+
+    if result['result']['status']['code'] != 0:
+        logger.error(f"请求失败: {result}")
+        return {'status': 'error'}
+
+    data = result['result']['data']
+    return {
+        'status': 'success',
+        'lists': data.get('lists', []),
+        'pager': data.get('pager', {})
+    }
+
+def classify_page(page_result: Dict[str, Any]) -> str:
+    """
+    判断单页响应的情况
+
+    Args:
+        page_result: HeimaoClient.search_page返回的结果
+
+    Returns:
+        str: 'ok'、'risk_control'（列表为空但总数大于0）、'login_required'或'error'
+    """
+    status = page_result.get('status')
+    if status == 'success':
+        if not page_result['lists'] and page_result['pager'].get('item_count', 0) > 0:
+            return 'risk_control'
+        return 'ok'
+    return 'login_required' if status == 'login_required' else 'error'
+
+def classify_error(error: BaseException) -> str:
+    """
+    判断请求异常的情况，供账号池记录账号的健康状况
+
+    Args:
+        error: search_page抛出的异常
+
+    Returns:
+        str: 'risk_control'（403、429，账号被限流或拒绝）、'server_error'（5xx）或'error'（网络错误等，与账号无关）
+    """
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status in (403, 429):
+        return 'risk_control'
+    if status is not None and status >= 500:
+        return 'server_error'
+    return 'error'
+
+class HeimaoClient:
+    """黑猫投诉API客户端，持有带连接池和keep-alive的会话"""
+
+    def __init__(self, cookie: Optional[str] = None,
+                 timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+                 pool_size: int = 10, base_url: str = HEIMAO_BASE_URL,
+                 headers: Optional[Dict[str, str]] = None, signer: Optional[HeimaoSigner] = None,
+                 cache: Optional[ResponseCache] = None, metrics: Optional[MetricsRegistry] = None):
+        """
+        初始化客户端
+
+        Args:
+            cookie: 登录Cookie
+            timeout: 请求超时时间，可以是秒数或(连接超时, 读取超时)
+            pool_size: 连接池大小，应不小于并发请求的线程数
+            base_url: 站点地址
+            headers: 额外的默认请求头
+            signer: 签名生成器，为None时使用模块级的默认签名生成器
+            cache: 搜索结果的响应缓存，为None时不缓存
+            metrics: 记录请求指标的注册表，为None时使用默认注册表
+        """
+        self.cookie = cookie
+        self.signer = signer or default_signer
+        self.cache = cache
+        self.metrics = metrics or default_registry
+        self.timeout = timeout
+        self.base_url = base_url.rstrip('/')
+        self.search_api = f"{self.base_url}/api/index/s"
+        self.feed_api = f"{self.base_url}/api/index/feed"
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        if headers:
+            self.session.headers.update(headers)
+        if cookie:
+            self.session.headers["cookie"] = cookie
+
+        # 单进程运行多个站点时挂载共享连接池（见utils.http_pool）
+        mount_adapter(self.session, pool_size)
+
+    @property
+    def paced(self) -> bool:
+        """离线回放时不请求网络，调用方无需限速"""
+        return self.cache is not None and self.cache.offline
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """关闭会话并释放连接"""
+        close_session(self.session)
+
+    def get(self, url: str, referer: Optional[str] = None, endpoint: str = 'other') -> requests.Response:
+        """
+        使用会话发送GET请求，并记录请求耗时、状态码和响应字节数
+
+        设置了全局并发预算时先等待请求名额（等待时间不计入请求耗时）
+
+        Args:
+            url: 请求URL
+            referer: referer请求头
+            endpoint: 指标中的接口标签
+
+        Returns:
+            requests.Response: 响应对象
+        """
+        headers = {"referer": referer} if referer else None
+        try:
+            with request_slot(), self.metrics.span('heimao_request_duration_seconds', endpoint=endpoint):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except Exception:
+            self.record_response(endpoint, 'error')
+            raise
+        self.record_response(endpoint, response.status_code, len(response.content))
+        return response
+
+    def record_response(self, endpoint: str, status: Union[int, str], size: int = 0):
+        """记录一次请求的状态码和响应字节数"""
+        self.metrics.inc('heimao_requests_total', endpoint=endpoint, status=status)
+        if size:
+            self.metrics.inc('heimao_response_bytes_total', size, endpoint=endpoint)
+
+    def build_search_url(self, keyword: str = "", page: int = 1, page_size: int = 10) -> Tuple[str, str]:
+        """
+        构建带签名的搜索接口URL
+
+        Returns:
+            tuple: (请求URL, referer)
+        """
+        ts, rs, signature = self.signer.sign(keyword, page, page_size)
+        encoded_keyword = urllib.parse.quote(keyword) if keyword else ""
+        url = f"{self.search_api}?ts={ts}&rs={rs}&signature={signature}&keywords={encoded_keyword}&page_size={page_size}&page={page}"
+        referer = f"{self.base_url}/index/search/?keywords={encoded_keyword}&t=1"
+        return url, referer
+
+    def fetch_search(self, keyword: str = "", page: int = 1, page_size: int = 10) -> requests.Response:
+        """请求搜索接口，返回原始响应"""
+        url, referer = self.build_search_url(keyword, page, page_size)
+        logger.debug(f"请求URL(第{page}页): {url}")
+        return self.get(url, referer, endpoint='search')
+
+    def fetch_feed(self, page: int = 1, page_size: int = 10, feed_type: int = 2) -> requests.Response:
+        """请求最新投诉列表接口，返回原始响应"""
+        ts, rs, signature = self.signer.sign_feed(page, page_size, feed_type)
+        url = f"{self.feed_api}?ts={ts}&rs={rs}&signature={signature}&type={feed_type}&page_size={page_size}&page={page}&_={ts}"
+        logger.debug(f"请求URL: {url}")
+        return self.get(url, endpoint='feed')
+
+    def search_cache_request(self, keyword: str = "", page: int = 1, page_size: int = 10) -> str:
+        """搜索请求在响应缓存中的键（不含每次变化的ts/rs/signature，也不含Cookie，各账号共用）"""
+        return normalize_request(self.search_api, params={'keywords': keyword, 'page_size': page_size, 'page': page})
+
+    def cached_search_page(self, keyword: str = "", page: int = 1, page_size: int = 10) -> Optional[Dict[str, Any]]:
+        """
+        从响应缓存读取单页搜索结果，调用方可在限速等待之前先调用
+
+        Returns:
+            dict: 解析后的结果，未启用缓存或未命中时返回None
+        """
+        if self.cache is None:
+            return None
+        entry = self.cache.get(self.search_cache_request(keyword, page, page_size))
+        if entry is None:
+            return None
+        logger.debug(f"使用缓存的搜索结果: 关键词'{keyword}'第{page}页")
+        return parse_search_response(entry.text, self.cookie)
+
+    def search_page(self, keyword: str = "", page: int = 1, page_size: int = 10) -> Dict[str, Any]:
+        """
+        请求并解析单页搜索结果
+
+        启用响应缓存时先读缓存，只有正常的结果（非登录页、风控或错误）才写入缓存
+
+        Args:
+            keyword: 搜索关键词
+            page: 页码
+            page_size: 每页数量
+
+        Returns:
+            dict: 包含status（'success'/'login_required'/'error'）、lists、pager的字典
+
+        Raises:
+            CacheMissError: 离线模式下缓存中没有该页
+            requests.HTTPError: 响应状态码为4xx/5xx
+        """
+        cached = self.cached_search_page(keyword, page, page_size)
+        if cached is not None:
+            return cached
+        if self.cache is not None and self.cache.offline:
+            raise CacheMissError(f"离线模式下缓存中没有关键词'{keyword}'第{page}页")
+        response = self.fetch_search(keyword, page, page_size)
+        if is_login_redirect(response):
+            logger.error("搜索请求被重定向到登录页，Cookie无效或已过期")
+            return {'status': 'login_required'}
+        raise_for_status(response)
+        result = parse_search_response(response.text, self.cookie)
+        if self.cache is not None and classify_page(result) == 'ok':
+            self.cache.store(self.search_cache_request(keyword, page, page_size), response.content,
+                             status=response.status_code)
+        return result
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+黑猫投诉详情页抓取
+为本次新增或有变化的投诉抓取详情页（完整投诉内容和处理进度时间线），作为搜索列表之后的可选第二阶段：
+详情请求在有界线程池中与列表翻页并行进行，借助共用的响应缓存发送条件请求（ETag/Last-Modified）避免重复下载未变化的页面，
+并按块流式解析HTML，时间线结束后即停止读取
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+from scrapers.heimao_client import DEFAULT_TIMEOUT, HeimaoClient
+from utils.http_cache import CacheMissError, ResponseCache, normalize_request
+from utils.http_pool import request_slot
+from utils.output_writers import open_writer
+from utils.rate_limiter import RateLimiter
+from utils.retry import RetryPolicy
+from utils.text_normalizer import TextNormalizer
+
+logger = logging.getLogger('heimao_detail')
+
+# 详情页中各部分所在元素的class（页面改版时在此调整）
+TITLE_CLASS = 'article'
+FIELD_LIST_CLASS = 'ts-q-list'
+TIMELINE_CLASS = 'ts-d-steplist'
+STEP_CLASS = 'ts-d-item'
+STEP_FIELD_CLASSES = {
+    'u-name': 'actor',
+    'u-status': 'action',
+    'u-date': 'time'
+}
+STEP_CONTENT_CLASS = 'ts-d-cont'
+
+# 投诉信息列表中的标签与输出字段的对应关系
+FIELD_LABELS = {
+    '投诉编号': 'sn',
+    '投诉对象': 'company',
+    '投诉问题': 'issue',
+    '投诉要求': 'appeal',
+    '涉诉金额': 'cost',
+    '投诉进度': 'progress'
+}
+
+# 没有结束标签的元素
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+# 内容中按换行处理的元素
+BLOCK_ELEMENTS = {'br', 'p', 'div', 'li'}
+
+# 每次从响应中读取的字节数
+DEFAULT_CHUNK_SIZE = 16 * 1024
+
+# 默认的详情页抓取配置
+DEFAULT_DETAIL_WORKERS = 4
+DEFAULT_DETAIL_RPS = 1.0
+DEFAULT_MAX_DETAILS = 500
+DEFAULT_DETAIL_FILENAME = 'heimao_details.jsonl'
+
+class DetailPageParser(HTMLParser):
+    """
+    投诉详情页的流式解析器
+
+    可以分块调用feed，解析完时间线后done变为True，调用方即可停止读取响应的剩余部分
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.done = False
+        self.title = ''
+        self.fields: Dict[str, str] = {}
+        self.timeline: List[Dict[str, str]] = []
+        self._stack: List[tuple] = []
+        self._label: Optional[List[str]] = None
+        self._value: Optional[List[str]] = None
+        self._step: Optional[Dict[str, List[str]]] = None
+
+    def _within(self, cls: str) -> bool:
+        return any(cls in classes for _, classes in self._stack)
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        classes = tuple((dict(attrs).get('class') or '').split())
+        if tag in BLOCK_ELEMENTS and self._step is not None and self._within(STEP_CONTENT_CLASS):
+            self._step['content'].append('\n')
+        if tag in VOID_ELEMENTS:
+            return
+        self._stack.append((tag, classes))
+        if tag == 'li' and self._within(FIELD_LIST_CLASS):
+            self._label, self._value = [], []
+        elif STEP_CLASS in classes:
+            self._step = {'actor': [], 'action': [], 'time': [], 'content': []}
+
+    def handle_endtag(self, tag):
+        if self.done or tag in VOID_ELEMENTS:
+            return
+        # 容忍未闭合的标签：弹出到最近的同名元素
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth][0] == tag:
+                break
+        else:
+            return
+        closed = self._stack[depth:]
+        del self._stack[depth:]
+        for closed_tag, classes in reversed(closed):
+            if closed_tag == 'li' and self._label is not None and self._within(FIELD_LIST_CLASS):
+                label = ''.join(self._label).strip().strip('[]【】:： ')
+                self.fields[FIELD_LABELS.get(label, label)] = ''.join(self._value)
+                self._label = self._value = None
+            elif STEP_CLASS in classes and self._step is not None:
+                self.timeline.append({key: ''.join(parts) for key, parts in self._step.items()})
+                self._step = None
+            elif TIMELINE_CLASS in classes:
+                self.done = True
+
+    def handle_data(self, data):
+        if self.done or not self._stack:
+            return
+        if self._step is not None:
+            for _, classes in reversed(self._stack):
+                for cls in classes:
+                    key = STEP_FIELD_CLASSES.get(cls)
+                    if key:
+                        self._step[key].append(data)
+                        return
+                    if cls == STEP_CONTENT_CLASS:
+                        self._step['content'].append(data)
+                        return
+                if STEP_CLASS in classes:
+                    return
+        elif self._label is not None:
+            tag = self._stack[-1][0]
+            (self._label if tag == 'label' else self._value).append(data)
+        elif self._within(TITLE_CLASS):
+            self.title += data
+
+    def result(self, normalize=None) -> Dict[str, Any]:
+        """
+        返回解析结果
+
+        Args:
+            normalize: 文本清洗函数，为None时使用默认的TextNormalizer
+
+        Returns:
+            dict: 包含title、fields（投诉信息）、content（投诉全文，即时间线第一步的内容）、timeline的字典
+        """
+        normalize = normalize or TextNormalizer()
+        timeline = [{key: normalize(value) for key, value in step.items()} for step in self.timeline]
+        return {
+            'title': normalize(self.title),
+            'fields': {key: normalize(value) for key, value in self.fields.items()},
+            'content': timeline[0]['content'] if timeline else '',
+            'timeline': timeline
+        }
+
+def parse_detail_page(chunks: Iterable[str]) -> Dict[str, Any]:
+    """
+    流式解析详情页HTML
+
+    Args:
+        chunks: HTML文本块（如response.iter_content(decode_unicode=True)）
+
+    Returns:
+        dict: 解析结果，见DetailPageParser.result
+    """
+    parser = DetailPageParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    return parser.result()
+
+class DetailFetcher:
+    """
+    详情页抓取器：有界线程池并发抓取，写入独立的JSON Lines文件（线程安全）
+
+    详情页响应存入共用的响应缓存，并在缓存条目的meta中记录抓取时的列表状态：列表中的处理状态未变化的投诉直接跳过，
+    否则发送条件请求，服务端返回304时不再下载和解析；离线模式下直接解析缓存的页面。
+    详情文件中已有且列表状态未变化的投诉（如同一天的前一次运行已抓取）同样跳过，不依赖缓存和sn索引
+    """
+
+    def __init__(self, writer, client: Optional[HeimaoClient] = None, cache: Optional[ResponseCache] = None,
+                 workers: int = DEFAULT_DETAIL_WORKERS, rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None, max_details: Optional[int] = DEFAULT_MAX_DETAILS,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, timeout=DEFAULT_TIMEOUT,
+                 known: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            writer: 详情输出器（见utils.output_writers.open_writer）
+            client: 用于请求详情页的HeimaoClient，为None时创建不带Cookie的客户端
+            cache: 响应缓存，为None时不缓存，每次都完整下载
+            workers: 并发抓取的线程数
+            rate_limiter: 详情请求的限速器，为None时不限速
+            retry_policy: 请求出错时的重试策略，为None时不重试
+            max_details: 每次运行最多抓取的详情页数，为None时不限制
+            chunk_size: 每次从响应中读取的字节数
+            timeout: 自行创建客户端时的请求超时时间
+            known: 详情文件中已有的投诉：sn -> 抓取时的列表状态（见read_fetched_details），这些投诉状态未变化时跳过
+        """
+        self.writer = writer
+        self.own_client = client is None
+        self.client = client or HeimaoClient(timeout=timeout, pool_size=workers)
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=1)
+        self.max_details = max_details
+        self.chunk_size = chunk_size
+        self.known = dict(known or {})
+        self.submitted = 0
+        self.fetched = 0
+        self.unchanged = 0
+        self.not_modified = 0
+        self.failed = 0
+        self._limit_logged = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='heimao-detail')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, items: List[Dict[str, Any]]):
+        """
+        提交一批原始投诉（API返回的lists项），立即返回，详情在后台抓取
+
+        Args:
+            items: 原始投诉列表
+        """
+        for item in items:
+            main = item.get('main', {})
+            sn, url = main.get('sn'), main.get('url')
+            if not sn or not url:
+                continue
+            status = main.get('status')
+            with self._lock:
+                if sn in self.known and self.known[sn] == status:
+                    self.unchanged += 1
+                    continue
+            url = "https:" + url if url.startswith("//") else url
+            if self.cache is not None:
+                cached = self.cache.peek(normalize_request(url))
+                if cached is not None and cached.meta.get('status') == status:
+                    with self._lock:
+                        self.unchanged += 1
+                    continue
+            with self._lock:
+                if self.max_details is not None and self.submitted >= self.max_details:
+                    if not self._limit_logged:
+                        logger.warning(f"已达到本次运行的详情页上限 {self.max_details}，其余投诉不再抓取详情")
+                        self._limit_logged = True
+                    continue
+                self.submitted += 1
+                self.known[sn] = status
+            self._executor.submit(self._fetch, sn, url, status)
+
+    def _request(self, url: str, headers: Dict[str, str]):
+        """
+        发送请求并流式解析
+
+        Returns:
+            tuple: (响应, 解析结果, 已读取的HTML)，304时解析结果为None
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        try:
+            with request_slot(), self.client.metrics.span('heimao_request_duration_seconds', endpoint='detail'):
+                response = self.client.session.get(url, headers=headers, timeout=self.client.timeout, stream=True)
+                with response:
+                    if response.status_code == 304:
+                        self.client.record_response('detail', 304)
+                        return response, None, None
+                    response.raise_for_status()
+                    # 响应头未声明charset时requests按text/html默认取ISO-8859-1，而黑猫页面均为UTF-8
+                    if 'charset' not in response.headers.get('Content-Type', '').lower():
+                        response.encoding = 'utf-8'
+                    chunks = []
+
+                    def read():
+                        for chunk in response.iter_content(self.chunk_size, decode_unicode=True):
+                            chunks.append(chunk)
+                            yield chunk
+
+                    detail = parse_detail_page(read())
+                    # 解析到时间线结束即停止读取，按实际从连接读取的字节数计
+                    received = response.raw.tell()
+        except requests.HTTPError as e:
+            self.client.record_response('detail', e.response.status_code if e.response is not None else 'error')
+            raise
+        except Exception:
+            self.client.record_response('detail', 'error')
+            raise
+        self.client.record_response('detail', response.status_code, received)
+        return response, detail, ''.join(chunks)
+
+    def _fetch(self, sn: str, url: str, status: Any):
+        request = normalize_request(url)
+        cached = self.cache.peek(request) if self.cache is not None else None
+        try:
+            if self.cache is not None and self.cache.offline:
+                if cached is None:
+                    raise CacheMissError("离线模式下缓存中没有该详情页")
+                response, detail, html = None, parse_detail_page([cached.text]), None
+            else:
+                headers = cached.conditional_headers() if cached is not None else {}
+                response, detail, html = self.retry_policy.call(self._request, url, headers,
+                                                                description=f"获取投诉{sn}详情页")
+        except Exception as e:
+            logger.error(f"获取投诉{sn}详情页失败: {e}")
+            with self._lock:
+                self.failed += 1
+            return
+
+        if detail is not None:
+            detail = {'sn': sn, 'url': url, **detail, 'list_status': status, 'fetched_at': datetime.now().isoformat()}
+            self.writer.write_many([detail])
+        with self._lock:
+            if detail is None:
+                self.not_modified += 1
+            else:
+                self.fetched += 1
+        if self.cache is None or response is None:
+            return
+        if html is None:
+            self.cache.touch(request, meta={'status': status})
+        else:
+            # 只保存解析用到的部分（到时间线结束为止），足以离线重新解析
+            validators = {name: response.headers[name] for name in ('ETag', 'Last-Modified')
+                          if response.headers.get(name)}
+            self.cache.store(request, html, status=response.status_code, headers=validators,
+                             meta={'status': status})
+
+    def close(self):
+        """等待已提交的详情页抓取完成并关闭输出文件（响应缓存由创建方关闭）"""
+        self._executor.shutdown(wait=True)
+        self.writer.close()
+        if self.own_client:
+            self.client.close()
+        logger.info(f"详情页: 抓取 {self.fetched} 个，未变化跳过 {self.unchanged} 个，"
+                    f"304未修改 {self.not_modified} 个，失败 {self.failed} 个，已写入 {self.writer.path}")
+
+    def stats(self) -> Dict[str, int]:
+        """详情页抓取统计"""
+        return {
+            'fetched': self.fetched,
+            'unchanged': self.unchanged,
+            'not_modified': self.not_modified,
+            'failed': self.failed
+        }
+
+def read_fetched_details(path: str) -> Dict[str, Any]:
+    """
+    读取详情文件中已抓取的投诉
+
+    Args:
+        path: 详情文件路径（JSON Lines）
+
+    Returns:
+        dict: sn -> 抓取时的列表状态（旧文件没有记录状态时为None），文件不存在时为空
+    """
+    known = {}
+    if not os.path.exists(path):
+        return known
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 上次运行中断时可能留下不完整的最后一行
+                continue
+            if isinstance(record, dict) and record.get('sn'):
+                known[record['sn']] = record.get('list_status')
+    return known
+
+def open_detail_fetcher(config: Dict[str, Any], output_dir: str, retry_policy: Optional[RetryPolicy] = None,
+                        cache: Optional[ResponseCache] = None) -> Optional[DetailFetcher]:
+    """
+    根据scraping.detail配置创建详情页抓取器
+
+    详情文件总是追加写入：启动时读出文件中已抓取的投诉，同一天的后续运行中列表状态未变化的不再抓取，
+    与是否启用sn索引和响应缓存无关；启用sn索引时只有新增或有变化的投诉会交给抓取器
+
+    Args:
+        config: 配置信息字典
+        output_dir: 输出目录，详情写入其中的detail.filename
+        retry_policy: 请求出错时的重试策略
+        cache: 响应缓存（见utils.http_cache.open_response_cache），为None时不跳过未变化的投诉
+
+    Returns:
+        DetailFetcher: 详情页抓取器，未启用时返回None
+    """
+    scraping = config.get('scraping', {})
+    detail = scraping.get('detail', {})
+    if not detail.get('enable', False):
+        return None
+
+    timeout = scraping.get('api', {}).get('timeout', DEFAULT_TIMEOUT)
+    if isinstance(timeout, list):
+        timeout = tuple(timeout)
+    workers = detail.get('workers', DEFAULT_DETAIL_WORKERS)
+
+    path = os.path.join(output_dir, detail.get('filename', DEFAULT_DETAIL_FILENAME))
+    known = read_fetched_details(path)
+    writer = open_writer('jsonl', path, append=True)
+    logger.info(f"启用详情页抓取: {workers} 个线程，每秒 {detail.get('rps', DEFAULT_DETAIL_RPS)} 个请求")
+    return DetailFetcher(
+        writer,
+        cache=cache,
+        workers=workers,
+        rate_limiter=RateLimiter(detail.get('rps', DEFAULT_DETAIL_RPS), detail.get('burst', 1)),
+        retry_policy=retry_policy,
+        max_details=detail.get('max_details', DEFAULT_MAX_DETAILS),
+        timeout=timeout,
+        known=known
+    )
@@ -2,12 +2,33 @@ import time
 import random
 import hashlib
 import json
-import urllib.parse
 import os
 import logging
-import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+# 导入工具
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.rate_limiter import AdaptiveRateLimiter, RateLimiter, get_host_limiter
+from utils.crawl_state import JsonStateStore, PageCursor
+from utils.retry import RetryPolicy, RetryableError
+from utils.record_index import RecordIndex
+from utils.http_cache import open_response_cache
+from utils.metrics import default_registry, write_metrics
+from utils.text_normalizer import TextNormalizer, strip_tags
+from utils.record_transform import CRAWLED_AT, RecordTransform
+from utils.output_writers import DEFAULT_ROW_GROUP_SIZE, open_writer, output_filename
+# generate_signature、classify_page、BACKOFF_REASONS保留在本模块的导出中，兼容旧的调用方式
+from scrapers.heimao_client import (
+    BACKOFF_REASONS, DEFAULT_TIMEOUT, HEIMAO_BASE_URL, HeimaoClient, classify_page, generate_signature
+)
+from scrapers.heimao_detail import open_detail_fetcher
+from scrapers.heimao_accounts import (
+    DEFAULT_MAX_FAILURES, DEFAULT_QUARANTINE, Account, AccountPool, load_cookies
+)
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -15,209 +36,606 @@ logging.basicConfig(
 )
 logger = logging.getLogger('heimao_scraper')
 
-def generate_signature(keyword="", page=1, page_size=10):
-    """生成黑猫投诉API请求的签名参数"""
-    c = str(int(time.time() * 1000))   # 13位时间戳
-    a = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", "m", "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z", "A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M", "N", "O", "P", "Q", "R", "S", "T", "U", "V", "W", "X", "Y", "Z"]
-    h = ''.join(random.choice(a) for i in range(16))   # 随机16个字符
-    d = '$d6eb7ff91ee257475%'   # 默认值
-    
-    # 用于搜索投诉的参数
-    page_size_str = str(page_size)  # 每页数量
-    page_str = str(page)  # 页码
-    
-    ts = c
-    rs = h
-    
-    # 构建签名参数 - 始终使用搜索接口格式
-    # 即使没有关键词，也使用搜索接口，关键词为空字符串
-    bb = [d, keyword or '', page_size_str, ts, page_str, rs]
-    
-    bb.sort()
-    signature = hashlib.sha256((''.join(bb)).encode('utf-8')).hexdigest()
-    
-    return ts, rs, signature
+# 搜索接口地址
+HEIMAO_SEARCH_API = f"{HEIMAO_BASE_URL}/api/index/s"
+
+# 参与内容指纹计算的字段，任一字段变化即视为投诉有更新
+FINGERPRINT_FIELDS = ('title', 'cotitle', 'summary', 'status', 'issue', 'appeal', 'cost')
+
+# 输出字段及其在原始投诉中的来源
+COMPLAINT_FIELDS = (
+    ('id', 'main.sn'),
+    ('title', 'main.title'),
+    ('company', 'main.cotitle'),
+    ('content', 'main.summary'),
+    ('url', 'main.url'),
+    ('timestamp', 'main.timestamp'),
+    ('status', 'main.status'),
+    ('crawled_at', CRAWLED_AT),
+    ('issue', 'main.issue'),  # 问题类型
+    ('appeal', 'main.appeal'),  # 诉求
+    ('cost', 'main.cost')  # 消费金额
+)
+
+# 列式输出（parquet/arrow）的列定义：(列名, 类型)
+COMPLAINT_COLUMNS = (
+    ('id', 'string'),
+    ('title', 'string'),
+    ('company', 'string'),
+    ('content', 'string'),
+    ('url', 'string'),
+    ('timestamp', 'timestamp'),
+    ('status', 'int'),
+    ('crawled_at', 'timestamp'),
+    ('issue', 'string'),
+    ('appeal', 'string'),
+    ('cost', 'float')
+)
+
+# 各环节的指标，去重命中率 = heimao_complaints_duplicate_total / heimao_complaints_received_total
+default_registry.describe('heimao_keyword_pages', "每个关键词获取的页数", buckets=(1, 2, 3, 5, 10, 20, 50, 100, 200, 500))
+default_registry.describe('heimao_complaints_received_total', "搜索接口返回的原始投诉条数")
+default_registry.describe('heimao_complaints_duplicate_total', "去重过滤掉的投诉条数（scope=run：本次运行内重复，index：历史运行中已输出且未变化）")
+default_registry.describe('heimao_complaints_written_total', "写入输出文件的投诉条数")
+default_registry.describe('heimao_format_duration_seconds', "每页投诉格式化耗时（秒）")
+default_registry.describe('heimao_write_duration_seconds', "每页投诉写入输出文件耗时（秒）")
+default_registry.describe('heimao_run_duration_seconds', "搜索阶段总耗时（秒）", buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+
+# 不带关键词的默认搜索在水位线存储中使用的键
+WATERMARK_LATEST_KEY = '__latest__'
+
+# 未配置时每秒允许的请求数（与原1.5~3秒的随机休眠节奏相当）
+DEFAULT_HOST_RPS = 0.5
+
+# 分页游标检查点的默认有效期（秒），过期后从第一页重新开始
+DEFAULT_CHECKPOINT_MAX_AGE = 24 * 3600
 
 def remove_html_tags(text):
     """移除HTML标签"""
     if not text:
         return text
-    # 使用正则表达式移除HTML标签
-    clean_text = re.sub(r'<[^>]+>', '', text)
-    return clean_text
+    # 使用预编译的正则表达式移除HTML标签
+    return strip_tags(text)
 
-def get_complaints(keyword="", page=1, page_size=10, cookie=None, max_pages=5):
+def get_complaints(keyword="", page=1, page_size=10, cookie=None, max_pages=5,
+                   concurrency=1, rate_limiter=None, client=None, watermark=None, on_page=None,
+                   backoff_retries=0, retry_policy=None, cursor=None):
     """
     获取黑猫投诉数据，支持分页
     
+    concurrency大于1时，先请求起始页获取pager.page_amount，
+    再通过有界线程池并发获取剩余页，请求速率由rate_limiter控制
+    
+    传入watermark时进行增量爬取：某一页的投诉全部早于水位线时停止翻页。
+    并发模式下此时按每批concurrency页分批获取，避免越过水位线后继续请求
+    
     Args:
         keyword: 搜索关键词
         page: 页码，从1开始
         page_size: 每页数量
         cookie: 登录Cookie
         max_pages: 最大页数，防止过度请求
+        concurrency: 并发获取分页的线程数，1表示逐页串行获取
+        rate_limiter: 限速器（RateLimiter），为None时串行模式使用随机休眠
+        client: 共享的HeimaoClient，为None时使用cookie创建临时客户端
+        watermark: 该关键词上次爬取的水位线（见newest_watermark），为None时不做增量判断
+        on_page: 每获取一页（按页码顺序）即调用的回调，参数为该页的投诉列表；
+                 传入时结果中的data为空，投诉不在内存中累积
+        backoff_retries: 使用AdaptiveRateLimiter时，单页触发退避后重试的次数
+        retry_policy: 请求出错时的重试策略（RetryPolicy），为None时不重试
+        cursor: 分页游标检查点（PageCursor），存在未完成的检查点时从记录的页码继续，正常结束后删除
         
     Returns:
         dict: 结果字典，包含状态、数据等
     """
-    import requests
+    # 未传入客户端时创建临时客户端，结束后关闭
+    own_client = client is None
+    if own_client:
+        client = HeimaoClient(cookie=cookie, pool_size=concurrency)
     
-    all_complaints = []
-    total_pages = 1
+    try:
+        collector = ComplaintCollector(on_page, cursor)
+        page = collector.resume(page)
+        result = _get_complaints(keyword, page, page_size, max_pages, concurrency, rate_limiter, client,
+                                 watermark, collector, backoff_retries, retry_policy)
+        if cursor and result.get('complete'):
+            cursor.finish()
+        return result
+    finally:
+        if own_client:
+            client.close()
+
+def _get_complaints(keyword, page, page_size, max_pages, concurrency, rate_limiter, client, watermark, collector,
+                    backoff_retries, retry_policy):
+    """get_complaints的分页获取实现"""
+    # 实际总页数由起始页的响应确定（从检查点恢复时起始页可能大于1）
+    total_pages = page
     current_page = page
+    reached_known = False
+    
+    # 账号池由各账号的限速器控制节奏
+    paced = getattr(client, 'paced', False)
+    
+    # 并发模式下未指定限速器时，使用该主机的共享限速器
+    if concurrency > 1 and rate_limiter is None and not paced:
+        rate_limiter = get_host_limiter(HEIMAO_SEARCH_API, DEFAULT_HOST_RPS)
     
     while current_page <= total_pages and current_page <= max_pages:
         try:
-            # 每次请求生成新的签名
-            ts, rs, signature = generate_signature(keyword, current_page, page_size)
-            logger.info(f"生成参数 - 页码: {current_page}, 时间戳: {ts}, 随机字符串: {rs}")
-            
-            # 设置请求头
-            headers = {
-                "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
-                "accept": "*/*",
-                "accept-language": "zh-CN,zh;q=0.9",
-                "cache-control": "no-cache",
-                "pragma": "no-cache",
-                "sec-ch-ua": '"Chromium";v="136", "Not.A/Brand";v="99"',
-                "sec-ch-ua-mobile": "?0",
-                "sec-ch-ua-platform": '"macOS"',
-                "sec-fetch-dest": "empty",
-                "sec-fetch-mode": "cors",
-                "sec-fetch-site": "same-origin",
-                "x-requested-with": "XMLHttpRequest"
-            }
-            
-            # 如果传入了Cookie，添加到请求头
-            if cookie:
-                headers["cookie"] = cookie
-            
-            # 构建URL - 支持分页
-            encoded_keyword = urllib.parse.quote(keyword) if keyword else ""
-            base_url = f"https://tousu.sina.com.cn/api/index/s?ts={ts}&rs={rs}&signature={signature}&keywords={encoded_keyword}&page_size={page_size}&page={current_page}"
-            
-            # 添加referer头
-            headers["referer"] = f"https://tousu.sina.com.cn/index/search/?keywords={encoded_keyword}&t=1"
+            page_result = search_page_adaptive(client, keyword, current_page, page_size,
+                                               rate_limiter, backoff_retries, retry_policy)
             
-            logger.info(f"请求URL(第{current_page}页): {base_url}")
-            response = requests.request("GET", base_url, headers=headers)
-            
-            # 检查是否重定向到登录页面
-            if "<!doctype html>" in response.text.lower() or "登录" in response.text or "微博" in response.text:
-                if cookie:
-                    logger.error("提供的Cookie无效或已过期")
-                else:
-                    logger.warning("未提供Cookie，搜索功能可能受限")
-                
+            if page_result['status'] == 'login_required':
                 # 由于现在始终使用搜索接口，如果没有Cookie或Cookie无效，API可能直接返回失败
                 return {
                     'status': 'error',
                     'message': "需要登录Cookie才能使用搜索功能",
-                    'data': all_complaints  # 返回已获取的数据
+                    'data': collector.data  # 返回已获取的数据
                 }
+            if page_result['status'] != 'success':
+                break
             
-            # 尝试解析JSON
-            if response.text.strip():
-                try:
-                    result = json.loads(response.text)
-                    logger.debug(f"API返回内容: {response.text[:200]}...")
-                    
-                    # 检查返回值结构
-                    if 'result' not in result:
-                        logger.error(f"API返回数据格式异常: {result}")
-                        break
-                    
-                    # 处理结果
-                    if result['result']['status']['code'] == 0:
-                        # 获取分页信息
-                        pager = result['result']['data'].get('pager', {})
-                        total_pages = pager.get('page_amount', 1)
-                        total_items = pager.get('item_count', 0)
-                        
-                        logger.info(f"当前第{current_page}页，总计{total_pages}页，共{total_items}条投诉")
-                        
-                        # 获取投诉列表
-                        lists = result['result']['data'].get('lists', [])
-                        all_complaints.extend(lists)
-                        
-                        logger.info(f"当前页获取 {len(lists)} 条投诉，累计 {len(all_complaints)} 条")
-                        
-                        # 检查是否有风控（频率限制）
-                        if len(lists) == 0 and total_items > 0:
-                            logger.warning("可能触发风控机制，暂停请求")
-                            break
-                        
-                        # 翻页前休息一下，避免频率过高
-                        if current_page < total_pages and current_page < max_pages:
-                            sleep_time = random.uniform(1.5, 3.0)
-                            logger.info(f"休息 {sleep_time:.2f} 秒后获取下一页")
-                            time.sleep(sleep_time)
-                    else:
-                        logger.error(f"请求失败: {result}")
-                        break
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON解析错误: {e}")
-                    logger.debug(f"原始响应: {response.text[:200]}...")
-                    break
-            else:
-                logger.error("响应内容为空")
+            # 获取分页信息
+            pager = page_result['pager']
+            total_pages = pager.get('page_amount', 1)
+            total_items = pager.get('item_count', 0)
+            
+            logger.info(f"当前第{current_page}页，总计{total_pages}页，共{total_items}条投诉")
+            
+            # 获取投诉列表
+            lists = page_result['lists']
+            
+            # 检查是否有风控（频率限制），该页不计入已获取的页，检查点停留在该页
+            if len(lists) == 0 and total_items > 0:
+                logger.warning("可能触发风控机制，暂停请求")
                 break
             
+            collector.add(lists)
+            logger.info(f"当前页获取 {len(lists)} 条投诉，累计 {collector.count} 条")
+            
             # 更新页码
             current_page += 1
             
+            # 增量爬取：当前页全部为已知投诉时停止翻页
+            if watermark and is_page_known(lists, watermark):
+                logger.info(f"第{current_page - 1}页均为已知投诉，停止翻页")
+                reached_known = True
+                break
+            
+            # 并发获取剩余页，增量模式下分批获取以便及时停止
+            if concurrency > 1:
+                last_page = min(total_pages, max_pages)
+                batch_size = concurrency if watermark else last_page
+                while current_page <= last_page:
+                    batch_pages = range(current_page, min(last_page, current_page + batch_size - 1) + 1)
+                    fetched, login_required = _fetch_pages_concurrently(
+                        client, keyword, batch_pages, page_size, concurrency, rate_limiter,
+                        backoff_retries, retry_policy
+                    )
+                    for lists in fetched:
+                        collector.add(lists)
+                        current_page += 1
+                        if watermark and is_page_known(lists, watermark):
+                            logger.info(f"第{current_page - 1}页均为已知投诉，停止翻页")
+                            reached_known = True
+                            break
+                    if login_required:
+                        return {
+                            'status': 'error',
+                            'message': "需要登录Cookie才能使用搜索功能",
+                            'data': collector.data
+                        }
+                    if reached_known or len(fetched) < len(batch_pages):
+                        break
+                break
+            
+            # 翻页前休息一下，避免频率过高（使用限速器时由限速器控制节奏）
+            if not rate_limiter and not paced and current_page <= total_pages and current_page <= max_pages:
+                sleep_time = random.uniform(1.5, 3.0)
+                logger.info(f"休息 {sleep_time:.2f} 秒后获取下一页")
+                time.sleep(sleep_time)
+            
         except Exception as e:
             logger.exception(f"获取第{current_page}页时出错: {e}")
             break
     
     return {
-        'status': 'success' if all_complaints else 'error',
-        'count': len(all_complaints),
+        'status': 'success' if collector.count else 'error',
+        'count': collector.count,
         'keyword': keyword if keyword else None,
         'pages_fetched': current_page - page,
         'total_pages': total_pages,
-        'data': all_complaints
+        # 是否正常结束翻页（到达水位线、最后一页或max_pages），因出错或风控中断时为False
+        'complete': reached_known or current_page > min(total_pages, max_pages),
+        'watermark': collector.watermark,
+        'data': collector.data
     }
 
-def scrape_heimao(config, output_dir=None):
+class ComplaintCollector:
     """
-    主爬虫函数，由框架调用
+    汇总一个关键词获取到的各页投诉：计数、计算本次的水位线，并交给回调或暂存在内存中
+    
+    传入cursor时，每页处理完（已交给回调写出）后把下一页的页码和当前水位线写入检查点
+    """
+    
+    def __init__(self, on_page=None, cursor=None):
+        """
+        Args:
+            on_page: 每页投诉的回调，为None时在data中累积
+            cursor: 分页游标检查点（PageCursor）
+        """
+        self.on_page = on_page
+        self.cursor = cursor
+        self.data = []
+        self.count = 0
+        self.watermark = None
+        self.next_page = 1
+    
+    def resume(self, page):
+        """
+        从检查点恢复，返回实际的起始页码
+        
+        Args:
+            page: 调用方指定的起始页码
+            
+        Returns:
+            int: 存在未完成的检查点时为其记录的页码，否则为page
+        """
+        self.next_page = page
+        saved = self.cursor.load() if self.cursor else None
+        if saved and saved['page'] > page:
+            self.next_page = saved['page']
+            self.watermark = saved.get('watermark')
+            logger.info(f"从检查点恢复'{self.cursor.key}'，从第{self.next_page}页继续")
+        return self.next_page
+    
+    def add(self, lists):
+        """处理一页投诉"""
+        self.count += len(lists)
+        self.watermark = newest_watermark(lists, self.watermark)
+        if self.on_page:
+            self.on_page(lists)
+        else:
+            self.data.extend(lists)
+        self.next_page += 1
+        if self.cursor:
+            self.cursor.advance(self.next_page, watermark=self.watermark)
+
+def newest_watermark(complaints, previous=None):
+    """
+    计算一批投诉的水位线：最新的main.timestamp及该时间戳下的所有sn
+    
+    Args:
+        complaints: 原始投诉列表（API返回的lists项）
+        previous: 之前的水位线，结果不会早于它
+        
+    Returns:
+        dict: 水位线，形如{'timestamp': 1745294834, 'sns': [...]}；无有效数据时返回previous
+    """
+    watermark = previous
+    for item in complaints:
+        main = item.get('main', {})
+        try:
+            timestamp = int(main.get('timestamp'))
+        except (TypeError, ValueError):
+            continue
+        sn = main.get('sn')
+        if watermark is None or timestamp > watermark['timestamp']:
+            watermark = {'timestamp': timestamp, 'sns': [sn] if sn else []}
+        elif timestamp == watermark['timestamp'] and sn and sn not in watermark['sns']:
+            watermark = {'timestamp': timestamp, 'sns': watermark['sns'] + [sn]}
+    return watermark
+
+def is_complaint_known(item, watermark):
+    """判断投诉是否已在水位线之前爬取过（早于水位线，或与水位线同一时间戳且sn已记录）"""
+    main = item.get('main', {})
+    try:
+        timestamp = int(main.get('timestamp'))
+    except (TypeError, ValueError):
+        return False
+    if timestamp != watermark['timestamp']:
+        return timestamp < watermark['timestamp']
+    return main.get('sn') in watermark['sns']
+
+def is_page_known(lists, watermark):
+    """判断一页投诉是否全部为已知投诉"""
+    return all(is_complaint_known(item, watermark) for item in lists)
+
+def complaint_fingerprint(item):
+    """
+    计算投诉内容指纹，用于判断历史投诉是否发生变化（如处理状态更新）
+    
+    Args:
+        item: 原始投诉数据（API返回的lists项）
+        
+    Returns:
+        str: 指纹（SHA-1十六进制串）
+    """
+    main = item.get('main', {})
+    fields = [str(main.get(field, '')) for field in FINGERPRINT_FIELDS]
+    return hashlib.sha1('\x1f'.join(fields).encode('utf-8')).hexdigest()
+
+def open_sn_index(config):
+    """
+    根据processing.dedup配置打开持久化sn索引
     
     Args:
         config: 配置信息字典
-        output_dir: 输出目录
         
     Returns:
-        dict: 包含爬取结果的字典
+        RecordIndex: sn索引，未启用时返回None
     """
-    # 获取配置
-    site_info = config.get('site_info', {})
-    scraping = config.get('scraping', {})
-    output_config = config.get('output', {})
-    auth = config.get('auth', {})
+    dedup = config.get('processing', {}).get('dedup', {})
+    if not dedup.get('persistent', False):
+        return None
+    index_path = dedup.get('index_path', os.path.join('.status', 'heimao_sn_index.sqlite3'))
+    return RecordIndex(index_path)
+
+def open_watermark_store(scraping):
+    """
+    根据scraping.incremental配置打开水位线存储
     
-    # 获取API配置
-    api_config = scraping.get('api', {})
-    page_size = api_config.get('page_size', 10)
-    max_pages = api_config.get('max_pages', 5)
+    Args:
+        scraping: scraping配置字典
+        
+    Returns:
+        JsonStateStore: 水位线存储，未启用增量爬取时返回None
+    """
+    incremental = scraping.get('incremental', {})
+    if not incremental.get('enable', False):
+        return None
+    state_file = incremental.get('state_file', os.path.join('.status', 'heimao_watermarks.json'))
+    return JsonStateStore(state_file)
+
+def open_cursor_store(scraping):
+    """
+    根据scraping.retry.checkpoint_file打开分页游标检查点存储
     
-    # 获取Cookie
-    cookie_env = auth.get('cookie_env')
-    cookie = os.environ.get(cookie_env) if cookie_env else None
+    Args:
+        scraping: scraping配置字典
+        
+    Returns:
+        JsonStateStore: 检查点存储，未配置时返回None
+    """
+    checkpoint_file = scraping.get('retry', {}).get('checkpoint_file')
+    return JsonStateStore(checkpoint_file) if checkpoint_file else None
+
+def open_page_cursor(store, scraping, keyword):
+    """
+    获取关键词的分页游标检查点
     
-    # 创建输出目录（如果不存在）
-    if not output_dir:
-        today = datetime.now().strftime('%Y-%m-%d')
-        output_dir = os.path.join('data', 'daily', today)
+    Args:
+        store: open_cursor_store返回的检查点存储，为None时返回None
+        scraping: scraping配置字典，retry.checkpoint_max_age为检查点有效期（秒）
+        keyword: 搜索关键词
+        
+    Returns:
+        PageCursor: 分页游标检查点或None
+    """
+    if store is None:
+        return None
+    max_age = scraping.get('retry', {}).get('checkpoint_max_age', DEFAULT_CHECKPOINT_MAX_AGE)
+    return PageCursor(store, keyword or WATERMARK_LATEST_KEY, max_age)
+
+def update_watermark(store, keyword, result):
+    """
+    根据关键词的搜索结果推进水位线
     
-    os.makedirs(output_dir, exist_ok=True)
+    只有正常结束翻页时才推进，避免中途中断后跳过未爬取的旧投诉
+    
+    Args:
+        store: 水位线存储
+        keyword: 搜索关键词
+        result: get_complaints返回的结果字典
+    """
+    if not result.get('complete'):
+        return
+    key = keyword or WATERMARK_LATEST_KEY
+    previous = store.get(key)
+    current = result.get('watermark')
+    if current is None:
+        return
+    if previous is None or current['timestamp'] > previous['timestamp']:
+        watermark = current
+    elif current['timestamp'] == previous['timestamp']:
+        watermark = {'timestamp': current['timestamp'],
+                     'sns': previous['sns'] + [sn for sn in current['sns'] if sn not in previous['sns']]}
+    else:
+        return
+    if watermark != previous:
+        store.set(key, watermark)
+
+def search_page_adaptive(client, keyword, page_num, page_size, rate_limiter=None, backoff_retries=0,
+                         retry_policy=None):
+    """
+    按限速器的节奏请求单页，出错时按重试策略重试，并把响应情况反馈给自适应限速器
+    
+    请求异常或响应无法解析时，可重试的错误按retry_policy以带抖动的指数退避重试，致命错误（如403/404、程序错误）
+    立即返回。rate_limiter为AdaptiveRateLimiter时，正常响应使其提速；遇到风控、登录页（已提供Cookie时）或出错
+    则使其降速暂停，风控和登录页重试同一页，最多backoff_retries次，而不是直接放弃该关键词的后续分页
+    
+    Args:
+        client: HeimaoClient
+        keyword: 搜索关键词
+        page_num: 页码
+        page_size: 每页数量
+        rate_limiter: 限速器，为None时不等待
+        backoff_retries: 触发退避后重试的次数
+        retry_policy: 出错时的重试策略（RetryPolicy），为None时出错不重试
+        
+    Returns:
+        dict: 最后一次请求的结果，请求异常时为{'status': 'error'}，致命错误时另含'fatal': True
+    """
+    cached_search_page = getattr(client, 'cached_search_page', None)
+    if cached_search_page is not None:
+        cached = cached_search_page(keyword, page_num, page_size)
+        if cached is not None:
+            return cached
+    
+    adaptive = isinstance(rate_limiter, AdaptiveRateLimiter)
+    backoffs = 0
+    attempt = 1
+    while True:
+        if rate_limiter:
+            rate_limiter.acquire()
+        error = None
+        try:
+            page_result = client.search_page(keyword, page_num, page_size)
+        except Exception as e:
+            logger.error(f"获取关键词'{keyword}'第{page_num}页时出错: {e}")
+            page_result = {'status': 'error'}
+            error = e
+        
+        signal = classify_page(page_result)
+        if signal == 'ok':
+            if adaptive:
+                rate_limiter.on_success()
+            return page_result
+        if signal == 'login_required' and not client.cookie:
+            # 未提供Cookie时登录页不会因等待而消失
+            return page_result
+        if adaptive:
+            rate_limiter.on_backoff(f"关键词'{keyword}'第{page_num}页{BACKOFF_REASONS[signal]}")
+        
+        if signal == 'error' and retry_policy is not None:
+            error = error or RetryableError("响应为空或无法解析")
+            if not retry_policy.should_retry(error, attempt):
+                if not retry_policy.retryable(error):
+                    logger.error(f"关键词'{keyword}'第{page_num}页遇到不可重试的错误: {error}")
+                    page_result['fatal'] = True
+                return page_result
+            wait = retry_policy.backoff(attempt)
+            attempt += 1
+            logger.warning(f"{wait:.2f}秒后第{attempt}次尝试获取关键词'{keyword}'第{page_num}页")
+            time.sleep(wait)
+            continue
+        
+        if not adaptive or backoffs >= backoff_retries:
+            return page_result
+        backoffs += 1
+        logger.info(f"退避后第{backoffs}次重试关键词'{keyword}'第{page_num}页")
+
+def _fetch_pages_concurrently(client, keyword, pages, page_size, concurrency, rate_limiter, backoff_retries=0,
+                              retry_policy=None):
+    """
+    通过有界线程池并发获取多个分页
+    
+    结果按页码顺序返回，遇到失败页时截断，保证返回的是连续页
+    
+    Returns:
+        tuple: (按页码排序的投诉列表的列表, 是否需要登录)
+    """
+    pages = list(pages)
+    
+    def fetch(page_num):
+        return search_page_adaptive(client, keyword, page_num, page_size, rate_limiter, backoff_retries,
+                                    retry_policy)
     
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(pages))) as executor:
+        futures = {executor.submit(fetch, page_num): page_num for page_num in pages}
+        for future in as_completed(futures):
+            page_num = futures[future]
+            try:
+                results[page_num] = future.result()
+            except Exception as e:
+                logger.exception(f"获取第{page_num}页时出错: {e}")
+                results[page_num] = {'status': 'error'}
+    
+    fetched = []
+    for page_num in pages:
+        page_result = results[page_num]
+        if page_result['status'] == 'login_required':
+            return fetched, True
+        if page_result['status'] != 'success':
+            break
+        lists = page_result['lists']
+        total_items = page_result['pager'].get('item_count', 0)
+        if len(lists) == 0 and total_items > 0:
+            logger.warning(f"第{page_num}页可能触发风控机制，丢弃后续分页")
+            break
+        logger.info(f"第{page_num}页获取 {len(lists)} 条投诉")
+        fetched.append(lists)
+    
+    return fetched, False
+
+def build_rate_limiter(scraping, shared=True):
+    """
+    根据配置创建所有搜索线程共享的限速器
+    
+    优先使用concurrency.host_rps，否则由anti_risk.sleep_min/sleep_max推导请求速率；
+    启用adaptive时以该速率为起点创建AIMD自适应限速器；
+    anti_risk未启用且未配置host_rps时返回None（串行模式使用随机休眠）
+    
+    Args:
+        scraping: scraping配置字典
+        shared: 是否使用按主机共享的限速器；为False时总是新建限速器（如账号池中每个账号各用一个），
+                未配置任何限速时使用默认速率
+        
+    Returns:
+        RateLimiter: 限速器或None
+    """
+    api_config = scraping.get('api', {})
+    concurrency_config = scraping.get('concurrency', {})
+    anti_risk = scraping.get('anti_risk', {})
+    adaptive = scraping.get('adaptive', {})
+    host = api_config.get('base_url', HEIMAO_SEARCH_API)
+    burst = concurrency_config.get('burst', 1)
+    
+    if adaptive.get('enable', False):
+        if 'host_rps' in concurrency_config:
+            rate = concurrency_config['host_rps']
+        elif anti_risk.get('enable', False):
+            rate = RateLimiter.from_sleep_range(anti_risk.get('sleep_min', 1.5), anti_risk.get('sleep_max', 3.0)).rate
+        else:
+            rate = DEFAULT_HOST_RPS
+        limiter = AdaptiveRateLimiter(
+            rate,
+            min_rate=adaptive.get('min_rps', 0.1),
+            max_rate=adaptive.get('max_rps', 2.0),
+            increase=adaptive.get('increase', 0.05),
+            decrease=adaptive.get('decrease', 0.5),
+            cooldown=adaptive.get('cooldown', 10),
+            burst=burst
+        )
+        logger.info(f"启用自适应限速: 初始每秒 {limiter.rate:.2f} 个请求，区间 {limiter.min_rate}~{limiter.max_rate}")
+        return limiter
+    if 'host_rps' in concurrency_config:
+        if not shared:
+            return RateLimiter(concurrency_config['host_rps'], burst)
+        return get_host_limiter(host, concurrency_config['host_rps'], burst)
+    if anti_risk.get('enable', False):
+        limiter = RateLimiter.from_sleep_range(
+            anti_risk.get('sleep_min', 1.5), anti_risk.get('sleep_max', 3.0), burst
+        )
+        logger.info(f"根据anti_risk配置限速: 每秒 {limiter.rate:.2f} 个请求")
+        return limiter
+    if not shared:
+        return RateLimiter(DEFAULT_HOST_RPS, burst)
+    if concurrency_config.get('page_workers', 1) > 1 or concurrency_config.get('keyword_workers', 1) > 1:
+        return get_host_limiter(host, DEFAULT_HOST_RPS, burst)
+    return None
+
+def get_backoff_retries(scraping):
+    """自适应限速启用时单页触发退避后的重试次数，未启用时为0"""
+    adaptive = scraping.get('adaptive', {})
+    return adaptive.get('max_retries', 3) if adaptive.get('enable', False) else 0
+
+def collect_keywords(scraping):
+    """
+    根据targets配置收集需要搜索的关键词
+    
+    未配置关键词但需要获取最新投诉时返回[""]，即使用空关键词搜索
+    
+    Args:
+        scraping: scraping配置字典
+        
+    Returns:
+        list: 关键词列表
+    """
     # 获取目标配置
     targets = scraping.get('targets', [])
     
-    # 存储所有结果
-    all_results = []
-    
     # 处理每个目标
     keywords = []
     default_search = True  # 是否执行默认搜索（不带关键词）
@@ -240,110 +658,402 @@ def scrape_heimao(config, output_dir=None):
                 keywords.extend([k for k in target.get('keywords', []) if k])
     
     # 如果没有指定关键词，但需要获取最新投诉，使用空关键词搜索
-    if default_search and not keywords:
-        result = get_complaints(page_size=page_size, max_pages=max_pages, cookie=cookie)
-        if result and result.get('status') == 'success':
-            logger.info(f"默认搜索获取到 {result.get('count')} 条投诉，共获取 {result.get('pages_fetched')} 页")
-            all_results.extend(result.get('data', []))
-    
-    # 处理每个关键词搜索
-    for keyword in keywords:
-        if not keyword:
-            continue
-        logger.info(f"搜索关键词: {keyword}")
-        result = get_complaints(keyword=keyword, page_size=page_size, max_pages=max_pages, cookie=cookie)
-        if result and result.get('status') == 'success':
-            logger.info(f"关键词'{keyword}'搜索结果: {result.get('count')} 条投诉，共获取 {result.get('pages_fetched')} 页")
-            all_results.extend(result.get('data', []))
-    
-    # 添加调试日志
-    logger.info(f"总共获取到 {len(all_results)} 条原始投诉数据")
-    
-    # 去重前打印所有结果的长度和第一项内容
-    if all_results:
-        logger.debug(f"第一条数据示例: {json.dumps(all_results[0], ensure_ascii=False)[:200]}")
-    
-    # 修改去重逻辑，确保适应当前数据结构
-    unique_results = []
-    seen_sns = set()  # 使用sn(投诉编号)作为去重依据
-    
-    for item in all_results:
-        # 获取sn作为唯一标识
-        sn = item.get('main', {}).get('sn')
-        if sn and sn not in seen_sns:
-            seen_sns.add(sn)
-            unique_results.append(item)
-    
-    logger.info(f"去重后剩余 {len(unique_results)} 条投诉数据")
-    
-    # 格式化结果
-    formatted_results = []
-    for item in unique_results:
-        try:
-            main = item.get('main', {})
+    search_keywords = [k for k in keywords if k]
+    if default_search and not search_keywords:
+        search_keywords = [""]
+    return search_keywords
+
+def keyword_stat(keyword, result, elapsed):
+    """
+    汇总单个关键词的搜索结果并记录日志，获取的页数记入heimao_keyword_pages指标
+    
+    Args:
+        keyword: 搜索关键词，空字符串表示默认搜索
+        result: get_complaints返回的结果字典
+        elapsed: 搜索耗时（秒）
+        
+    Returns:
+        dict: 关键词统计信息
+    """
+    if result.get('status') == 'success':
+        if keyword:
+            logger.info(f"关键词'{keyword}'搜索结果: {result.get('count')} 条投诉，共获取 {result.get('pages_fetched')} 页，耗时 {elapsed:.2f} 秒")
+        else:
+            logger.info(f"默认搜索获取到 {result.get('count')} 条投诉，共获取 {result.get('pages_fetched')} 页，耗时 {elapsed:.2f} 秒")
+    default_registry.observe('heimao_keyword_pages', result.get('pages_fetched', 0))
+    return {
+        'keyword': keyword or None,
+        'status': result.get('status'),
+        'count': result.get('count', 0),
+        'pages_fetched': result.get('pages_fetched', 0),
+        'elapsed': round(elapsed, 3)
+    }
+
+def build_complaint_transform(processing_config=None, normalize=remove_html_tags):
+    """
+    根据processing配置创建投诉的批量格式化器
+    
+    Args:
+        processing_config: processing配置字典，convert_timestamp/extract_id_from_url控制时间戳转换和ID提取
+        normalize: 标题、公司、内容字段的清洗函数（如TextNormalizer），默认只移除HTML标签
+        
+    Returns:
+        RecordTransform: 批量格式化器
+    """
+    processing_config = processing_config or {}
+    return RecordTransform(
+        COMPLAINT_FIELDS,
+        text_fields=('title', 'company', 'content'),
+        timestamp_fields=('timestamp',) if processing_config.get('convert_timestamp', True) else (),
+        url_fields=('url',),
+        id_field='id',
+        id_url_field='url' if processing_config.get('extract_id_from_url', True) else None,
+        normalize=normalize
+    )
+
+def format_complaint(item, crawled_at=None, normalize=remove_html_tags):
+    """
+    将API返回的单条原始投诉格式化为输出记录（批量处理请使用build_complaint_transform）
+    
+    Args:
+        item: 原始投诉（API返回的lists项）
+        crawled_at: 爬取时间（ISO格式），为None时取当前时间
+        normalize: 标题、公司、内容字段的清洗函数，默认只移除HTML标签
+        
+    Returns:
+        dict: 格式化后的投诉记录，无法处理时返回None
+    """
+    records = build_complaint_transform(normalize=normalize).transform([item], crawled_at)
+    return records[0] if records else None
+
+class ComplaintSink:
+    """
+    投诉输出管道：逐页去重、格式化并追加写入输出文件（线程安全）
+    
+    传入sn_index时进行跨运行去重：只输出索引中不存在或内容指纹发生变化的投诉，
+    每页写入成功后再把这些投诉记入索引，中途崩溃时已写入的投诉不会丢失也不会被重复计入。
+    去重条数、格式化和写入耗时记入默认指标注册表
+    """
+    
+    def __init__(self, writer, sn_index=None, transform=None, on_written=None):
+        """
+        Args:
+            writer: 流式输出器（见utils.output_writers.open_writer）
+            sn_index: 持久化的sn索引（RecordIndex），为None时只在本次运行内去重
+            transform: 批量格式化器（RecordTransform），为None时使用默认配置
+            on_written: 每页写入后调用的回调，参数为本页实际写入的原始投诉列表（如DetailFetcher.submit）；
+                        未传入sn_index时为本页全部不重复的投诉，由回调自行跳过已处理的投诉
+        """
+        self.writer = writer
+        self.sn_index = sn_index
+        self.transform = transform or build_complaint_transform()
+        self.on_written = on_written
+        self.output_path = writer.path
+        self.raw_count = 0
+        self.new_count = 0
+        self.changed_count = 0
+        self._seen_sns = set()  # 使用sn(投诉编号)作为去重依据
+        self._lock = threading.Lock()
+    
+    @property
+    def count(self):
+        """已写入的投诉条数"""
+        return self.writer.count
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def write_page(self, lists):
+        """
+        处理一页原始投诉
+        
+        Args:
+            lists: 原始投诉列表（API返回的lists项）
             
-            # 获取ID - 使用sn作为ID
-            item_id = main.get('sn')
-            url = main.get('url', '')
+        Returns:
+            int: 本页实际写入的条数
+        """
+        with self._lock:
+            self.raw_count += len(lists)
+            unique_results = []
+            for item in lists:
+                sn = item.get('main', {}).get('sn')
+                if sn and sn not in self._seen_sns:
+                    self._seen_sns.add(sn)
+                    unique_results.append(item)
             
-            # 如果没有ID但有URL，尝试从URL提取
-            if not item_id and url:
-                match = re.search(r'/view/(\d+)/', url)
-                if match:
-                    item_id = match.group(1)
+            default_registry.inc('heimao_complaints_received_total', len(lists))
+            default_registry.inc('heimao_complaints_duplicate_total', len(lists) - len(unique_results), scope='run')
             
-            # 移除HTML标签
-            title = remove_html_tags(main.get('title', ''))
-            company = remove_html_tags(main.get('cotitle', ''))
-            content = remove_html_tags(main.get('summary', ''))
+            # 跨运行去重：过滤掉历史运行中已输出且内容未变化的投诉
+            index_entries = []
+            if self.sn_index is not None and unique_results:
+                entries = [(item['main']['sn'], complaint_fingerprint(item)) for item in unique_results]
+                states = self.sn_index.classify(entries)
+                unique_results = [item for item, (sn, _) in zip(unique_results, entries) if states[sn] != 'unchanged']
+                index_entries = [entry for entry in entries if states[entry[0]] != 'unchanged']
+                new_count = sum(1 for sn, _ in index_entries if states[sn] == 'new')
+                self.new_count += new_count
+                self.changed_count += len(index_entries) - new_count
+                default_registry.inc('heimao_complaints_duplicate_total', len(entries) - len(index_entries), scope='index')
             
-            # 转换时间戳
-            timestamp = main.get('timestamp')
-            if timestamp:
-                try:
-                    # 尝试将字符串时间戳转换为日期时间
-                    formatted_timestamp = datetime.fromtimestamp(int(timestamp)).isoformat()
-                except (ValueError, TypeError):
-                    formatted_timestamp = timestamp
-            else:
-                formatted_timestamp = None
+            # 整页批量格式化，同一页共用一个爬取时间
+            with default_registry.span('heimao_format_duration_seconds'):
+                formatted_results = self.transform.transform(unique_results)
             
-            formatted_results.append({
-                'id': item_id,
-                'title': title,
-                'company': company,
-                'content': content,
-                'url': "https:" + url if url.startswith("//") else url,
-                'timestamp': formatted_timestamp,
-                'status': main.get('status'),
-                'crawled_at': datetime.now().isoformat(),
-                'issue': main.get('issue'),  # 问题类型
-                'appeal': main.get('appeal'),  # 诉求
-                'cost': main.get('cost')  # 消费金额
-            })
-        except Exception as e:
-            logger.exception(f"处理数据项时出错: {e}")
-            logger.error(f"问题数据: {item}")
+            with default_registry.span('heimao_write_duration_seconds'):
+                self.writer.write_many(formatted_results)
+            default_registry.inc('heimao_complaints_written_total', len(formatted_results))
+            if index_entries:
+                self.sn_index.mark(index_entries)
+            if self.on_written and unique_results:
+                self.on_written(unique_results)
+            return len(formatted_results)
+    
+    def close(self):
+        """结束输出并关闭文件"""
+        self.writer.close()
+        logger.info(f"总共获取到 {self.raw_count} 条原始投诉数据，去重后剩余 {len(self._seen_sns)} 条")
+        if self.sn_index is not None:
+            logger.info(f"索引去重后剩余 {self.count} 条投诉数据（新增 {self.new_count} 条，变更 {self.changed_count} 条）")
+        logger.info(f"已保存 {self.count} 条投诉数据到 {self.output_path}")
+
+def open_complaint_sink(output_config, output_dir, sn_index=None, processing_config=None, append=False,
+                        on_written=None):
+    """
+    根据output配置创建投诉输出管道
+    
+    output.format为jsonl时每条投诉一行，每页写入后立即刷新到磁盘；
+    为json（默认）时输出{"complaints": [...]}文档，结构与以往相同；
+    为parquet或arrow时按COMPLAINT_COLUMNS输出带类型的列，
+    配置output.columnar.partition_by时按日期/公司分区写入数据集目录（默认在输出目录下，可用dataset_dir指定共享目录）。
+    json、parquet和arrow在运行中先写入<输出路径>.partial.jsonl，结束时再生成完整输出；
+    每页落盘后才记入sn索引、推进分页游标，运行被中断时已写入的投诉在下次运行结束时一并写出。
+    append为True时保留输出文件中已有的投诉，同一投诉（id）只保留本次写入的版本
+    
+    Args:
+        output_config: output配置字典
+        output_dir: 输出目录
+        sn_index: 持久化的sn索引（RecordIndex）
+        processing_config: processing配置字典，决定文本清洗、时间戳转换和ID提取方式
+        append: 是否保留输出文件中已有的投诉（如同一天多次运行时）
+        on_written: 每页写入后调用的回调，见ComplaintSink
+        
+    Returns:
+        ComplaintSink: 投诉输出管道
+    """
+    output_format = output_config.get('format', 'json')
+    filename = output_filename(output_config.get('filename', 'heimao_data.json'), output_format)
+    output_path = os.path.join(output_dir, filename)
+    
+    columnar = output_config.get('columnar', {})
+    partition_by = columnar.get('partition_by') or []
+    if output_format in ('parquet', 'arrow') and partition_by:
+        output_path = columnar.get('dataset_dir') or os.path.splitext(output_path)[0]
+    
+    writer = open_writer(output_format, output_path, key='complaints',
+                         pretty_print=output_config.get('pretty_print', False),
+                         columns=COMPLAINT_COLUMNS, append=append, durable=True, unique_key='id',
+                         partition_by=partition_by, date_column='timestamp',
+                         row_group_size=columnar.get('row_group_size', DEFAULT_ROW_GROUP_SIZE))
+    normalizer = TextNormalizer.from_processing_config(processing_config)
+    return ComplaintSink(writer, sn_index, build_complaint_transform(processing_config, normalizer), on_written)
+
+def save_complaints(all_results, output_config, output_dir, sn_index=None):
+    """
+    对已在内存中的原始投诉数据去重、格式化并写入输出文件
+    
+    Args:
+        all_results: 原始投诉列表（API返回的lists项）
+        output_config: output配置字典
+        output_dir: 输出目录
+        sn_index: 持久化的sn索引（RecordIndex），为None时只在本次运行内去重
+        
+    Returns:
+        tuple: (保存的投诉条数, 输出文件路径)
+    """
+    with open_complaint_sink(output_config, output_dir, sn_index) as sink:
+        sink.write_page(all_results)
+    return sink.count, sink.output_path
+
+def create_client(config, cache=None):
+    """
+    根据站点配置创建HeimaoClient
+    
+    连接池大小按keyword_workers × page_workers计算，保证每个并发请求都能复用连接。
+    auth.cookie_envs配置了多个有效Cookie时创建账号池，每个账号使用独立的会话和限速器。
+    请求发往site_info.base_url（如指向本地回放服务），未配置时为黑猫投诉站点
+    
+    Args:
+        config: 配置信息字典
+        cache: 搜索结果的响应缓存（ResponseCache），账号池中的各账号共用，为None时不缓存
+        
+    Returns:
+        HeimaoClient或AccountPool: 黑猫投诉API客户端
+    """
+    scraping = config.get('scraping', {})
+    api_config = scraping.get('api', {})
+    concurrency_config = scraping.get('concurrency', {})
+    auth = config.get('auth', {})
+    
+    cookies = load_cookies(auth)
+    
+    timeout = api_config.get('timeout', DEFAULT_TIMEOUT)
+    if isinstance(timeout, list):
+        timeout = tuple(timeout)
+    
+    pool_size = concurrency_config.get('keyword_workers', 1) * concurrency_config.get('page_workers', 1)
+    base_url = config.get('site_info', {}).get('base_url', HEIMAO_BASE_URL)
+    if len(cookies) > 1:
+        pool_config = auth.get('pool', {})
+        accounts = [
+            Account(name, HeimaoClient(cookie=cookie, timeout=timeout, pool_size=pool_size, base_url=base_url,
+                                       cache=cache),
+                    build_rate_limiter(scraping, shared=False))
+            for name, cookie in cookies
+        ]
+        logger.info(f"使用账号池: {len(accounts)} 个账号轮流请求")
+        return AccountPool(accounts, quarantine=pool_config.get('quarantine', DEFAULT_QUARANTINE),
+                           max_failures=pool_config.get('max_failures', DEFAULT_MAX_FAILURES))
+    
+    cookie = cookies[0][1] if cookies else None
+    return HeimaoClient(cookie=cookie, timeout=timeout, pool_size=pool_size, base_url=base_url, cache=cache)
+
+def scrape_heimao(config, output_dir=None, client=None):
+    """
+    主爬虫函数，由框架调用
     
-    logger.info(f"格式化后得到 {len(formatted_results)} 条投诉数据")
+    Args:
+        config: 配置信息字典
+        output_dir: 输出目录
+        client: 共享的HeimaoClient，为None时根据配置创建
+        
+    Returns:
+        dict: 包含爬取结果的字典
+    """
+    # 获取配置
+    scraping = config.get('scraping', {})
+    output_config = config.get('output', {})
+    
+    # 获取API配置
+    api_config = scraping.get('api', {})
+    page_size = api_config.get('page_size', 10)
+    max_pages = api_config.get('max_pages', 5)
+    
+    # 获取并发配置：keyword_workers > 1 时多个关键词并行搜索，page_workers > 1 时并发获取分页
+    concurrency_config = scraping.get('concurrency', {})
+    keyword_workers = concurrency_config.get('keyword_workers', 1)
+    page_workers = concurrency_config.get('page_workers', 1)
+    retry_policy = RetryPolicy.from_config(scraping.get('retry', {}))
+    
+    # 响应缓存由搜索请求和详情页请求共用；离线模式下只读缓存，不请求网络
+    cache = open_response_cache(config)
     
-    # 输出结果
-    output_filename = output_config.get('filename', 'heimao_data.json')
-    output_path = os.path.join(output_dir, output_filename)
+    # 所有关键词和分页请求共享同一个客户端（连接池、请求头、Cookie）
+    own_client = client is None
+    if own_client:
+        client = create_client(config, cache)
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        if output_config.get('pretty_print', False):
-            json.dump({'complaints': formatted_results}, f, ensure_ascii=False, indent=2)
+    # 使用账号池时由各账号的限速器控制节奏，风控和登录页由账号池换账号重试；离线回放时无需限速
+    if getattr(client, 'paced', False):
+        rate_limiter = None
+        page_backoff_retries = 0
+    else:
+        rate_limiter = build_rate_limiter(scraping)
+        page_backoff_retries = get_backoff_retries(scraping)
+    
+    # 创建输出目录（如果不存在）
+    if not output_dir:
+        today = datetime.now().strftime('%Y-%m-%d')
+        output_dir = os.path.join('data', 'daily', today)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    
+    search_keywords = collect_keywords(scraping)
+    
+    # 增量爬取：读取每个关键词上次的水位线
+    watermarks = open_watermark_store(scraping)
+    
+    # 分页游标检查点：上次运行中断时从中断的页继续
+    cursors = open_cursor_store(scraping)
+    
+    # 每获取一页即去重、格式化并写入输出文件，内存中只保留当前页；
+    # 当天的输出文件已存在时（同一天多次运行或从检查点恢复）合并其中的投诉，
+    # 启用跨运行去重时已输出的投诉不会再次写入，不合并会使当天的文件只剩本次新增的投诉；
+    # 启用详情页抓取时，写入的新增或变更投诉同时交给后台线程抓取详情页
+    sn_index = open_sn_index(config)
+    details = open_detail_fetcher(config, output_dir, retry_policy, cache)
+    sink = open_complaint_sink(output_config, output_dir, sn_index, config.get('processing', {}), append=True,
+                               on_written=details.submit if details else None)
+    
+    def search(keyword):
+        if keyword:
+            logger.info(f"搜索关键词: {keyword}")
+        watermark = watermarks.get(keyword or WATERMARK_LATEST_KEY) if watermarks else None
+        start_time = time.perf_counter()
+        result = get_complaints(keyword=keyword, page_size=page_size, max_pages=max_pages,
+                                concurrency=page_workers, rate_limiter=rate_limiter, client=client,
+                                watermark=watermark, on_page=sink.write_page,
+                                backoff_retries=page_backoff_retries, retry_policy=retry_policy,
+                                cursor=open_page_cursor(cursors, scraping, keyword))
+        return result, time.perf_counter() - start_time
+    
+    # 多个关键词分发到线程池并行搜索，所有线程共享同一个限速器
+    run_start = time.perf_counter()
+    try:
+        if keyword_workers > 1 and len(search_keywords) > 1:
+            with ThreadPoolExecutor(max_workers=min(keyword_workers, len(search_keywords))) as executor:
+                search_results = list(executor.map(search, search_keywords))
         else:
-            json.dump({'complaints': formatted_results}, f, ensure_ascii=False)
+            search_results = [search(keyword) for keyword in search_keywords]
+    finally:
+        if own_client:
+            client.close()
+        sink.close()
+        if sn_index is not None:
+            sn_index.close()
+        if details is not None:
+            details.close()
+        if cache is not None:
+            cache.close()
     
-    logger.info(f"已保存 {len(formatted_results)} 条投诉数据到 {output_path}")
+    run_elapsed = time.perf_counter() - run_start
+    default_registry.observe('heimao_run_duration_seconds', run_elapsed)
+    logger.info(f"搜索阶段共耗时 {run_elapsed:.2f} 秒")
     
-    return {
+    keyword_stats = []
+    for keyword, (result, elapsed) in zip(search_keywords, search_results):
+        keyword_stats.append(keyword_stat(keyword, result, elapsed))
+        if result.get('status') == 'success' and watermarks:
+            update_watermark(watermarks, keyword, result)
+    
+    # 数据保存成功后再持久化水位线
+    if watermarks:
+        watermarks.save()
+    
+    count, output_path = sink.count, sink.output_path
+    
+    result = {
         'status': 'success',
-        'count': len(formatted_results),
-        'output_path': output_path
+        'count': count,
+        'output_path': output_path,
+        'keywords': keyword_stats
     }
+    if details is not None:
+        result['details'] = details.stats()
+    if cache is not None:
+        result['http_cache'] = cache.stats()
+    if isinstance(client, AccountPool):
+        result['accounts'] = client.stats()
+        for stats in result['accounts']:
+            logger.info(f"账号{stats['account']}: {stats}")
+    metrics_path = write_metrics(output_dir, 'heimao', output_config.get('metrics'), prefix='heimao_')
+    if metrics_path:
+        result['metrics_path'] = metrics_path
+    return result
 
 if __name__ == "__main__":
     # 用于直接运行模块进行测试
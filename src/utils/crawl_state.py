@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+爬取状态存储工具
+提供跨运行持久化的键值状态（如增量爬取水位线、分页游标检查点），以JSON文件保存
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger('crawl_state')
+
+class JsonStateStore:
+    """基于JSON文件的键值状态存储（线程安全）"""
+
+    def __init__(self, path: str):
+        """
+        初始化状态存储，文件存在时加载已有状态
+
+        Args:
+            path: 状态文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._state: Dict[str, Any] = {}
+        self._dirty = False
+        self.load()
+
+    def load(self) -> Dict[str, Any]:
+        """
+        从文件加载状态，文件不存在或损坏时使用空状态
+
+        Returns:
+            Dict: 当前状态
+        """
+        with self._lock:
+            self._state = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._state = json.load(f)
+                except (json.JSONDecodeError, OSError) as e:
+                    logger.warning(f"状态文件无法读取，将重新创建: {self.path} ({e})")
+            self._dirty = False
+            return dict(self._state)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """获取指定键的状态"""
+        with self._lock:
+            return self._state.get(key, default)
+
+    def set(self, key: str, value: Any):
+        """设置指定键的状态（需调用save持久化）"""
+        with self._lock:
+            self._state[key] = value
+            self._dirty = True
+
+    def delete(self, key: str):
+        """删除指定键的状态（需调用save持久化）"""
+        with self._lock:
+            if self._state.pop(key, None) is not None:
+                self._dirty = True
+
+    def save(self, force: bool = False) -> Optional[str]:
+        """
+        将状态原子写入文件（先写临时文件再替换），避免中途崩溃留下损坏的状态文件
+
+        Args:
+            force: 状态未变化时是否仍然写入
+
+        Returns:
+            str: 状态文件路径，未写入时返回None
+        """
+        with self._lock:
+            if not self._dirty and not force:
+                return None
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            return self.path
+
+class PageCursor:
+    """
+    分页游标检查点：记录某个分页任务（如一个搜索关键词）下一次要获取的页码及附带状态，
+    每推进一页即持久化，运行中断后下次可从该页继续，任务正常结束后删除
+    """
+
+    def __init__(self, store: JsonStateStore, key: str, max_age: Optional[float] = None):
+        """
+        Args:
+            store: 保存游标的状态存储，多个任务可共用
+            key: 任务的键
+            max_age: 检查点的有效期（秒），过期的检查点不再恢复，为None时不过期
+        """
+        self.store = store
+        self.key = key
+        self.max_age = max_age
+
+    @staticmethod
+    def _is_fresh(entry: Any, max_age: Optional[float]) -> bool:
+        if not isinstance(entry, dict) or 'page' not in entry:
+            return False
+        if max_age is None:
+            return True
+        try:
+            updated_at = datetime.fromisoformat(entry['updated_at'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return (datetime.now() - updated_at).total_seconds() <= max_age
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        读取检查点
+
+        Returns:
+            Dict: 包含page（下一次要获取的页码）及附带状态的字典，不存在或已过期时返回None
+        """
+        entry = self.store.get(self.key)
+        return entry if self._is_fresh(entry, self.max_age) else None
+
+    def advance(self, page: int, **state):
+        """
+        记录下一次要获取的页码并立即持久化
+
+        Args:
+            page: 下一次要获取的页码
+            **state: 恢复时需要的其他状态（需可JSON序列化）
+        """
+        self.store.set(self.key, {'page': page, 'updated_at': datetime.now().isoformat(), **state})
+        self.store.save()
+
+    def finish(self):
+        """任务正常结束，删除检查点"""
+        self.store.delete(self.key)
+        self.store.save()
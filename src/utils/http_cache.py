@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+HTTP响应缓存
+基于SQLite的磁盘响应缓存，按规范化后的请求（忽略ts/rs/signature等每次都变化的参数）存取响应，
+支持过期时间（TTL）、按总大小的LRU淘汰和离线回放模式，供各爬虫共用：
+重跑失败的一天或调试格式化逻辑时直接读取缓存，离线模式下完全不发出网络请求
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import urllib.parse
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger('http_cache')
+
+# 默认缓存数据库路径
+DEFAULT_CACHE_PATH = os.path.join('.cache', 'http_responses.sqlite3')
+
+# 默认过期时间（秒）
+DEFAULT_TTL = 3600
+
+# 默认缓存总大小上限（MB）
+DEFAULT_MAX_SIZE_MB = 512
+
+# 计算缓存键时忽略的查询参数（时间戳、随机串、签名等每次请求都不同的参数）
+DEFAULT_IGNORED_PARAMS = ('ts', 'rs', 'signature', '_')
+
+# 缓存模式：normal读写缓存；offline只读缓存，未命中时报错而不请求网络；refresh忽略已有缓存重新请求并写入
+CACHE_MODES = ('normal', 'offline', 'refresh')
+
+# 覆盖配置中缓存模式的环境变量，如HTTP_CACHE_MODE=offline
+CACHE_MODE_ENV = 'HTTP_CACHE_MODE'
+
+# LRU淘汰时清理到上限的比例，避免每次写入都触发淘汰
+_EVICT_TARGET_RATIO = 0.9
+
+class CacheMissError(LookupError):
+    """离线模式下缓存中没有对应的响应"""
+
+def normalize_request(url: str, method: str = 'GET', params: Optional[Dict[str, Any]] = None,
+                      body: Any = None, ignore_params: Iterable[str] = DEFAULT_IGNORED_PARAMS) -> str:
+    """
+    规范化请求，作为缓存键
+
+    协议和主机名转为小写，查询参数（包括params）去掉忽略的参数后排序，丢弃URL片段；
+    body不为None时按键排序序列化后附加在末尾
+
+    Args:
+        url: 请求URL
+        method: 请求方法，也可以是区分不同接口的名称（如'SCRAPE'）
+        params: 额外的查询参数
+        body: 请求体，需可序列化为JSON
+        ignore_params: 忽略的查询参数名
+
+    Returns:
+        str: 规范化后的请求描述
+    """
+    ignored = set(ignore_params)
+    parts = urllib.parse.urlsplit(url)
+    query = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((key, str(value)) for key, value in params.items())
+    query = sorted((key, value) for key, value in query if key not in ignored)
+    normalized = urllib.parse.urlunsplit((
+        parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urllib.parse.urlencode(query), ''
+    ))
+    request = f"{method.upper()} {normalized}"
+    if body is not None:
+        request += '\n' + json.dumps(body, ensure_ascii=False, sort_keys=True, default=str)
+    return request
+
+class CachedResponse:
+    """缓存中的一条响应"""
+
+    def __init__(self, request: str, body: bytes, status: int = 200, headers: Optional[Dict[str, str]] = None,
+                 meta: Optional[Dict[str, Any]] = None, stored_at: float = 0.0):
+        """
+        Args:
+            request: 规范化后的请求
+            body: 响应体
+            status: HTTP状态码
+            headers: 需要保留的响应头（如ETag、Last-Modified）
+            meta: 调用方附加的信息
+            stored_at: 写入或上次验证的时间戳
+        """
+        self.request = request
+        self.body = body
+        self.status = status
+        self.headers = headers or {}
+        self.meta = meta or {}
+        self.stored_at = stored_at
+
+    @property
+    def text(self) -> str:
+        """按UTF-8解码的响应体"""
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        """解析为JSON的响应体"""
+        return json.loads(self.body)
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get('ETag')
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.headers.get('Last-Modified')
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """用于条件请求的If-None-Match/If-Modified-Since请求头"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class ResponseCache:
+    """磁盘响应缓存（线程安全），多个爬虫和线程可以共用同一个实例"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: Optional[float] = DEFAULT_TTL,
+                 max_size_mb: Optional[float] = DEFAULT_MAX_SIZE_MB, mode: str = 'normal'):
+        """
+        打开或创建缓存数据库
+
+        Args:
+            path: SQLite数据库文件路径
+            ttl: 过期时间（秒），为None时永不过期；过期的条目仍保留，可用于条件请求和离线回放
+            max_size_mb: 响应体总大小上限（MB），超出时淘汰最久未使用的条目，为None时不限制
+            mode: 缓存模式，见CACHE_MODES
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"未知的缓存模式: {mode}，可选值为 {', '.join(CACHE_MODES)}")
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.mode = mode
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                request TEXT,
+                status INTEGER,
+                headers TEXT,
+                meta TEXT,
+                body BLOB,
+                size INTEGER,
+                stored_at REAL,
+                accessed_at REAL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def offline(self) -> bool:
+        """离线回放模式：只读缓存，不请求网络"""
+        return self.mode == 'offline'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+        logger.info(f"响应缓存: 命中 {self.hits} 次，写入 {self.stores} 条，淘汰 {self.evictions} 条")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def _key(request: str) -> str:
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        """条目是否在有效期内"""
+        return self.ttl is None or time.time() - entry.stored_at < self.ttl
+
+    def peek(self, request: str) -> Optional[CachedResponse]:
+        """
+        读取条目而不检查有效期、不计入命中统计、不更新访问时间（用于读取条件请求的验证信息和meta）
+
+        Args:
+            request: 规范化后的请求（见normalize_request）
+
+        Returns:
+            CachedResponse: 缓存的响应，不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT request, body, status, headers, meta, stored_at FROM responses WHERE key = ?",
+                (self._key(request),)
+            ).fetchone()
+        if row is None:
+            return None
+        return CachedResponse(row[0], row[1], row[2], json.loads(row[3]), json.loads(row[4]), row[5])
+
+    def get(self, request: str) -> Optional[CachedResponse]:
+        """
+        读取有效的缓存响应
+
+        离线模式下返回任意时间写入的条目；refresh模式下总是返回None
+
+        Args:
+            request: 规范化后的请求（见normalize_request）
+
+        Returns:
+            CachedResponse: 缓存的响应，未命中或已过期时返回None
+        """
+        entry = None if self.mode == 'refresh' else self.peek(request)
+        if entry is not None and not self.offline and not self.is_fresh(entry):
+            entry = None
+        if entry is None:
+            return None
+        with self._lock:
+            self.hits += 1
+            with self._conn:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?",
+                                   (time.time(), self._key(request)))
+        return entry
+
+    def store(self, request: str, body: bytes, status: int = 200, headers: Optional[Dict[str, str]] = None,
+              meta: Optional[Dict[str, Any]] = None):
+        """
+        写入或替换一条响应，总大小超过上限时淘汰最久未使用的条目
+
+        Args:
+            request: 规范化后的请求（见normalize_request）
+            body: 响应体，str按UTF-8编码
+            status: HTTP状态码
+            headers: 需要保留的响应头
+            meta: 调用方附加的信息
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key = self._key(request)
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO responses
+                        (key, request, status, headers, meta, body, size, stored_at, accessed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (key, request, status, json.dumps(headers or {}), json.dumps(meta or {}, ensure_ascii=False),
+                     body, len(body), now, now)
+                )
+                self._size += len(body) - (previous[0] if previous else 0)
+                self.stores += 1
+                if self.max_bytes is not None and self._size > self.max_bytes:
+                    self._evict(key)
+
+    def touch(self, request: str, meta: Optional[Dict[str, Any]] = None):
+        """
+        服务端确认缓存的响应仍然有效（如返回304）时刷新写入时间，并可更新meta
+
+        Args:
+            request: 规范化后的请求
+            meta: 新的附加信息，为None时保持不变
+        """
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                if meta is None:
+                    self._conn.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                                       (now, now, self._key(request)))
+                else:
+                    self._conn.execute(
+                        "UPDATE responses SET stored_at = ?, accessed_at = ?, meta = ? WHERE key = ?",
+                        (now, now, json.dumps(meta, ensure_ascii=False), self._key(request))
+                    )
+
+    def _evict(self, keep: str):
+        """按访问时间从旧到新淘汰条目，直到总大小降到上限的90%（调用方持有锁并在事务中）"""
+        target = self.max_bytes * _EVICT_TARGET_RATIO
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            if key == keep:
+                continue
+            evicted.append((key,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        return {
+            'mode': self.mode,
+            'hits': self.hits,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'size_mb': round(self._size / 1024 / 1024, 2)
+        }
+
+def open_response_cache(config: Dict[str, Any]) -> Optional[ResponseCache]:
+    """
+    根据scraping.http_cache配置打开响应缓存
+
+    设置了环境变量HTTP_CACHE_MODE时覆盖配置中的模式，并在配置未启用缓存时也启用
+
+    Args:
+        config: 站点配置字典
+
+    Returns:
+        ResponseCache: 响应缓存，未启用时返回None
+    """
+    cache_config = config.get('scraping', {}).get('http_cache', {})
+    mode = os.environ.get(CACHE_MODE_ENV) or cache_config.get('mode', 'normal')
+    if not cache_config.get('enable', False) and not os.environ.get(CACHE_MODE_ENV):
+        return None
+
+    cache = ResponseCache(
+        path=cache_config.get('path', DEFAULT_CACHE_PATH),
+        ttl=cache_config.get('ttl', DEFAULT_TTL),
+        max_size_mb=cache_config.get('max_size_mb', DEFAULT_MAX_SIZE_MB),
+        mode=mode
+    )
+    logger.info(f"启用响应缓存: {cache.path}（模式 {cache.mode}，有效期 {cache.ttl} 秒）")
+    return cache
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+进程内共享的HTTP连接池和全局并发预算
+单进程运行多个站点时，各客户端的会话挂载同一个HTTPAdapter（连接池按主机复用，请求头和Cookie仍由各自的会话持有），
+所有请求共用一个并发预算，限制整个进程同时进行中的请求数；未配置时各客户端使用独立的连接池，请求不受预算限制
+"""
+
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('http_pool')
+
+# 共享连接池默认缓存的主机数
+DEFAULT_POOL_HOSTS = 10
+
+_shared_adapter: Optional[HTTPAdapter] = None
+_request_budget: Optional[threading.BoundedSemaphore] = None
+_pool_lock = threading.Lock()
+
+def configure_shared_pool(max_connections: int, hosts: int = DEFAULT_POOL_HOSTS) -> HTTPAdapter:
+    """
+    创建进程内共享的连接池，之后新建的客户端会话都挂载它
+
+    Args:
+        max_connections: 每个主机的最大连接数
+        hosts: 缓存连接池的主机数
+
+    Returns:
+        HTTPAdapter: 共享的适配器
+    """
+    global _shared_adapter
+    with _pool_lock:
+        if _shared_adapter is not None:
+            _shared_adapter.close()
+        _shared_adapter = HTTPAdapter(pool_connections=max(1, hosts), pool_maxsize=max(1, max_connections))
+        logger.info(f"启用共享连接池: {hosts} 个主机，每个主机最多 {max_connections} 个连接")
+        return _shared_adapter
+
+def set_request_budget(limit: Optional[int]):
+    """
+    设置全局并发预算
+
+    Args:
+        limit: 整个进程同时进行中的请求数上限，为None时不限制
+    """
+    global _request_budget
+    with _pool_lock:
+        _request_budget = threading.BoundedSemaphore(limit) if limit else None
+    if limit:
+        logger.info(f"全局并发预算: 同时最多 {limit} 个请求")
+
+def reset_shared_pool():
+    """关闭共享连接池并取消并发预算"""
+    global _shared_adapter
+    set_request_budget(None)
+    with _pool_lock:
+        if _shared_adapter is not None:
+            _shared_adapter.close()
+        _shared_adapter = None
+
+def mount_adapter(session: requests.Session, pool_size: int):
+    """
+    为会话挂载连接池：配置了共享连接池时挂载共享的适配器，否则新建大小为pool_size的连接池
+
+    Args:
+        session: 请求会话
+        pool_size: 未使用共享连接池时的连接池大小
+    """
+    adapter = _shared_adapter or HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+def close_session(session: requests.Session):
+    """关闭会话；挂载共享连接池时只释放会话本身，连接池留给其他客户端"""
+    if _shared_adapter is not None and session.get_adapter("https://") is _shared_adapter:
+        session.adapters.clear()
+    session.close()
+
+@contextmanager
+def request_slot():
+    """在全局并发预算内占用一个请求名额，未设置预算时不等待"""
+    budget = _request_budget
+    if budget is None:
+        yield
+        return
+    budget.acquire()
+    try:
+        yield
+    finally:
+        budget.release()
+
+@asynccontextmanager
+async def async_request_slot():
+    """request_slot的异步版本，等待名额时不阻塞事件循环"""
+    budget = _request_budget
+    if budget is None:
+        yield
+        return
+    if not budget.acquire(blocking=False):
+        waiter = asyncio.ensure_future(asyncio.to_thread(budget.acquire))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            # 取消时等待线程仍会拿到名额，拿到后立即归还
+            waiter.add_done_callback(lambda _: budget.release())
+            raise
+    try:
+        yield
+    finally:
+        budget.release()
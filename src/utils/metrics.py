@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+运行指标工具
+提供线程安全的计数器、直方图和计时区间（span），并导出为Prometheus文本格式或JSON文件，
+用于记录请求延迟、接收字节数、每个关键词的页数、去重命中、格式化和写文件耗时等
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+logger = logging.getLogger('metrics')
+
+# 耗时直方图的默认分桶上限（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 支持的导出格式及其文件扩展名
+METRICS_FORMATS = {'prometheus': 'prom', 'json': 'json'}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Histogram:
+    """累积分桶直方图（由MetricsRegistry加锁访问）"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> Iterator[Tuple[float, int]]:
+        """按Prometheus约定返回(上限, 累积计数)，最后一项为+Inf"""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+        yield float('inf'), self.count
+
+class MetricsRegistry:
+    """
+    指标注册表（线程安全）
+
+    计数器和直方图按名称和标签区分，首次使用时自动创建；指标名称约定以组件为前缀（如heimao_、firecrawl_），
+    导出时可按前缀筛选，多个组件在同一进程中运行时各自导出自己的指标
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str, buckets: Optional[Sequence[float]] = None):
+        """
+        登记指标的说明，直方图可指定分桶上限（需在首次记录之前调用）
+
+        Args:
+            name: 指标名称
+            help_text: 导出时的说明
+            buckets: 直方图的分桶上限，为None时使用DEFAULT_BUCKETS
+        """
+        with self._lock:
+            self._help[name] = help_text
+            if buckets is not None:
+                self._buckets[name] = tuple(buckets)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """计数器加上value"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """向直方图记录一个观测值"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._buckets.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        计时区间：退出时把耗时（秒）记录到名为name的直方图
+
+        区间内抛出异常时附加error标签（异常类型名），调用方也可通过返回的字典补充标签（如响应状态）
+
+        Yields:
+            dict: 本次记录使用的标签
+        """
+        start = time.perf_counter()
+        try:
+            yield labels
+        except BaseException as e:
+            labels.setdefault('error', type(e).__name__)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter_value(self, name: str, **labels) -> float:
+        """读取计数器的当前值，不存在时为0"""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def reset(self):
+        """清空所有记录（保留说明和分桶设置）"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self, prefix: str = '') -> Dict[str, Any]:
+        """
+        导出为可JSON序列化的字典
+
+        Args:
+            prefix: 只导出以此开头的指标
+
+        Returns:
+            dict: {'counters': {名称: [{'labels', 'value'}]}, 'histograms': {名称: [{'labels', 'count', 'sum', 'buckets'}]}}
+        """
+        with self._lock:
+            counters = {
+                name: [{'labels': dict(key), 'value': value} for key, value in sorted(series.items())]
+                for name, series in sorted(self._counters.items()) if name.startswith(prefix)
+            }
+            histograms = {
+                name: [{
+                    'labels': dict(key),
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'buckets': {_format_number(bound): count for bound, count in histogram.cumulative()}
+                } for key, histogram in sorted(series.items())]
+                for name, series in sorted(self._histograms.items()) if name.startswith(prefix)
+            }
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self, prefix: str = '') -> str:
+        """
+        导出为Prometheus文本格式（可供node_exporter的textfile收集器读取）
+
+        Args:
+            prefix: 只导出以此开头的指标
+
+        Returns:
+            str: Prometheus文本格式的指标
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if not name.startswith(prefix):
+                    continue
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_number(value)}")
+            for name, series in sorted(self._histograms.items()):
+                if not name.startswith(prefix):
+                    continue
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', _format_number(bound)))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_number(round(histogram.sum, 6))}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def write(self, path: str, fmt: str = 'prometheus', prefix: str = '') -> str:
+        """
+        把指标写入文件（先写临时文件再替换，读取方不会读到写了一半的文件）
+
+        Args:
+            path: 输出文件路径
+            fmt: 'prometheus'或'json'
+            prefix: 只导出以此开头的指标
+
+        Returns:
+            str: 输出文件路径
+        """
+        if fmt not in METRICS_FORMATS:
+            raise ValueError(f"不支持的指标格式: {fmt}")
+        if fmt == 'json':
+            content = json.dumps({'generated_at': datetime.now().isoformat(), **self.snapshot(prefix)},
+                                 ensure_ascii=False, indent=2)
+        else:
+            content = self.to_prometheus(prefix)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+        return path
+
+# 模块级的默认注册表，各组件默认把指标记录到这里
+default_registry = MetricsRegistry()
+
+def write_metrics(output_dir: str, name: str, metrics_config: Optional[Dict[str, Any]] = None,
+                  prefix: str = '', registry: Optional[MetricsRegistry] = None) -> Optional[str]:
+    """
+    根据metrics配置把指标写到数据目录下的<name>_metrics.prom（或.json）
+
+    Args:
+        output_dir: 输出目录（通常为当天的数据目录）
+        name: 文件名前缀，如站点ID
+        metrics_config: metrics配置字典，enable为false时不写入，format为prometheus（默认）或json
+        prefix: 只导出以此开头的指标
+        registry: 指标注册表，为None时使用default_registry
+
+    Returns:
+        str: 输出文件路径，未启用或写入失败时返回None
+    """
+    metrics_config = metrics_config or {}
+    if not metrics_config.get('enable', True):
+        return None
+    fmt = metrics_config.get('format', 'prometheus')
+    path = os.path.join(output_dir, f"{name}_metrics.{METRICS_FORMATS.get(fmt, fmt)}")
+    try:
+        (registry or default_registry).write(path, fmt, prefix)
+    except (OSError, ValueError) as e:
+        logger.error(f"写入指标文件失败: {e}")
+        return None
+    logger.info(f"运行指标已保存到 {path}")
+    return path
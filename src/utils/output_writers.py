@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""
+输出写入工具
+提供逐条写入记录的流式输出器，避免在内存中累积全部结果
+"""
+
+import os
+import json
+import uuid
+import logging
+import textwrap
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_dataset
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger('output_writers')
+
+# 各输出格式对应的文件扩展名
+OUTPUT_EXTENSIONS = {
+    'json': '.json',
+    'jsonl': '.jsonl',
+    'parquet': '.parquet',
+    'arrow': '.arrow'
+}
+
+# 列式输出默认每缓冲多少条记录写入一个行组
+DEFAULT_ROW_GROUP_SIZE = 10000
+
+# 崩溃安全的输出先写入的日志文件的后缀（见JournaledWriter）
+JOURNAL_SUFFIX = '.partial.jsonl'
+
+# 由日志生成完整输出时每批读取的记录数
+JOURNAL_BATCH_SIZE = 1000
+
+class JsonlWriter:
+    """
+    JSON Lines输出器，每条记录一行，写入后立即刷新，中途崩溃也能保留已写入的记录
+
+    设置了唯一键时，运行中仍逐行追加（同一键可能暂时出现多行），close时按键压缩，与其他格式的去重结果一致
+    """
+
+    def __init__(self, path: str, append: bool = False, sync: bool = False, unique_key: Optional[str] = None):
+        """
+        创建输出文件
+
+        Args:
+            path: 输出文件路径
+            append: 是否追加到已有文件之后，否则覆盖
+            sync: 每批记录写入后是否调用fsync，保证write_many返回时记录已落盘
+            unique_key: 记录的唯一键字段，close时同一键只保留最后写入的一行，为None时不压缩
+        """
+        self.path = path
+        self.count = 0
+        self.sync = sync
+        self.unique_key = unique_key
+        self._lock = threading.Lock()
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write_many(self, records: Iterable[Dict[str, Any]]):
+        """写入一批记录并刷新到磁盘"""
+        lines = [json.dumps(record, ensure_ascii=False) + '\n' for record in records]
+        if not lines:
+            return
+        with self._lock:
+            self._file.writelines(lines)
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+            self.count += len(lines)
+
+    def close(self):
+        """关闭输出文件；设置了唯一键时按键压缩"""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+            if self.unique_key:
+                self._compact()
+
+    def _compact(self):
+        """同一键只保留最后写入的一行：写入临时文件后替换，压缩中途崩溃时原文件不受影响"""
+        latest = _latest_positions(self.path, self.unique_key)
+        # 最后一条记录的位置加1即总行数，没有重复的键时无需改写
+        if not latest or len(latest) == max(latest.values()) + 1:
+            return
+        temp_path = self.path + '.tmp'
+        with JsonlWriter(temp_path, sync=self.sync) as target:
+            for batch in _unique_batches(self.path, self.unique_key, latest):
+                target.write_many(batch)
+        os.replace(temp_path, self.path)
+
+def _recover_json_records(text: str, key: str) -> List[Dict[str, Any]]:
+    """从不完整的{"<key>": [...]}文档（如写入中途崩溃）中逐条解析出完整的记录"""
+    marker = json.dumps(key) + ':'
+    start = text.find(marker)
+    if start < 0:
+        return []
+    position = text.find('[', start + len(marker))
+    if position < 0:
+        return []
+    decoder = json.JSONDecoder()
+    records = []
+    position += 1
+    while True:
+        while position < len(text) and text[position] in ' \t\r\n,':
+            position += 1
+        try:
+            record, position = decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            return records
+        records.append(record)
+
+def _read_json_records(path: str, key: str) -> List[Dict[str, Any]]:
+    """读取已有JSON文档中的记录列表，文档不完整时恢复其中完整的记录，文件不存在时返回空列表"""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except OSError as e:
+        logger.warning(f"无法读取已有输出文件: {path} ({e})")
+        return []
+    try:
+        document = json.loads(text)
+    except json.JSONDecodeError:
+        records = _recover_json_records(text, key)
+        logger.warning(f"已有输出文件不完整，恢复了其中 {len(records)} 条记录: {path}")
+        return records
+    return document.get(key, []) if isinstance(document, dict) else []
+
+def _read_columnar_records(path: str, output_format: str) -> List[Dict[str, Any]]:
+    """读取已有单个Parquet/Arrow文件中的记录，文件不存在或无法读取时返回空列表"""
+    if not os.path.exists(path):
+        return []
+    try:
+        if output_format == 'arrow':
+            with pa.memory_map(path) as source:
+                return pa.ipc.open_file(source).read_all().to_pylist()
+        return pq.read_table(path).to_pylist()
+    except (pa.ArrowException, OSError) as e:
+        logger.warning(f"无法读取已有输出文件: {path} ({e})")
+        return []
+
+def _read_journal(path: str, batch_size: int = JOURNAL_BATCH_SIZE) -> Iterable[List[Dict[str, Any]]]:
+    """按批读取日志文件中的记录，跳过崩溃时只写了一半的最后一行"""
+    batch = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                batch.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"跳过日志文件中不完整的行: {path}")
+                continue
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def _latest_positions(path: str, key: str) -> Dict[Any, int]:
+    """记录文件（JSON Lines）中每个键最后出现的位置"""
+    latest = {}
+    position = 0
+    for batch in _read_journal(path):
+        for record in batch:
+            latest[record.get(key)] = position
+            position += 1
+    return latest
+
+def _unique_batches(path: str, key: str, latest: Dict[Any, int]) -> Iterable[List[Dict[str, Any]]]:
+    """按批读取记录文件，只保留每个键最后出现的记录（latest见_latest_positions）"""
+    position = 0
+    for batch in _read_journal(path):
+        kept = []
+        for record in batch:
+            if latest[record.get(key)] == position:
+                kept.append(record)
+            position += 1
+        yield kept
+
+class JsonArrayWriter:
+    """
+    流式写入{"<key>": [...]}格式的JSON文档，与原先一次性json.dump的输出结构相同
+
+    文档在close时才完整，中途崩溃会留下不完整的JSON，需要崩溃安全时应使用open_writer(durable=True)
+    """
+
+    def __init__(self, path: str, key: str = 'records', pretty_print: bool = False, append: bool = False,
+                 metadata: Optional[Dict[str, Any]] = None):
+        """
+        创建输出文件并写入文档开头
+
+        Args:
+            path: 输出文件路径
+            key: 记录列表在文档中的键名
+            pretty_print: 是否缩进输出
+            append: 是否保留已有文件中的记录（读出后重新写在开头），否则覆盖
+            metadata: 写在记录列表之前的其他字段
+        """
+        existing = _read_json_records(path, key) if append else []
+        self.path = path
+        self.count = 0
+        self.pretty_print = pretty_print
+        self._lock = threading.Lock()
+        self._file = open(path, 'w', encoding='utf-8')
+        fields = [json.dumps(name, ensure_ascii=False) + ': ' + json.dumps(value, ensure_ascii=False)
+                  for name, value in (metadata or {}).items()]
+        fields.append(json.dumps(key) + ': [')
+        if pretty_print:
+            self._file.write('{\n  ' + ',\n  '.join(fields))
+        else:
+            self._file.write('{' + ', '.join(fields))
+        self.write_many(existing)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _dumps(self, record: Dict[str, Any]) -> str:
+        if self.pretty_print:
+            return '\n' + textwrap.indent(json.dumps(record, ensure_ascii=False, indent=2), '    ')
+        return json.dumps(record, ensure_ascii=False)
+
+    def write_many(self, records: Iterable[Dict[str, Any]]):
+        """写入一批记录并刷新到磁盘"""
+        with self._lock:
+            for record in records:
+                if self.count:
+                    self._file.write(',' if self.pretty_print else ', ')
+                self._file.write(self._dumps(record))
+                self.count += 1
+            self._file.flush()
+
+    def close(self):
+        """写入文档结尾并关闭文件"""
+        with self._lock:
+            if self._file.closed:
+                return
+            if self.pretty_print:
+                self._file.write('\n  ]\n}' if self.count else ']\n}')
+            else:
+                self._file.write(']}')
+            self._file.close()
+
+class JournaledWriter:
+    """
+    为close时才完整的输出（JSON文档、Parquet/Arrow文件或分区数据集）提供崩溃安全
+
+    记录先逐批追加到日志文件<path>.partial.jsonl并落盘，write_many返回后进程即使被杀也不会丢失这些记录；
+    close时把日志中的记录写成完整的输出（单个文件先写入临时文件再替换），成功后删除日志。
+    上次运行中断留下的日志在下次打开时保留并继续追加，其中的记录在本次close时一并写出
+    """
+
+    def __init__(self, path: str, open_target: Callable[[str], Any],
+                 read_existing: Optional[Callable[[str], List[Dict[str, Any]]]] = None, append: bool = False,
+                 unique_key: Optional[str] = None):
+        """
+        Args:
+            path: 最终输出路径
+            open_target: 按路径创建最终输出器的函数
+            read_existing: 读取输出文件中已有记录的函数，为None时最终输出器直接写入path（如分区数据集每次新增文件）
+            append: 是否保留输出文件中已有的记录（读出后写在日志中的记录之前）
+            unique_key: 记录的唯一键字段，设置时同一键只保留最后写入的一条（已有记录被日志中的同键记录替换）
+        """
+        self.path = path
+        self.open_target = open_target
+        self.read_existing = read_existing
+        self.append = append
+        self.unique_key = unique_key
+        self.journal_path = path + JOURNAL_SUFFIX
+        recovered = 0
+        if os.path.exists(self.journal_path):
+            recovered = sum(len(batch) for batch in _read_journal(self.journal_path))
+            logger.info(f"发现上次运行未完成的输出日志，保留其中 {recovered} 条记录: {self.journal_path}")
+        self._journal = JsonlWriter(self.journal_path, append=True, sync=True)
+        self._journal.count = recovered
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def count(self) -> int:
+        """日志中的记录数（含上次运行中断时留下的记录）"""
+        return self._journal.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write_many(self, records: Iterable[Dict[str, Any]]):
+        """写入一批记录，返回时记录已落盘"""
+        self._journal.write_many(records)
+
+    def close(self):
+        """由日志生成完整的输出，成功后删除日志；失败时保留日志，下次运行时再写出"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._journal.close()
+            # 设置了唯一键时先记下每个键在日志中最后出现的位置
+            latest = _latest_positions(self.journal_path, self.unique_key) if self.unique_key else {}
+            target_path = self.path if self.read_existing is None else self.path + '.tmp'
+            with self.open_target(target_path) as target:
+                if self.append and self.read_existing is not None:
+                    existing = self.read_existing(self.path)
+                    if latest:
+                        existing = [record for record in existing if record.get(self.unique_key) not in latest]
+                    target.write_many(existing)
+                batches = (_unique_batches(self.journal_path, self.unique_key, latest) if latest
+                           else _read_journal(self.journal_path))
+                for batch in batches:
+                    target.write_many(batch)
+            if target_path != self.path:
+                os.replace(target_path, self.path)
+            os.remove(self.journal_path)
+
+def _to_datetime(value: Any) -> datetime:
+    """时间列取值转换为datetime：ISO格式字符串，或Unix时间戳（秒，整数或数字字符串，按本地时间）"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value)
+    text = str(value).strip()
+    try:
+        return datetime.fromtimestamp(float(text))
+    except ValueError:
+        return datetime.fromisoformat(text)
+
+def _coerce(value: Any, kind: str) -> Any:
+    """按列类型转换取值，无法转换时记录警告并返回None"""
+    if value is None or value == '':
+        return None
+    try:
+        if kind == 'timestamp':
+            return _to_datetime(value)
+        if kind == 'float':
+            return float(value)
+        if kind == 'int':
+            return int(value)
+    except (TypeError, ValueError, OverflowError, OSError) as e:
+        logger.warning(f"无法转换为{kind}类型，写入空值: {value!r} ({e})")
+        return None
+    return str(value)
+
+def _arrow_type(kind: str):
+    """列类型名称对应的Arrow类型"""
+    return {
+        'string': pa.string(),
+        'timestamp': pa.timestamp('us'),
+        'float': pa.float64(),
+        'int': pa.int64()
+    }[kind]
+
+class ColumnarWriter:
+    """
+    Parquet/Arrow列式输出器，按列类型写入带类型的列
+
+    记录先在内存中缓冲，每满row_group_size条写入一次；不分区时写入单个文件，
+    分区时以Hive风格目录（如date=2025-05-13/company=xxx/）写入数据集，每次运行新增文件、不覆盖已有数据。
+    单文件在close时才写入文件尾，需要崩溃安全时应使用open_writer(durable=True)
+    """
+
+    def __init__(self, path: str, columns: Sequence[Tuple[str, str]], output_format: str = 'parquet',
+                 partition_by: Optional[List[str]] = None, date_column: Optional[str] = None,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE, append: bool = False):
+        """
+        Args:
+            path: 输出文件路径，分区时为数据集根目录
+            columns: (列名, 类型)列表，类型为'string'/'timestamp'/'float'/'int'
+            output_format: 'parquet'或'arrow'
+            partition_by: 分区列名列表，列名'date'表示由date_column对应的时间取日期
+            date_column: 派生date分区列所使用的时间列
+            row_group_size: 每次写入的记录数
+            append: 是否保留已有单个文件中的数据（读出后重新写在开头），分区数据集总是新增文件
+
+        Raises:
+            ImportError: 未安装pyarrow
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("列式输出需要安装pyarrow: pip install pyarrow")
+
+        self.path = path
+        self.count = 0
+        self.output_format = output_format
+        self.partition_by = list(partition_by or [])
+        self.date_column = date_column
+        self.row_group_size = max(1, row_group_size)
+
+        self._kinds = dict(columns)
+        if 'date' in self.partition_by and 'date' not in self._kinds:
+            self._kinds['date'] = 'string'
+        self.schema = pa.schema([(name, _arrow_type(kind)) for name, kind in self._kinds.items()])
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._file_writer = None
+        self._token = uuid.uuid4().hex[:12]
+        self._flushes = 0
+        self._closed = False
+        if append and not self.partition_by and os.path.exists(path):
+            self._append_existing()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _row(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        row = {name: _coerce(record.get(name), kind) for name, kind in self._kinds.items() if name != 'date'}
+        if 'date' in self._kinds:
+            if 'date' in record:
+                row['date'] = _coerce(record['date'], 'string')
+            else:
+                moment = row.get(self.date_column)
+                row['date'] = moment.date().isoformat() if moment else None
+        return row
+
+    def _append_existing(self):
+        """读出已有文件的数据，作为新文件的第一批写入"""
+        try:
+            if self.output_format == 'arrow':
+                with pa.memory_map(self.path) as source:
+                    table = pa.ipc.open_file(source).read_all()
+            else:
+                table = pq.read_table(self.path)
+            table = table.select(self.schema.names).cast(self.schema)
+        except (pa.ArrowException, OSError, KeyError) as e:
+            # 上次运行中断时单个文件可能没有写入文件尾，此时无法读取
+            logger.warning(f"无法读取已有输出文件，将重新写入: {self.path} ({e})")
+            return
+        self._open_file_writer().write_table(table)
+
+    def _open_file_writer(self):
+        if self._file_writer is None:
+            if self.output_format == 'arrow':
+                self._file_writer = pa.ipc.new_file(self.path, self.schema)
+            else:
+                self._file_writer = pq.ParquetWriter(self.path, self.schema)
+        return self._file_writer
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        table = pa.Table.from_pylist(self._buffer, schema=self.schema)
+        self._buffer = []
+        if self.partition_by:
+            pa_dataset.write_dataset(
+                table, self.path,
+                format='ipc' if self.output_format == 'arrow' else 'parquet',
+                partitioning=self.partition_by,
+                partitioning_flavor='hive',
+                basename_template=f"part-{self._token}-{self._flushes}-{{i}}{OUTPUT_EXTENSIONS[self.output_format]}",
+                existing_data_behavior='overwrite_or_ignore'
+            )
+        else:
+            self._open_file_writer().write_table(table)
+        self._flushes += 1
+
+    def write_many(self, records: Iterable[Dict[str, Any]]):
+        """缓冲一批记录，满row_group_size条时写入"""
+        with self._lock:
+            for record in records:
+                self._buffer.append(self._row(record))
+                self.count += 1
+            if len(self._buffer) >= self.row_group_size:
+                self._flush()
+
+    def close(self):
+        """写入剩余记录并关闭文件"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._flush()
+            if not self.partition_by:
+                # 没有记录时也输出带表结构的空文件，便于下游统一读取
+                self._open_file_writer().close()
+
+def output_filename(filename: str, output_format: str) -> str:
+    """
+    按输出格式调整文件扩展名（如heimao_data.json -> heimao_data.parquet）
+
+    Args:
+        filename: 配置的文件名
+        output_format: 输出格式
+
+    Returns:
+        str: 调整后的文件名
+    """
+    stem, ext = os.path.splitext(filename)
+    if ext in OUTPUT_EXTENSIONS.values():
+        return stem + OUTPUT_EXTENSIONS.get(output_format, ext)
+    return filename
+
+def open_writer(output_format: str, path: str, key: str = 'records', pretty_print: bool = False,
+                columns: Optional[Sequence[Tuple[str, str]]] = None, append: bool = False,
+                metadata: Optional[Dict[str, Any]] = None, durable: bool = False, unique_key: Optional[str] = None,
+                **columnar_options):
+    """
+    根据输出格式创建流式输出器
+
+    durable为True时write_many返回即表示记录已落盘：jsonl直接写入并fsync，
+    json、parquet、arrow先写入日志文件，close时再生成完整输出（见JournaledWriter）
+
+    Args:
+        output_format: 输出格式，'json'、'jsonl'、'parquet'或'arrow'
+        path: 输出文件路径（分区的列式输出为数据集目录）
+        key: JSON文档中记录列表的键名（仅json格式使用）
+        pretty_print: 是否缩进输出（仅json格式使用）
+        columns: 列式输出的(列名, 类型)列表
+        append: 是否保留已有输出中的记录（如从检查点恢复时）
+        metadata: 写在记录列表之前的其他字段（仅json格式使用）
+        durable: 是否要求每批记录写入后即可在崩溃后恢复
+        unique_key: 记录的唯一键字段，jsonl和durable的json/parquet/arrow单文件输出中同一键只保留最后写入的一条
+        **columnar_options: 传给ColumnarWriter的其他参数（partition_by、date_column、row_group_size）
+
+    Returns:
+        JsonlWriter、JsonArrayWriter、ColumnarWriter或JournaledWriter
+
+    Raises:
+        ValueError: 不支持的输出格式
+        ImportError: 列式输出未安装pyarrow
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if output_format == 'jsonl':
+        return JsonlWriter(path, append, sync=durable, unique_key=unique_key)
+    if output_format in ('parquet', 'arrow'):
+        if not columns:
+            raise ValueError(f"{output_format}格式需要指定列定义")
+        if not PYARROW_AVAILABLE:
+            raise ImportError("列式输出需要安装pyarrow: pip install pyarrow")
+    if durable and output_format in OUTPUT_EXTENSIONS:
+        if output_format == 'json':
+            read_existing = lambda existing_path: _read_json_records(existing_path, key)
+        elif columnar_options.get('partition_by'):
+            read_existing = None
+        else:
+            read_existing = lambda existing_path: _read_columnar_records(existing_path, output_format)
+        return JournaledWriter(
+            path,
+            lambda target_path: open_writer(output_format, target_path, key, pretty_print, columns,
+                                            metadata=metadata, **columnar_options),
+            read_existing, append, unique_key
+        )
+    if output_format == 'json':
+        return JsonArrayWriter(path, key, pretty_print, append, metadata)
+    if output_format in ('parquet', 'arrow'):
+        return ColumnarWriter(path, columns, output_format, append=append, **columnar_options)
+    raise ValueError(f"不支持的输出格式: {output_format}")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+限速工具
+提供线程安全的令牌桶限速器、按响应情况自动调节速率的AIMD限速器，以及按主机共享限速器的注册表
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict
+from urllib.parse import urlparse
+
+logger = logging.getLogger('rate_limiter')
+
+class RateLimiter:
+    """令牌桶限速器（线程安全）"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        初始化限速器
+
+        Args:
+            rate: 每秒允许的请求数
+            burst: 令牌桶容量，即允许的瞬时突发请求数
+        """
+        if rate <= 0:
+            raise ValueError(f"限速速率必须大于0: {rate}")
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_sleep_range(cls, sleep_min: float, sleep_max: float, burst: int = 1) -> 'RateLimiter':
+        """
+        根据随机休眠区间创建限速器，平均请求间隔为区间中点
+
+        Args:
+            sleep_min: 最小休眠秒数
+            sleep_max: 最大休眠秒数
+            burst: 令牌桶容量
+
+        Returns:
+            RateLimiter: 限速器
+        """
+        interval = (float(sleep_min) + float(sleep_max)) / 2
+        if interval <= 0:
+            raise ValueError(f"休眠区间无效: {sleep_min}~{sleep_max}")
+        return cls(1.0 / interval, burst)
+
+    def _refill(self):
+        """按当前速率补充令牌（调用方需持有锁）"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _reserve(self, tokens: int = 1) -> float:
+        """
+        预占令牌并返回需要等待的秒数
+
+        令牌不足时允许余额为负，后续调用者会排在其后等待，从而保证整体速率
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def delay(self, tokens: int = 1) -> float:
+        """
+        现在获取令牌需要等待的秒数，不预占令牌
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            float: 等待秒数，令牌充足时为0
+        """
+        with self._lock:
+            self._refill()
+            missing = tokens - self._tokens
+            return missing / self.rate if missing > 0 else 0.0
+
+    def acquire(self, tokens: int = 1) -> float:
+        """
+        获取令牌，必要时阻塞等待
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: int = 1) -> float:
+        """
+        获取令牌的协程版本，等待期间让出事件循环
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    AIMD自适应限速器（线程安全）
+
+    每次正常响应后速率线性增加increase，遇到风控、登录页或请求错误时速率乘以decrease，
+    并让令牌桶欠下cooldown秒的额度，使所有共享该限速器的请求一起暂停，
+    从而在不被封禁的前提下逼近站点允许的最大吞吐量。
+    并发请求往往同时失败，一次降速后的冷却期内（至少一个请求间隔）不再重复降速
+    """
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float, increase: float = 0.05,
+                 decrease: float = 0.5, cooldown: float = 0.0, burst: int = 1):
+        """
+        初始化限速器
+
+        Args:
+            rate: 初始每秒请求数
+            min_rate: 速率下限
+            max_rate: 速率上限
+            increase: 每次正常响应增加的每秒请求数
+            decrease: 触发退避时速率乘以的系数（0~1）
+            cooldown: 触发退避后所有请求暂停的秒数
+            burst: 令牌桶容量
+        """
+        if not 0 < min_rate <= max_rate:
+            raise ValueError(f"速率区间无效: {min_rate}~{max_rate}")
+        if not 0 < decrease < 1:
+            raise ValueError(f"降速系数必须在0和1之间: {decrease}")
+        super().__init__(min(max(rate, min_rate), max_rate), burst)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase = float(increase)
+        self.decrease = float(decrease)
+        self.cooldown = float(cooldown)
+        self.successes = 0
+        self.backoffs = 0
+        self._hold_until = 0.0
+
+    def on_success(self) -> float:
+        """
+        记录一次正常响应，线性提速
+
+        Returns:
+            float: 调整后的速率
+        """
+        with self._lock:
+            self._refill()
+            self.successes += 1
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            return self.rate
+
+    def on_backoff(self, reason: str = '') -> float:
+        """
+        记录一次风控、登录页或错误，按比例降速并暂停
+
+        Args:
+            reason: 退避原因，用于日志
+
+        Returns:
+            float: 调整后的速率
+        """
+        with self._lock:
+            self._refill()
+            self.backoffs += 1
+            if self._last < self._hold_until:
+                return self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            if self.cooldown > 0:
+                self._tokens = min(self._tokens, 0.0) - self.cooldown * self.rate
+            self._hold_until = self._last + max(self.cooldown, 1.0 / self.rate)
+            rate = self.rate
+        logger.warning(f"触发退避（{reason or '未知原因'}），速率降至每秒 {rate:.3f} 个请求，暂停 {self.cooldown:.1f} 秒")
+        return rate
+
+# 按主机共享的限速器
+_host_limiters: Dict[str, RateLimiter] = {}
+_host_lock = threading.Lock()
+
+def get_host_limiter(url: str, rate: float, burst: int = 1) -> RateLimiter:
+    """
+    获取指定主机的限速器，同一主机的所有调用者共享同一个令牌桶
+
+    Args:
+        url: 请求URL或主机名
+        rate: 每秒允许的请求数（仅在首次创建时生效）
+        burst: 令牌桶容量（仅在首次创建时生效）
+
+    Returns:
+        RateLimiter: 该主机的限速器
+    """
+    host = urlparse(url).netloc or url
+    with _host_lock:
+        limiter = _host_limiters.get(host)
+        if limiter is None:
+            limiter = RateLimiter(rate, burst)
+            _host_limiters[host] = limiter
+        return limiter
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+记录索引工具
+基于SQLite的持久化记录索引，按主键记录内容指纹，用于跨运行去重和变更检测
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 单条IN查询的最大参数数量（低于SQLite默认的999上限）
+_QUERY_CHUNK_SIZE = 500
+
+class RecordIndex:
+    """持久化记录索引（主键 -> 内容指纹），支持百万级记录的快速查找"""
+
+    def __init__(self, path: str):
+        """
+        打开或创建索引数据库
+
+        Args:
+            path: SQLite数据库文件路径
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                first_seen TEXT,
+                last_seen TEXT
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def _select(self, keys: Iterable[str], columns: str) -> List[tuple]:
+        """按主键分批查询，返回(主键, 各列...)行"""
+        keys = list(dict.fromkeys(keys))
+        rows = []
+        with self._lock:
+            for i in range(0, len(keys), _QUERY_CHUNK_SIZE):
+                chunk = keys[i:i + _QUERY_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                rows.extend(self._conn.execute(
+                    f"SELECT key, {columns} FROM records WHERE key IN ({placeholders})", chunk
+                ))
+        return rows
+
+    def lookup(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        批量查询已记录的指纹
+
+        Args:
+            keys: 主键列表
+
+        Returns:
+            Dict: 已存在的主键 -> 指纹
+        """
+        return dict(self._select(keys, 'fingerprint'))
+
+    def lookup_seen(self, keys: Iterable[str]) -> Dict[str, Tuple[Optional[str], str]]:
+        """
+        批量查询已记录的指纹和最后一次记录的时间
+
+        Args:
+            keys: 主键列表
+
+        Returns:
+            Dict: 已存在的主键 -> (指纹, last_seen的ISO格式时间)
+        """
+        return {key: (fingerprint, last_seen) for key, fingerprint, last_seen in self._select(keys, 'fingerprint, last_seen')}
+
+    def keys(self) -> List[str]:
+        """所有已记录的主键"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT key FROM records")]
+
+    def remove(self, keys: Iterable[str]):
+        """
+        删除记录，并在同一事务中提交
+
+        Args:
+            keys: 主键列表
+        """
+        rows = [(key,) for key in keys]
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("DELETE FROM records WHERE key = ?", rows)
+
+    def classify(self, entries: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        判断每条记录是新增、变更还是未变化
+
+        Args:
+            entries: (主键, 指纹)列表
+
+        Returns:
+            Dict: 主键 -> 'new' / 'changed' / 'unchanged'
+        """
+        entries = list(entries)
+        known = self.lookup(key for key, _ in entries)
+        result = {}
+        for key, fingerprint in entries:
+            if key not in known:
+                result[key] = 'new'
+            elif known[key] != fingerprint:
+                result[key] = 'changed'
+            else:
+                result[key] = 'unchanged'
+        return result
+
+    def mark(self, entries: Iterable[Tuple[str, str]]):
+        """
+        写入或更新记录的指纹，并在同一事务中提交
+
+        Args:
+            entries: (主键, 指纹)列表
+        """
+        now = datetime.now().isoformat()
+        rows = [(key, fingerprint, now, now) for key, fingerprint in entries]
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    """
+                    INSERT INTO records (key, fingerprint, first_seen, last_seen)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        fingerprint = excluded.fingerprint,
+                        last_seen = excluded.last_seen
+                    """,
+                    rows
+                )
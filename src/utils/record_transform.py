@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+记录批量格式化工具
+将接口返回的一批原始记录按字段定义一次性转换为输出记录：文本清洗、时间戳转换、URL补全和ID提取均按列处理
+"""
+
+import re
+import logging
+from itertools import repeat
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger('record_transform')
+
+# 字段来源为该值时填入本批的爬取时间
+CRAWLED_AT = '@crawled_at'
+
+# 默认从URL中提取ID的模式（如 //tousu.sina.com.cn/complaint/view/17382167486/）
+DEFAULT_ID_PATTERN = r'/view/(\d+)/'
+
+def _extract_column(items: List[Any], path: Tuple[str, ...], cache: Dict[Tuple[str, ...], List[Any]]) -> List[Any]:
+    """
+    按键路径取出一列值，中间层不是字典时取None
+
+    同一批中各路径共用的上层（如main）只取一次，保存在cache中
+    """
+    if not path:
+        return items
+    if path not in cache:
+        parents = _extract_column(items, path[:-1], cache)
+        key = path[-1]
+        # 上层全部是字典时（通常如此）使用C层面的map取值，每个上层只检查一次
+        check_key = ('@all_dicts',) + path[:-1]
+        if check_key not in cache:
+            cache[check_key] = all(type(parent) is dict for parent in parents)
+        if cache[check_key]:
+            cache[path] = list(map(dict.get, parents, repeat(key)))
+        else:
+            cache[path] = [parent.get(key) if isinstance(parent, dict) else None for parent in parents]
+    return cache[path]
+
+def format_timestamp(value: Any) -> Any:
+    """
+    将Unix时间戳（秒）转换为本地时间的ISO格式字符串
+
+    Args:
+        value: 时间戳，可以是整数或数字字符串
+
+    Returns:
+        转换后的字符串；为空时返回None；无法转换时原样返回
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromtimestamp(int(value)).isoformat()
+    except (ValueError, TypeError, OverflowError, OSError):
+        return value
+
+def format_timestamps(values: Sequence[Any]) -> List[Any]:
+    """逐个转换时间戳（纯Python实现）"""
+    return [format_timestamp(value) for value in values]
+
+class RecordTransform:
+    """按字段定义批量格式化记录，可供各爬虫复用"""
+
+    def __init__(self, fields: Sequence[Tuple[str, str]], text_fields: Iterable[str] = (),
+                 timestamp_fields: Iterable[str] = (), url_fields: Iterable[str] = (),
+                 id_field: Optional[str] = None, id_url_field: Optional[str] = None,
+                 id_pattern: str = DEFAULT_ID_PATTERN, normalize: Optional[Callable[[Any], Any]] = None):
+        """
+        Args:
+            fields: (输出字段, 来源键路径)列表，决定输出字段及顺序；路径以点分隔（如'main.title'），
+                    为CRAWLED_AT时填入爬取时间
+            text_fields: 需要清洗的输出字段
+            timestamp_fields: 需要由Unix时间戳转换为ISO时间的输出字段
+            url_fields: 需要补全协议（//开头补为https:）的输出字段
+            id_field: ID字段，为空时尝试从id_url_field对应的URL中提取
+            id_url_field: 提取ID所用的URL字段，为None时不提取
+            id_pattern: 从URL提取ID的正则表达式，第一个分组为ID
+            normalize: 文本清洗函数，为None时不清洗
+        """
+        self.fields = [(name, tuple(source.split('.')) if source != CRAWLED_AT else None) for name, source in fields]
+        self.text_fields = set(text_fields)
+        self.timestamp_fields = set(timestamp_fields)
+        self.url_fields = set(url_fields)
+        self.id_field = id_field
+        self.id_url_field = id_url_field
+        self.id_pattern = re.compile(id_pattern)
+        self.normalize = normalize
+        self.names = [name for name, _ in self.fields]
+
+    def __call__(self, items: Sequence[Dict[str, Any]], crawled_at: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.transform(items, crawled_at)
+
+    def transform(self, items: Sequence[Dict[str, Any]], crawled_at: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        格式化一批记录，整批出错时退回逐条处理并跳过出错的记录
+
+        Args:
+            items: 原始记录列表
+            crawled_at: 爬取时间（ISO格式），为None时取当前时间，整批共用
+
+        Returns:
+            List[Dict]: 格式化后的记录
+        """
+        items = list(items)
+        if not items:
+            return []
+        crawled_at = crawled_at or datetime.now().isoformat()
+        try:
+            return self._transform(items, crawled_at)
+        except Exception as e:
+            logger.warning(f"批量格式化失败，改为逐条处理: {e}")
+
+        records = []
+        for item in items:
+            try:
+                records.extend(self._transform([item], crawled_at))
+            except Exception as e:
+                logger.exception(f"处理数据项时出错: {e}")
+                logger.error(f"问题数据: {item}")
+        return records
+
+    def _transform(self, items: List[Dict[str, Any]], crawled_at: str) -> List[Dict[str, Any]]:
+        columns = {}
+        cache = {}
+        for name, path in self.fields:
+            if path is None:
+                columns[name] = [crawled_at] * len(items)
+                continue
+            column = _extract_column(items, path, cache)
+            if name in self.url_fields:
+                column = self._complete_urls(column)
+            elif name in self.timestamp_fields:
+                column = format_timestamps(column)
+            elif name in self.text_fields and self.normalize:
+                column = [self.normalize(value or '') for value in column]
+            columns[name] = column
+
+        if self.id_field and self.id_url_field:
+            columns[self.id_field] = self._fill_ids(columns[self.id_field], columns[self.id_url_field])
+
+        rows = zip(*(columns[name] for name in self.names))
+        return list(map(dict, map(zip, repeat(self.names), rows)))
+
+    def _complete_urls(self, urls: List[Any]) -> List[str]:
+        return ["https:" + url if url.startswith("//") else url for url in (url or '' for url in urls)]
+
+    def _fill_ids(self, ids: List[Any], urls: List[str]) -> List[Any]:
+        if all(ids):
+            return ids
+        filled = []
+        for item_id, url in zip(ids, urls):
+            if not item_id and url:
+                match = self.id_pattern.search(url)
+                if match:
+                    item_id = match.group(1)
+            filled.append(item_id)
+        return filled
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+重试工具
+根据scraping.retry配置以带随机抖动的指数退避重试请求，并区分可重试的临时错误和无需重试的致命错误
+"""
+
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger('retry')
+
+# 可重试的HTTP状态码（超时、限流及服务端临时错误）
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+class RetryableError(Exception):
+    """调用方主动标记为可重试的错误（如响应内容为空或无法解析）"""
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    判断异常是否为可重试的临时错误
+
+    连接失败、超时、响应中断以及RETRYABLE_STATUS_CODES中的HTTP状态视为可重试；
+    其他HTTP状态（如403、404）和程序错误（如KeyError、TypeError）视为致命错误
+
+    Args:
+        error: 捕获的异常
+
+    Returns:
+        bool: 是否可重试
+    """
+    if isinstance(error, RetryableError):
+        return True
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is not None and response.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return True
+    if httpx is not None:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRYABLE_STATUS_CODES
+        if isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)):
+            return True
+    # 其他套接字层面的错误（如连接被重置）
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+class RetryPolicy:
+    """带随机抖动的指数退避重试策略"""
+
+    def __init__(self, max_attempts: int = 3, delay: float = 1.0, max_delay: float = 60.0,
+                 multiplier: float = 2.0, jitter: bool = True,
+                 retryable: Callable[[BaseException], bool] = is_retryable_error):
+        """
+        Args:
+            max_attempts: 最大尝试次数（含首次请求）
+            delay: 首次重试前的基础等待秒数
+            max_delay: 单次等待的上限秒数
+            multiplier: 每次重试等待时间的增长倍数
+            jitter: 是否在[0, 退避时间]内随机取等待时间，避免多个请求同时重试
+            retryable: 判断异常是否可重试的函数
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.delay = max(0.0, float(delay))
+        self.max_delay = max(self.delay, float(max_delay))
+        self.multiplier = max(1.0, float(multiplier))
+        self.jitter = jitter
+        self.retryable = retryable
+
+    @classmethod
+    def from_config(cls, retry_config: Optional[Dict[str, Any]] = None) -> 'RetryPolicy':
+        """
+        根据scraping.retry配置创建重试策略
+
+        Args:
+            retry_config: 包含max_attempts、delay、max_delay、multiplier、jitter的配置字典
+
+        Returns:
+            RetryPolicy: 重试策略
+        """
+        retry_config = retry_config or {}
+        return cls(
+            max_attempts=retry_config.get('max_attempts', 3),
+            delay=retry_config.get('delay', 1.0),
+            max_delay=retry_config.get('max_delay', 60.0),
+            multiplier=retry_config.get('multiplier', 2.0),
+            jitter=retry_config.get('jitter', True)
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """
+        计算第attempt次尝试失败后的等待秒数
+
+        Args:
+            attempt: 已失败的尝试次数（从1开始）
+
+        Returns:
+            float: 等待秒数
+        """
+        ceiling = min(self.max_delay, self.delay * self.multiplier ** (attempt - 1))
+        return random.uniform(0, ceiling) if self.jitter else ceiling
+
+    def should_retry(self, error: BaseException, attempt: int) -> bool:
+        """第attempt次尝试因error失败后是否应重试"""
+        return attempt < self.max_attempts and self.retryable(error)
+
+    def call(self, func: Callable[..., Any], *args, description: str = '', **kwargs) -> Any:
+        """
+        调用func，遇到可重试的错误时等待后重试
+
+        Args:
+            func: 要调用的函数
+            description: 日志中的操作描述
+            *args, **kwargs: 传给func的参数
+
+        Returns:
+            func的返回值
+
+        Raises:
+            致命错误或重试次数用尽后的最后一个异常
+        """
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                wait = self.backoff(attempt)
+                logger.warning(f"{description or '请求'}失败: {e}，{wait:.2f}秒后第{attempt + 1}次尝试")
+                time.sleep(wait)
+                attempt += 1
+
+    async def call_async(self, func: Callable[..., Any], *args, description: str = '', **kwargs) -> Any:
+        """call的协程版本，func应返回可等待对象，等待期间让出事件循环"""
+        attempt = 1
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                wait = self.backoff(attempt)
+                logger.warning(f"{description or '请求'}失败: {e}，{wait:.2f}秒后第{attempt + 1}次尝试")
+                await asyncio.sleep(wait)
+                attempt += 1
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+文本清洗工具
+使用预编译的正则表达式移除HTML标签、解码HTML实体并整理空白字符，供各爬虫格式化文本字段时共用
+"""
+
+import re
+import html
+from typing import Any, Dict, Optional
+
+# HTML标签
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# 换行以外的连续空白或非普通空格的空白字符（含全角空格、不换行空格）
+INLINE_SPACE_PATTERN = re.compile(r'[^\S\n]{2,}|[^\S\n ]')
+
+# 换行前后的空白及连续空行
+LINE_BREAK_PATTERN = re.compile(r' ?\n\s*')
+
+# 不可见的控制字符和零宽字符
+CONTROL_CHAR_PATTERN = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\u200b-\u200d\ufeff]')
+
+def strip_tags(text: Optional[str]) -> str:
+    """移除HTML标签"""
+    if not text:
+        return ""
+    if '<' not in text:
+        return text
+    return TAG_PATTERN.sub('', text)
+
+class TextNormalizer:
+    """文本清洗器，按配置依次执行：移除标签、解码实体、清理空白"""
+
+    def __init__(self, remove_tags: bool = True, decode_entities: bool = True, clean_whitespace: bool = True):
+        """
+        Args:
+            remove_tags: 是否移除HTML标签
+            decode_entities: 是否解码HTML实体（如&amp;、&nbsp;、&#39;）
+            clean_whitespace: 是否移除控制字符、合并连续空白并去除首尾空白
+        """
+        self.remove_tags = remove_tags
+        self.decode_entities = decode_entities
+        self.clean_whitespace = clean_whitespace
+
+    @classmethod
+    def from_processing_config(cls, processing: Optional[Dict[str, Any]] = None) -> 'TextNormalizer':
+        """
+        根据站点配置的processing节创建清洗器
+
+        remove_html_tags控制移除标签，clean_text控制实体解码和空白清理，未配置时均启用
+
+        Args:
+            processing: processing配置字典
+
+        Returns:
+            TextNormalizer: 文本清洗器
+        """
+        processing = processing or {}
+        clean_text = processing.get('clean_text', True)
+        return cls(
+            remove_tags=processing.get('remove_html_tags', True),
+            decode_entities=clean_text,
+            clean_whitespace=clean_text
+        )
+
+    def __call__(self, text: Optional[str]) -> str:
+        return self.normalize(text)
+
+    def normalize(self, text: Optional[str]) -> str:
+        """
+        清洗单个文本，不含相应字符时跳过对应的正则替换
+
+        Args:
+            text: 原始文本，None视为空字符串
+
+        Returns:
+            str: 清洗后的文本
+        """
+        if not text:
+            return ""
+        if not isinstance(text, str):
+            text = str(text)
+        if self.remove_tags and '<' in text:
+            text = TAG_PATTERN.sub('', text)
+        if self.decode_entities and '&' in text:
+            text = html.unescape(text)
+        if self.clean_whitespace:
+            # 除普通空格外的空白、控制字符和零宽字符都不是"可打印"字符，
+            # 大多数文本经isprintable和连续空格检查即可确认无需处理
+            if not text.isprintable() or '  ' in text:
+                text = CONTROL_CHAR_PATTERN.sub('', text)
+                text = INLINE_SPACE_PATTERN.sub(' ', text)
+                if '\n' in text:
+                    text = LINE_BREAK_PATTERN.sub('\n', text)
+            text = text.strip()
+        return text
@@ -0,0 +1,44 @@
+"""
+测试公共设置：把src和benchmarks加入导入路径，并提供本地回放服务和黑猫投诉站点配置
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fixture_server import FixtureServer
+
+@pytest.fixture
+def fixture_server():
+    """合成黑猫投诉搜索页的本地回放服务（每个关键词50页，每页10条）"""
+    with FixtureServer(synthetic=True, seed=1) as server:
+        yield server
+
+@pytest.fixture
+def heimao_config(tmp_path, fixture_server):
+    """
+    指向本地回放服务的黑猫投诉站点配置：默认搜索最多5页，启用跨运行去重和分页游标检查点，
+    状态文件都在临时目录下；限速放宽到不影响测试耗时
+    """
+    status_dir = tmp_path / "status"
+    return {
+        'site_info': {'base_url': fixture_server.url},
+        'scraping': {
+            'targets': [{'type': 'latest'}],
+            'api': {'page_size': 10, 'max_pages': 5, 'base_url': f"{fixture_server.url}/api/index/s"},
+            'concurrency': {'keyword_workers': 1, 'page_workers': 1, 'host_rps': 1000, 'burst': 10},
+            'retry': {
+                'max_attempts': 3,
+                'delay': 0,
+                'jitter': False,
+                'checkpoint_file': str(status_dir / "cursor.json")
+            }
+        },
+        'processing': {'dedup': {'persistent': True, 'index_path': str(status_dir / "sn_index.sqlite3")}},
+        'output': {'format': 'json', 'filename': 'heimao_data.json', 'pretty_print': True}
+    }
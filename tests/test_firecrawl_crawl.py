@@ -0,0 +1,51 @@
+"""
+多目标爬取：轮询进行中的任务时按skip/next只下载新完成的页面，每个页面只取一次
+"""
+
+import json
+
+from fixture_server import FixtureServer, FixtureStore, fixture_key
+from scrapers.firecrawl_integration import FirecrawlScraper
+
+JOB_ID = 'job1'
+
+def document(i):
+    url = f"https://example.com/page/{i}"
+    return {'markdown': f"# {url}", 'metadata': {'sourceURL': url, 'statusCode': 200}}
+
+def status(state, pages, next_url=None):
+    body = {'success': True, 'status': state, 'total': 5, 'completed': 5 if state == 'completed' else 2,
+            'data': [document(i) for i in pages]}
+    if next_url:
+        body['next'] = next_url
+    return body
+
+def test_crawl_polls_only_new_pages(tmp_path, monkeypatch):
+    store = FixtureStore(str(tmp_path / 'fixtures.jsonl'))
+    with FixtureServer(store) as server:
+        responses = [
+            ('skip=0', status('scraping', [0, 1])),
+            ('skip=2', status('scraping', [])),
+            # 任务结束时一次返回不完，其余页面按next翻页
+            ('skip=2', status('completed', [2], f"{server.url}/v1/crawl/{JOB_ID}?skip=3")),
+            ('skip=3', status('completed', [3, 4])),
+        ]
+        for query, body in responses:
+            store.record({'key': fixture_key('GET', f'/v1/crawl/{JOB_ID}?{query}'), 'status': 200,
+                          'headers': {'Content-Type': 'application/json'}, 'body': json.dumps(body)})
+
+        monkeypatch.setenv('FIRECRAWL_API_URL', server.url)
+        config = {'site': {'name': 'test', 'base_url': 'https://example.com/'},
+                  'scraping': {'crawl': {'poll_interval': 0, 'timeout': 30}}}
+        scraper = FirecrawlScraper('test', api_key='test', config=config, output_dir=str(tmp_path / 'out'))
+        monkeypatch.setattr(scraper.app, 'async_crawl_url', lambda url, **params: {'success': True, 'id': JOB_ID})
+        results = scraper._crawl_targets(['https://example.com/'], {})
+
+        assert server.stats['replayed'] == len(responses)
+        assert server.stats['missing'] == 0
+
+    assert results['jobs'][0]['status'] == 'completed'
+    assert results['jobs'][0]['pages'] == results['total'] == 5
+    with open(results['output_file'], 'r', encoding='utf-8') as f:
+        urls = [page['metadata']['sourceURL'] for page in json.load(f)['data']]
+    assert urls == [f"https://example.com/page/{i}" for i in range(5)]
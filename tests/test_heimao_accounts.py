@@ -0,0 +1,51 @@
+"""
+账号池的健康记录：只有真正的登录页使账号失效，服务端错误只暂时隔离账号
+"""
+
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+from fixture_server import FixtureServer
+from scrapers.heimao_accounts import Account, AccountPool
+from scrapers.heimao_async import AsyncHeimaoClient
+from scrapers.heimao_client import HeimaoClient, classify_error, is_login_page
+
+def test_server_errors_quarantine_accounts_instead_of_invalidating_them():
+    with FixtureServer(synthetic=True, error_rate=1.0, error_status=503, seed=1) as server:
+        accounts = [Account(f"account{i}", HeimaoClient(cookie=f"cookie{i}", base_url=server.url)) for i in range(2)]
+        with AccountPool(accounts, quarantine=600, max_failures=1) as pool:
+            for _ in range(2):
+                with pytest.raises(requests.HTTPError):
+                    pool.search_page('', 1, 10)
+            stats = pool.stats()
+
+    assert [account['status'] for account in stats] == ['quarantined', 'quarantined']
+    assert [account['errors'] for account in stats] == [1, 1]
+    assert not any(account.invalid for account in accounts)
+
+@pytest.mark.parametrize('status, signal', [(403, 'risk_control'), (429, 'risk_control'), (502, 'server_error'),
+                                            (404, 'error')])
+def test_classify_error_by_status(status, signal):
+    response = httpx.Response(status, request=httpx.Request('GET', 'http://heimao.test/api/index/s'))
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        response.raise_for_status()
+    assert classify_error(error.value) == signal
+
+def test_login_page_detection_ignores_json_and_error_pages():
+    assert is_login_page('<!DOCTYPE html><html><title>新浪通行证 - 登录</title></html>')
+    assert not is_login_page('{"result": {"data": {"lists": [{"main": {"title": "无法登录微博"}}]}}}')
+    assert not is_login_page('<!doctype html><html><title>502 Bad Gateway</title></html>')
+
+def test_async_client_treats_redirect_to_passport_as_login_required():
+    def handler(request):
+        return httpx.Response(302, headers={'location': 'https://passport.weibo.com/visitor/visitor?entry=sinawap'})
+
+    async def run():
+        async with AsyncHeimaoClient(cookie='expired', base_url='http://heimao.test',
+                                     transport=httpx.MockTransport(handler)) as client:
+            return await client.search_page('', 1, 10)
+
+    assert asyncio.run(run()) == {'status': 'login_required'}
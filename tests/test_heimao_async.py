@@ -0,0 +1,108 @@
+"""
+异步引擎：对本地仿真的/api/index/s按关键词×分页并发请求，出错的页按重试策略重试，输出与同步引擎一致
+"""
+
+import asyncio
+import collections
+import copy
+import json
+import threading
+
+import httpx
+
+from fixture_server import synthetic_search_page
+from scrapers.heimao_async import create_async_client, scrape_heimao_async
+from scrapers.heimao_scraper import scrape_heimao
+
+KEYWORDS = ['退款', '客服']
+
+def keyword_config(config, tmp_path, name):
+    """两个关键词、各自独立状态文件的配置"""
+    config = copy.deepcopy(config)
+    config['scraping']['targets'] = [{'type': 'keyword', 'keywords': KEYWORDS}]
+    config['scraping']['concurrency'].update({'page_workers': 5, 'max_in_flight': 8})
+    config['scraping']['retry']['checkpoint_file'] = str(tmp_path / name / 'cursor.json')
+    config['processing']['dedup']['index_path'] = str(tmp_path / name / 'sn_index.sqlite3')
+    return config
+
+def load_complaints(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        complaints = json.load(f)['complaints']
+    for complaint in complaints:
+        del complaint['crawled_at']
+    return sorted(complaints, key=lambda complaint: complaint['id'])
+
+def test_async_engine_fans_out_retries_and_matches_sync_output(tmp_path, heimao_config, fixture_server):
+    requests_seen = collections.Counter()
+
+    def handler(request):
+        keyword, page = request.url.params['keywords'], int(request.url.params['page'])
+        requests_seen[(keyword, page)] += 1
+        # 每页第一次请求返回503，重试后返回与回放服务相同的合成数据
+        if requests_seen[(keyword, page)] == 1:
+            return httpx.Response(503, text='<!doctype html><title>503 Service Unavailable</title>')
+        return httpx.Response(200, json=synthetic_search_page(keyword, page, int(request.url.params['page_size']),
+                                                              base_url=fixture_server.url))
+
+    async_config = keyword_config(heimao_config, tmp_path, 'async')
+
+    async def run_async():
+        client = create_async_client(async_config, transport=httpx.MockTransport(handler))
+        try:
+            return await scrape_heimao_async(async_config, str(tmp_path / 'async' / 'out'), client)
+        finally:
+            await client.aclose()
+
+    async_result = asyncio.run(run_async())
+    sync_result = scrape_heimao(keyword_config(heimao_config, tmp_path, 'sync'), str(tmp_path / 'sync' / 'out'))
+
+    # 每个关键词请求第1~5页（max_pages），每页失败一次后重试成功
+    assert set(requests_seen) == {(keyword, page) for keyword in KEYWORDS for page in range(1, 6)}
+    assert set(requests_seen.values()) == {2}
+    assert [(stat['keyword'], stat['status'], stat['pages_fetched']) for stat in async_result['keywords']] == \
+        [(keyword, 'success', 5) for keyword in KEYWORDS]
+
+    assert async_result['count'] == sync_result['count'] == 100
+    assert load_complaints(async_result['output_path']) == load_complaints(sync_result['output_path'])
+
+def test_async_engine_keeps_disk_io_off_the_event_loop(tmp_path, heimao_config, fixture_server, monkeypatch):
+    from scrapers.heimao_scraper import ComplaintSink
+    from utils.http_cache import ResponseCache, open_response_cache
+
+    calls = collections.defaultdict(set)
+
+    def record_thread(cls, name):
+        original = getattr(cls, name)
+
+        def wrapper(self, *args, **kwargs):
+            calls[name].add(threading.current_thread() is threading.main_thread())
+            return original(self, *args, **kwargs)
+        monkeypatch.setattr(cls, name, wrapper)
+
+    record_thread(ComplaintSink, 'write_page')
+    record_thread(ResponseCache, 'get')
+    record_thread(ResponseCache, 'store')
+
+    def handler(request):
+        return httpx.Response(200, json=synthetic_search_page(request.url.params['keywords'],
+                                                              int(request.url.params['page']),
+                                                              base_url=fixture_server.url))
+
+    config = keyword_config(heimao_config, tmp_path, 'async')
+    config['scraping']['http_cache'] = {'enable': True, 'path': str(tmp_path / 'cache.sqlite3')}
+
+    cache = open_response_cache(config)
+
+    async def run():
+        client = create_async_client(config, transport=httpx.MockTransport(handler), cache=cache)
+        try:
+            return await scrape_heimao_async(config, str(tmp_path / 'out'), client)
+        finally:
+            await client.aclose()
+            cache.close()
+
+    # asyncio.run在主线程中运行事件循环，磁盘读写应全部在其他线程中进行
+    result = asyncio.run(run())
+
+    assert result['count'] == 100
+    assert calls == {'write_page': {False}, 'get': {False}, 'store': {False}}
@@ -0,0 +1,41 @@
+"""
+列式输出：未转换时间戳（convert_timestamp: false）时，原始Unix时间戳按本地时间写入timestamp列，并能按日期分区
+"""
+
+import copy
+from datetime import datetime
+
+import pytest
+
+from fixture_server import SYNTHETIC_EPOCH
+from utils.output_writers import PYARROW_AVAILABLE
+from scrapers.heimao_scraper import scrape_heimao
+
+pytestmark = pytest.mark.skipif(not PYARROW_AVAILABLE, reason="需要pyarrow")
+
+def parquet_config(config, partition_by):
+    config = copy.deepcopy(config)
+    config['scraping']['api']['max_pages'] = 1
+    config['processing']['convert_timestamp'] = False
+    config['output'] = {'format': 'parquet', 'filename': 'heimao_data.parquet',
+                        'columnar': {'partition_by': partition_by}}
+    return config
+
+def test_parquet_keeps_raw_epoch_timestamps(tmp_path, heimao_config):
+    import pyarrow.parquet as pq
+
+    result = scrape_heimao(parquet_config(heimao_config, []), str(tmp_path / 'out'))
+
+    rows = pq.read_table(result['output_path']).to_pylist()
+    assert len(rows) == 10
+    assert rows[0]['timestamp'] == datetime.fromtimestamp(SYNTHETIC_EPOCH)
+    assert all(row['timestamp'] is not None for row in rows)
+
+def test_parquet_partitioned_by_date_from_raw_epoch(tmp_path, heimao_config):
+    import pyarrow.dataset as ds
+
+    result = scrape_heimao(parquet_config(heimao_config, ['date']), str(tmp_path / 'out'))
+
+    table = ds.dataset(result['output_path'], format='parquet', partitioning='hive').to_table()
+    assert table.num_rows == 10
+    assert set(table.column('date').to_pylist()) == {datetime.fromtimestamp(SYNTHETIC_EPOCH).date().isoformat()}
@@ -0,0 +1,48 @@
+"""
+详情页：响应头未声明charset时按UTF-8解码，避免中文乱码
+"""
+
+import json
+
+import pytest
+
+from fixture_server import FixtureServer, FixtureStore, fixture_key, synthetic_detail_page
+from scrapers.heimao_detail import DetailFetcher
+from scrapers.heimao_scraper import scrape_heimao
+from utils.output_writers import open_writer
+
+SN = '17900000001'
+
+@pytest.mark.parametrize('content_type', ['text/html', 'text/html; charset=utf-8'])
+def test_detail_page_decoded_as_utf8(tmp_path, content_type):
+    path = tmp_path / 'fixtures.jsonl'
+    fixture = {'key': fixture_key('GET', f'/complaint/view/{SN}/'), 'status': 200,
+               'headers': {'Content-Type': content_type}, 'body': synthetic_detail_page(SN)}
+    path.write_text(json.dumps(fixture, ensure_ascii=False) + '\n', encoding='utf-8')
+
+    with FixtureServer(FixtureStore(str(path))) as server:
+        fetcher = DetailFetcher(open_writer('jsonl', str(tmp_path / 'details.jsonl')), workers=1)
+        try:
+            _, detail, html = fetcher._request(f'{server.url}/complaint/view/{SN}/', {})
+        finally:
+            fetcher.close()
+
+    assert f'投诉 {SN}' in html
+    assert '商品质量问题' in json.dumps(detail, ensure_ascii=False)
+
+def test_same_day_rerun_does_not_refetch_details_without_index_or_cache(tmp_path, heimao_config):
+    config = heimao_config
+    config['scraping']['api']['max_pages'] = 1
+    config['scraping']['detail'] = {'enable': True, 'workers': 2, 'rps': 1000}
+    config['processing']['dedup']['persistent'] = False
+    output_dir = str(tmp_path / 'out')
+
+    first = scrape_heimao(config, output_dir)
+    second = scrape_heimao(config, output_dir)
+
+    assert first['details']['fetched'] == 10
+    assert second['details']['fetched'] == 0
+    assert second['details']['unchanged'] == 10
+    with open(tmp_path / 'out' / 'heimao_details.jsonl', 'r', encoding='utf-8') as f:
+        details = [json.loads(line) for line in f]
+    assert len(details) == len({detail['sn'] for detail in details}) == 10
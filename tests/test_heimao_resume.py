@@ -0,0 +1,70 @@
+"""
+黑猫投诉爬虫中断恢复：运行被杀死后从分页游标检查点继续，已写入的投诉不丢失、不重复
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+from scrapers.heimao_scraper import scrape_heimao
+
+# 在子进程中运行爬虫，请求到指定页时直接结束进程（不执行任何清理），模拟运行被杀死
+KILL_SCRIPT = """
+import json, os, sys
+sys.path.insert(0, sys.argv[1])
+from scrapers.heimao_client import HeimaoClient
+from scrapers.heimao_scraper import scrape_heimao
+
+config, output_dir, kill_page = json.loads(sys.argv[2]), sys.argv[3], int(sys.argv[4])
+search_page = HeimaoClient.search_page
+
+def search_page_or_die(self, keyword='', page=1, page_size=10):
+    if page == kill_page:
+        os._exit(17)
+    return search_page(self, keyword, page, page_size)
+
+HeimaoClient.search_page = search_page_or_die
+scrape_heimao(config, output_dir)
+"""
+
+def run_until_killed(config, output_dir, kill_page):
+    process = subprocess.run(
+        [sys.executable, '-c', KILL_SCRIPT, str(ROOT / 'src'), json.dumps(config), str(output_dir), str(kill_page)],
+        capture_output=True, text=True, timeout=60
+    )
+    assert process.returncode == 17, process.stderr
+
+def load_complaints(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['complaints']
+
+def test_resume_after_kill_keeps_pages_written_before_the_kill(tmp_path, heimao_config):
+    output_dir = tmp_path / 'out'
+    run_until_killed(heimao_config, output_dir, kill_page=3)
+
+    # 第1、2页已落盘到日志文件，检查点停在第3页
+    journal = output_dir / 'heimao_data.json.partial.jsonl'
+    with open(journal, 'r', encoding='utf-8') as f:
+        assert len(f.readlines()) == 20
+    with open(heimao_config['scraping']['retry']['checkpoint_file'], 'r', encoding='utf-8') as f:
+        assert json.load(f)['__latest__']['page'] == 3
+
+    result = scrape_heimao(heimao_config, str(output_dir))
+
+    complaints = load_complaints(result['output_path'])
+    ids = [complaint['id'] for complaint in complaints]
+    assert len(ids) == 50
+    assert len(set(ids)) == 50
+    assert result['count'] == 50
+    assert not journal.exists()
+
+def test_kill_before_first_page_then_resume_from_scratch(tmp_path, heimao_config):
+    output_dir = tmp_path / 'out'
+    run_until_killed(heimao_config, output_dir, kill_page=1)
+
+    result = scrape_heimao(heimao_config, str(output_dir))
+
+    assert len(load_complaints(result['output_path'])) == 50
+    assert not os.path.exists(str(output_dir / 'heimao_data.json.partial.jsonl'))
@@ -0,0 +1,40 @@
+"""
+同一天多次运行：当天的输出文件合并各次运行的投诉，不会被后一次运行截断
+"""
+
+import json
+
+import pytest
+
+from scrapers.heimao_scraper import scrape_heimao
+
+def load_ids(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(line)['id'] for line in f]
+        return [complaint['id'] for complaint in json.load(f)['complaints']]
+
+def test_second_run_with_persistent_index_keeps_the_days_complaints(tmp_path, heimao_config):
+    heimao_config['scraping']['incremental'] = {'enable': True, 'state_file': str(tmp_path / 'status' / 'wm.json')}
+    output_dir = str(tmp_path / 'out')
+
+    first = scrape_heimao(heimao_config, output_dir)
+    second = scrape_heimao(heimao_config, output_dir)
+
+    assert first['count'] == 50
+    # 第二次运行的投诉全部已在索引中，不再写入，但当天的文件保留第一次的结果
+    assert second['count'] == 0
+    assert len(load_ids(second['output_path'])) == 50
+
+@pytest.mark.parametrize('output_format', ['json', 'jsonl'])
+def test_second_run_without_index_does_not_duplicate_complaints(tmp_path, heimao_config, output_format):
+    del heimao_config['processing']['dedup']
+    heimao_config['output'].update({'format': output_format, 'filename': f'heimao_data.{output_format}'})
+    output_dir = str(tmp_path / 'out')
+
+    scrape_heimao(heimao_config, output_dir)
+    result = scrape_heimao(heimao_config, output_dir)
+
+    ids = load_ids(result['output_path'])
+    assert len(ids) == 50
+    assert len(set(ids)) == 50
@@ -0,0 +1,63 @@
+"""
+流式输出器：durable输出在close之前被中断时记录不丢失
+"""
+
+import json
+
+import pytest
+
+from utils.output_writers import JOURNAL_SUFFIX, PYARROW_AVAILABLE, _read_json_records, open_writer
+
+def test_durable_json_recovers_records_from_an_unclosed_run(tmp_path):
+    path = str(tmp_path / 'data.json')
+    writer = open_writer('json', path, key='items', durable=True)
+    writer.write_many([{'id': 1}, {'id': 2}])
+    # 不调用close，模拟进程被杀死：日志文件中已有记录
+
+    with open_writer('json', path, key='items', durable=True) as resumed:
+        assert resumed.count == 2
+        resumed.write_many([{'id': 3}])
+
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == {'items': [{'id': 1}, {'id': 2}, {'id': 3}]}
+    assert not (tmp_path / ('data.json' + JOURNAL_SUFFIX)).exists()
+
+def test_durable_json_append_keeps_existing_document(tmp_path):
+    path = str(tmp_path / 'data.json')
+    with open_writer('json', path, key='items', durable=True) as writer:
+        writer.write_many([{'id': 1}])
+    with open_writer('json', path, key='items', durable=True, append=True) as writer:
+        writer.write_many([{'id': 2}])
+
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f)['items'] == [{'id': 1}, {'id': 2}]
+
+def test_truncated_json_document_is_partially_recovered(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text('{"items": [{"id": 1}, {"id": 2, "nested": [1, 2]}, {"id": 3, "na', encoding='utf-8')
+
+    assert _read_json_records(str(path), 'items') == [{'id': 1}, {'id': 2, 'nested': [1, 2]}]
+
+@pytest.mark.skipif(not PYARROW_AVAILABLE, reason="需要pyarrow")
+def test_durable_parquet_recovers_records_from_an_unclosed_run(tmp_path):
+    import pyarrow.parquet as pq
+
+    path = str(tmp_path / 'data.parquet')
+    columns = [('id', 'int'), ('title', 'string')]
+    writer = open_writer('parquet', path, columns=columns, durable=True)
+    writer.write_many([{'id': 1, 'title': 'a'}])
+
+    with open_writer('parquet', path, columns=columns, durable=True) as resumed:
+        resumed.write_many([{'id': 2, 'title': 'b'}])
+
+    assert pq.read_table(path).to_pylist() == [{'id': 1, 'title': 'a'}, {'id': 2, 'title': 'b'}]
+
+def test_jsonl_unique_key_keeps_last_record_per_key(tmp_path):
+    path = str(tmp_path / 'data.jsonl')
+    with open_writer('jsonl', path, durable=True, unique_key='id') as writer:
+        writer.write_many([{'id': 1, 'v': 'a'}, {'id': 2, 'v': 'a'}])
+    with open_writer('jsonl', path, append=True, durable=True, unique_key='id') as writer:
+        writer.write_many([{'id': 2, 'v': 'b'}, {'id': 3, 'v': 'a'}])
+
+    with open(path, 'r', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'id': 1, 'v': 'a'}, {'id': 2, 'v': 'b'}, {'id': 3, 'v': 'a'}]
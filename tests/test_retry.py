@@ -0,0 +1,75 @@
+"""
+重试策略：搜索接口返回5xx时按策略重试，返回404等致命错误时立即放弃
+"""
+
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+from fixture_server import FixtureServer, synthetic_search_page
+from scrapers.heimao_async import AsyncHeimaoClient
+from scrapers.heimao_client import HeimaoClient
+from scrapers.heimao_scraper import search_page_adaptive
+from utils.retry import RetryPolicy
+
+POLICY = RetryPolicy(max_attempts=3, delay=0, jitter=False)
+
+@pytest.mark.parametrize('status, attempts', [(503, 3), (404, 1)])
+def test_sync_client_raises_http_errors_for_retry_policy(status, attempts):
+    with FixtureServer(synthetic=True, error_rate=1.0, error_status=status, seed=1) as server:
+        with HeimaoClient(base_url=server.url) as client:
+            with pytest.raises(requests.HTTPError) as error:
+                POLICY.call(client.search_page, '', 1, 10)
+        assert error.value.response.status_code == status
+        assert server.stats['injected_errors'] == attempts
+
+def test_search_page_adaptive_marks_404_fatal_and_retries_503():
+    with FixtureServer(synthetic=True, error_rate=1.0, error_status=404, seed=1) as server:
+        with HeimaoClient(base_url=server.url) as client:
+            result = search_page_adaptive(client, '', 1, 10, retry_policy=POLICY)
+        assert result == {'status': 'error', 'fatal': True}
+        assert server.stats['requests'] == 1
+
+    with FixtureServer(synthetic=True, error_rate=1.0, error_status=503, seed=1) as server:
+        with HeimaoClient(base_url=server.url) as client:
+            result = search_page_adaptive(client, '', 1, 10, retry_policy=POLICY)
+        assert result == {'status': 'error'}
+        assert server.stats['requests'] == 3
+
+def mock_transport(statuses):
+    """依次返回statuses中的状态码，之后返回正常的搜索结果页，记录请求次数"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) <= len(statuses):
+            return httpx.Response(statuses[len(calls) - 1], text='<!doctype html><title>error</title>')
+        return httpx.Response(200, json=synthetic_search_page('', int(request.url.params['page'])))
+
+    return httpx.MockTransport(handler), calls
+
+def test_async_client_retries_503_until_success():
+    transport, calls = mock_transport([503, 503])
+
+    async def run():
+        async with AsyncHeimaoClient(base_url='http://heimao.test', transport=transport) as client:
+            return await POLICY.call_async(client.search_page, '', 1, 10)
+
+    result = asyncio.run(run())
+    assert result['status'] == 'success'
+    assert len(result['lists']) == 10
+    assert len(calls) == 3
+
+def test_async_client_does_not_retry_404():
+    transport, calls = mock_transport([404])
+
+    async def run():
+        async with AsyncHeimaoClient(base_url='http://heimao.test', transport=transport) as client:
+            return await POLICY.call_async(client.search_page, '', 1, 10)
+
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        asyncio.run(run())
+    assert error.value.response.status_code == 404
+    assert len(calls) == 1
@@ -1,87 +1,33 @@
-import time
-import random
-import hashlib
 import json
+import os
 import sys
-import urllib.parse
-import re
 
+# 导入黑猫投诉API客户端
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from scrapers.heimao_client import HeimaoClient, is_login_page
 
-def generate_signature(keyword=""):
-    c = str(int(time.time() * 1000))   # 13位时间戳
-    a = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", "m", "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z", "A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M", "N", "O", "P", "Q", "R", "S", "T", "U", "V", "W", "X", "Y", "Z"]
-    h = ''.join(random.choice(a) for i in range(16))   # 随机16个字符
-    d = '$d6eb7ff91ee257475%'   # 默认值
-    
-    # 用于获取最新投诉列表的参数
-    e = '2'       # 最新信息为2
-    u = '10'      # 每页数量
-    page = str(1)   # 页码
-    
-    ts = c
-    rs = h
-    
-    # 构建签名参数
-    if keyword:
-        # 搜索接口使用不同的参数组合
-        bb = [d, keyword, str(10), ts, str(1), rs]
-    else:
-        # 获取最新投诉列表的参数组合
-        bb = [d, u, c, e, page, h]
-    
-    bb.sort()
-    signature = hashlib.sha256((''.join(bb)).encode('utf-8')).hexdigest()
-    
-    return ts, rs, signature
 
-def search_complaints(keyword="", cookie=None):
+def search_complaints(keyword="", cookie=None, client=None):
+    # 未传入客户端时创建一个，递归调用时复用同一个会话
+    if client is None:
+        with HeimaoClient(cookie=cookie) as client:
+            return search_complaints(keyword, cookie, client)
+    
     try:
-        ts, rs, signature = generate_signature(keyword)
-        print(f"时间戳: {ts}, 随机字符串: {rs}, 签名: {signature}")
-        
-        import requests
-        
-        # 设置请求头
-        headers = {
-            "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
-            "accept": "*/*",
-            "accept-language": "zh-CN,zh;q=0.9",
-            "cache-control": "no-cache",
-            "pragma": "no-cache",
-            "sec-ch-ua": '"Chromium";v="136", "Not.A/Brand";v="99"',
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": '"macOS"',
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "same-origin",
-            "x-requested-with": "XMLHttpRequest"
-        }
-        
-        # 如果传入了Cookie，添加到请求头
-        if cookie:
-            headers["cookie"] = cookie
-        
-        # 构建URL
         if keyword:
             # 使用搜索API
-            encoded_keyword = urllib.parse.quote(keyword)
-            base_url = f"https://tousu.sina.com.cn/api/index/s?ts={ts}&rs={rs}&signature={signature}&keywords={encoded_keyword}&page_size=10&page=1"
-            
-            # 添加referer头
-            headers["referer"] = f"https://tousu.sina.com.cn/index/search/?keywords={encoded_keyword}&t=1"
+            response = client.fetch_search(keyword, page=1, page_size=10)
         else:
             # 使用获取最新投诉列表API
-            base_url = f"https://tousu.sina.com.cn/api/index/feed?ts={ts}&rs={rs}&signature={signature}&type=2&page_size=10&page=1&_={ts}"
-        
-        print(f"请求URL: {base_url}")
-        response = requests.request("GET", base_url, headers=headers)
+            response = client.fetch_feed(page=1, page_size=10)
+        print(f"请求URL: {response.url}")
         
         # 检查是否重定向到登录页面
-        if "<!doctype html>" in response.text.lower() or "登录" in response.text or "微博" in response.text:
+        if is_login_page(response.text):
             if keyword and not cookie:
                 print("\n需要登录Cookie才能使用搜索功能！")
                 print("系统将自动为您显示最新投诉列表...\n")
-                return search_complaints()  # 递归调用，不带关键词
+                return search_complaints(client=client)  # 递归调用，不带关键词
             elif not cookie:
                 print("未提供Cookie，将获取不需要登录的最新投诉")
             else: